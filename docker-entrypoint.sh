@@ -1,13 +1,15 @@
 #!/bin/bash
 
-# Create database migrations
-echo "Create database migrations..."
-yes | python manage.py makemigrations
-
-# Apply database migrations
+# Apply committed database migrations
+# (tables created by previously generated migrations are kept)
 echo "Apply database migrations..."
-python manage.py migrate
+python manage.py migrate --fake-initial
 
-# Start server
-echo "Starting server..."
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+# Start server (SERVER_MODE=production - gunicorn, see gunicorn.conf.py)
+if [ "$SERVER_MODE" = "production" ]; then
+  echo "Starting gunicorn server..."
+  exec gunicorn pythonyanssound.wsgi:application --config gunicorn.conf.py
+else
+  echo "Starting server..."
+  python manage.py runserver 0.0.0.0:8000
+fi
@@ -0,0 +1,415 @@
+"""
+Measures latency of API endpoints under mixed authenticated traffic.
+
+Sends requests in-process with Django test client (full middleware and
+view stack, no WSGI server) to database of DJANGO_SETTINGS_MODULE,
+filled e.g. by 'generate_dataset' command:
+
+    python -m benchmarks.endpoints --requests 5000 --save baseline.json
+    python -m benchmarks.endpoints --requests 5000 --compare baseline.json
+
+Reports p50/p95/p99 latency, requests per second and database queries
+per request of every route, routes without scenario are listed as not
+covered. Comparison exits with code 1 when p95 latency or queries of
+any route regressed over threshold
+Requests to popular songs, artists and playlists are more frequent,
+write scenarios are idempotent pairs (like/unlike, follow/unfollow, ...)
+so repeated runs don't change dataset size
+Serving overhead is measured by 'benchmarks.serving'
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pythonyanssound.settings")
+django.setup()
+
+from django.db import connections  # noqa: E402
+from django.db.models import Max, Min, QuerySet  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from django.urls import URLPattern, URLResolver, get_resolver, reverse  # noqa: E402
+
+from music.models import Genre, Song  # noqa: E402
+from playlists.models import Playlist, SongInPlaylist  # noqa: E402
+from profiles.models import Profile  # noqa: E402
+from profiles.tokens import CustomRefreshToken  # noqa: E402
+
+# routes of these url namespaces aren't API
+EXCLUDED_PREFIXES = ("admin/", "metrics", "swagger", "redoc")
+
+# routes which aren't benchmarked: uploads need files, others send
+# emails, invalidate tokens or grow dataset with every request
+NOT_BENCHMARKED = {
+    "songs-audio-upload", "songs-resumable-upload-create", "songs-resumable-upload",
+    "profile-registration", "profile-resend-verify-email", "email-verification",
+    "profile-change-password", "profile-logout", "playlist-fork",
+}
+
+
+class Popular:
+    """Ids chosen with power-law frequency (first ids are the most popular)."""
+
+    def __init__(self, ids: List[int], exponent: float = 1.1):
+        self.ids = ids
+        self.weights = list(accumulate((rank + 1) ** -exponent for rank in range(len(ids))))
+
+    def __bool__(self) -> bool:
+        return bool(self.ids)
+
+    def choose(self, rng: random.Random) -> int:
+        """Returns one id."""
+        return rng.choices(self.ids, cum_weights=self.weights)[0]
+
+    def sample(self, rng: random.Random, size: int) -> List[int]:
+        """Returns up to 'size' distinct ids."""
+        return list(dict.fromkeys(rng.choices(self.ids, cum_weights=self.weights, k=size)))
+
+
+@dataclass
+class BenchmarkUser:
+    """Authenticated user with own playlists (their songs are moved in scenarios)."""
+    pk: int
+    username: str
+    access: str
+    refresh: str
+    playlists: Dict[int, List[int]] = field(default_factory=dict)
+
+
+@dataclass
+class Dataset:
+    """Ids requested in scenarios."""
+    users: List[BenchmarkUser]
+    songs: Popular
+    artists: Popular
+    profiles: Popular
+    playlists: Popular
+    genres: List[int]
+    password: str
+
+
+# (path, JSON body) of request or None if scenario doesn't apply to user
+Request = Optional[Tuple[str, Optional[dict]]]
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    weight: float
+    build: Callable[[Dataset, BenchmarkUser, random.Random], Request]
+
+
+def url(name: str, query: str = "", **kwargs) -> str:
+    """Returns path of route with query string."""
+    return reverse(name, kwargs=kwargs) + (f"?{query}" if query else "")
+
+
+def own_playlist(user: BenchmarkUser, rng: random.Random, songs: int = 0) -> Optional[int]:
+    """Returns random playlist of user with at least 'songs' songs."""
+    playlists = [pk for pk, song_ids in user.playlists.items() if len(song_ids) >= songs]
+    return rng.choice(playlists) if playlists else None
+
+
+def move_song(data: Dataset, user: BenchmarkUser, rng: random.Random) -> Request:
+    playlist = own_playlist(user, rng, songs=2)
+    if playlist is None:
+        return None
+    song, other = rng.sample(user.playlists[playlist], 2)
+    return url("playlists-songs-move", playlist_id=playlist, song_id=song), {rng.choice(("before", "after")): other}
+
+
+def playlist_song(data: Dataset, user: BenchmarkUser, rng: random.Random) -> Request:
+    playlist = own_playlist(user, rng)
+    if playlist is None:
+        return None
+    return url("playlists-songs-management", playlist_id=playlist, song_id=data.songs.choose(rng)), None
+
+
+def playlist_songs_bulk(data: Dataset, user: BenchmarkUser, rng: random.Random) -> Request:
+    playlist = own_playlist(user, rng)
+    if playlist is None:
+        return None
+    return url("playlists-songs-bulk-management", playlist_id=playlist), {"song_ids": data.songs.sample(rng, 10)}
+
+
+def following(data: Dataset, user: BenchmarkUser, rng: random.Random) -> Request:
+    profile = data.artists.choose(rng)
+    if profile == user.pk:
+        return None
+    return url("profile-followings-management", profile_id=profile), None
+
+
+def search(name: str) -> Callable[[Dataset, BenchmarkUser, random.Random], Request]:
+    return lambda data, user, rng: (url(name, search_string=f"{rng.choice(('song', 'user'))} {rng.randint(1, 99)}"), None)
+
+
+SCENARIOS = [
+    # reads
+    Scenario("songs-list-create", "GET", 10, lambda data, user, rng: (url("songs-list-create"), None)),
+    Scenario("songs-detail-update-delete", "GET", 10, lambda data, user, rng: (
+        url("songs-detail-update-delete", song_id=data.songs.choose(rng)), None)),
+    Scenario("songs-likes", "GET", 6, lambda data, user, rng: (url("songs-likes"), None)),
+    Scenario("songs-releases", "GET", 4, lambda data, user, rng: (url("songs-releases"), None)),
+    Scenario("songs-trending", "GET", 4, lambda data, user, rng: (
+        url("songs-trending", f"genre={rng.choice(data.genres)}" if rng.random() < 0.5 else ""), None)),
+    Scenario("songs-genre-chart", "GET", 3, lambda data, user, rng: (
+        url("songs-genre-chart", f"period={rng.choice(('week', 'all'))}", genre_id=rng.choice(data.genres)), None)),
+    Scenario("genres-list", "GET", 3, lambda data, user, rng: (url("genres-list"), None)),
+    Scenario("genre-songs", "GET", 3, lambda data, user, rng: (url("genre-songs", genre_id=rng.choice(data.genres)), None)),
+    Scenario("own-playlists", "GET", 4, lambda data, user, rng: (url("own-playlists"), None)),
+    Scenario("short-playlists-list", "GET", 2, lambda data, user, rng: (url("short-playlists-list"), None)),
+    Scenario("playlist-management", "GET", 6, lambda data, user, rng: (
+        url("playlist-management", playlist_id=data.playlists.choose(rng)), None) if data.playlists else None),
+    Scenario("liked-playlists", "GET", 3, lambda data, user, rng: (url("liked-playlists"), None)),
+    Scenario("own-profile-details-update", "GET", 2, lambda data, user, rng: (url("own-profile-details-update"), None)),
+    Scenario("own-profile-short-details", "GET", 4, lambda data, user, rng: (url("own-profile-short-details"), None)),
+    Scenario("profile-details", "GET", 5, lambda data, user, rng: (
+        url("profile-details", user_id=data.artists.choose(rng)), None)),
+    Scenario("profile-followers", "GET", 3, lambda data, user, rng: (
+        url("profile-followers", user_id=data.artists.choose(rng)), None)),
+    Scenario("profile-mutuals", "GET", 2, lambda data, user, rng: (
+        url("profile-mutuals", user_id=data.profiles.choose(rng)), None)),
+    Scenario("profile-follow-suggestions", "GET", 2, lambda data, user, rng: (url("profile-follow-suggestions"), None)),
+    Scenario("profile-followings", "GET", 3, lambda data, user, rng: (url("profile-followings"), None)),
+    Scenario("search", "GET", 2, search("search")),
+    Scenario("search-artist", "GET", 1, search("search-artist")),
+    Scenario("search-profile", "GET", 1, search("search-profile")),
+    Scenario("search-playlist", "GET", 1, search("search-playlist")),
+    Scenario("search-song", "GET", 1, search("search-song")),
+    # writes
+    Scenario("songs-listens", "POST", 8, lambda data, user, rng: (
+        url("songs-listens", song_id=data.songs.choose(rng)), None)),
+    *(
+        Scenario("songs-likes-management", method, 3, lambda data, user, rng: (
+            url("songs-likes-management", song_id=data.songs.choose(rng)), None))
+        for method in ("POST", "DELETE")
+    ),
+    *(
+        Scenario("songs-likes-bulk-management", method, 1, lambda data, user, rng: (
+            url("songs-likes-bulk-management"), {"song_ids": data.songs.sample(rng, 10)}))
+        for method in ("POST", "DELETE")
+    ),
+    *(Scenario("playlists-songs-management", method, 1, playlist_song) for method in ("POST", "DELETE")),
+    *(Scenario("playlists-songs-bulk-management", method, 0.5, playlist_songs_bulk) for method in ("POST", "DELETE")),
+    Scenario("playlists-songs-move", "POST", 1, move_song),
+    *(
+        Scenario("liked-playlists-management", method, 1, lambda data, user, rng: (
+            url("liked-playlists-management", playlist_id=data.playlists.choose(rng)), None) if data.playlists else None)
+        for method in ("POST", "DELETE")
+    ),
+    *(Scenario("profile-followings-management", method, 2, following) for method in ("POST", "DELETE")),
+    Scenario("profile-login", "POST", 0.5, lambda data, user, rng: (
+        url("profile-login"), {"username": user.username, "password": data.password})),
+    Scenario("profile-token-refresh", "POST", 0.5, lambda data, user, rng: (
+        url("profile-token-refresh"), {"refresh": user.refresh})),
+]
+
+
+def get_route_names(resolver: URLResolver = None, prefix: str = "") -> List[str]:
+    """Returns names of API routes."""
+    names = []
+    for pattern in (resolver or get_resolver()).url_patterns:
+        route = prefix + str(pattern.pattern)
+        if route.startswith(EXCLUDED_PREFIXES):
+            continue
+        if isinstance(pattern, URLResolver):
+            names.extend(get_route_names(pattern, route))
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.append(pattern.name)
+    return names
+
+
+def sample_ids(queryset: QuerySet, size: int, rng: random.Random) -> List[int]:
+    """Returns up to 'size' random ids of queryset rows (one query per attempt)."""
+    bounds = queryset.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return []
+    ids = set()
+    population = range(bounds["low"], bounds["high"] + 1)
+    for _ in range(5):
+        candidates = rng.sample(population, min(size * 4, len(population)))
+        ids.update(queryset.filter(pk__in=candidates).values_list("pk", flat=True))
+        if len(ids) >= size:
+            break
+    ids = sorted(ids)
+    rng.shuffle(ids)
+    return ids[:size]
+
+
+def load_dataset(users: int, password: str, rng: random.Random) -> Dataset:
+    """Samples benchmark users (playlist owners first) and requested ids."""
+    playlists = sample_ids(Playlist.objects.all(), 10000, rng)
+    owners = list(dict.fromkeys(
+        Playlist.objects.filter(pk__in=playlists[:users * 4]).values_list("owner_id", flat=True)
+    ))[:users]
+    owners += sample_ids(Profile.objects.exclude(pk__in=owners), users - len(owners), rng)
+
+    benchmark_users = []
+    for profile in Profile.objects.filter(pk__in=owners).order_by("pk"):
+        token = CustomRefreshToken.for_user(profile)
+        user = BenchmarkUser(profile.pk, profile.username, str(token.access_token), str(token))
+        for playlist_id in Playlist.objects.filter(owner=profile).values_list("pk", flat=True)[:5]:
+            user.playlists[playlist_id] = list(
+                SongInPlaylist.objects.filter(playlist_id=playlist_id).values_list("song_id", flat=True)[:50]
+            )
+        benchmark_users.append(user)
+    if not benchmark_users:
+        raise RuntimeError("Database has no profiles, fill it with 'generate_dataset' command")
+
+    return Dataset(
+        users=benchmark_users,
+        songs=Popular(sample_ids(Song.objects.all(), 10000, rng)),
+        artists=Popular(sample_ids(Profile.objects.filter(is_artist=True), 2000, rng)),
+        profiles=Popular(sample_ids(Profile.objects.all(), 10000, rng)),
+        playlists=Popular(playlists),
+        genres=list(Genre.objects.values_list("pk", flat=True)),
+        password=password,
+    )
+
+
+def send_request(client: Client, scenario: Scenario, user: BenchmarkUser, path: str, body: Optional[dict]) -> dict:
+    """Sends request, returns its latency (seconds), status and number of queries."""
+    with ExitStack() as stack:
+        captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+        started = time.perf_counter()
+        response = client.generic(
+            scenario.method, path, json.dumps(body) if body is not None else "",
+            content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {user.access}"
+        )
+        latency = time.perf_counter() - started
+    return {
+        "latency": latency, "status": response.status_code,
+        "queries": sum(len(context) for context in captured),
+    }
+
+
+def run_worker(data: Dataset, seed: int, requests_number: int) -> List[Tuple[str, dict]]:
+    """Sends requests of scenarios chosen by weight from one thread."""
+    rng = random.Random(seed)
+    client = Client()
+    weights = list(accumulate(scenario.weight for scenario in SCENARIOS))
+    results = []
+    try:
+        while len(results) < requests_number:
+            scenario = rng.choices(SCENARIOS, cum_weights=weights)[0]
+            user = rng.choice(data.users)
+            request = scenario.build(data, user, rng)
+            if request is None:
+                continue
+            path, body = request
+            results.append((f"{scenario.method} {scenario.name}", send_request(client, scenario, user, path, body)))
+    finally:
+        connections.close_all()
+    return results
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Returns nearest-rank percentile of sorted values."""
+    return values[max(int(round(q / 100 * len(values))) - 1, 0)]
+
+
+def summarize(results: List[dict]) -> dict:
+    """Returns latency percentiles (ms), errors and mean queries of requests."""
+    latencies = sorted(result["latency"] * 1000 for result in results)
+    return {
+        "requests": len(results),
+        "errors": sum(result["status"] >= 400 for result in results),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "queries": sum(result["queries"] for result in results) / len(results),
+    }
+
+
+def run_benchmark(data: Dataset, requests_number: int, concurrency: int, seed: int) -> dict:
+    """Returns summary of all requests and of every route."""
+    per_worker = -(-requests_number // concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        workers = [executor.submit(run_worker, data, seed + index, per_worker) for index in range(concurrency)]
+        results = [result for worker in workers for result in worker.result()]
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for route, result in results:
+        routes.setdefault(route, []).append(result)
+    return {
+        "total": {**summarize([result for _, result in results]), "rps": len(results) / elapsed},
+        "routes": {route: summarize(routes[route]) for route in sorted(routes)},
+    }
+
+
+def print_report(report: dict, baseline: Optional[dict] = None) -> List[str]:
+    """Prints routes summaries (with changes against baseline), returns regressed routes."""
+    regressed = []
+    print(f"{'route':<48}{'requests':>9}{'errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for route, summary in [*report["routes"].items(), ("total", report["total"])]:
+        line = (
+            f"{route:<48}{summary['requests']:>9}{summary['errors']:>7}{summary['p50']:>9.1f}"
+            f"{summary['p95']:>9.1f}{summary['p99']:>9.1f}{summary['queries']:>9.1f}"
+        )
+        previous = (baseline or {}).get("routes", {}).get(route) if route != "total" else (baseline or {}).get("total")
+        if previous:
+            change = (summary["p95"] - previous["p95"]) / previous["p95"] * 100 if previous["p95"] else 0
+            line += f"  p95 {change:+.0f}%, queries {summary['queries'] - previous['queries']:+.1f}"
+            # queries of cached data (e.g. liked songs sets) vary between runs
+            queries_limit = previous["queries"] * (1 + report["threshold"] / 100) + 0.5
+            if route != "total" and (change > report["threshold"] or summary["queries"] > queries_limit):
+                regressed.append(route)
+                line += "  REGRESSED"
+        print(line)
+    print(f"{report['total']['rps']:.1f} requests/s")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=500, help="requests before measured run")
+    parser.add_argument("--concurrency", type=int, default=4, help="threads sending requests")
+    parser.add_argument("--users", type=int, default=100, help="number of authenticated users")
+    parser.add_argument("--password", default="dataset", help="password of users for login scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="JSON file to save report to (baseline)")
+    parser.add_argument("--compare", help="JSON baseline to compare report with")
+    parser.add_argument("--threshold", type=float, default=20, help="p95 regression threshold (%%)")
+    args = parser.parse_args()
+
+    # test environment allows test client host and keeps emails in memory
+    setup_test_environment()
+    data = load_dataset(args.users, args.password, random.Random(args.seed))
+    covered = {scenario.name for scenario in SCENARIOS}
+    missing = sorted(set(get_route_names()) - covered - NOT_BENCHMARKED)
+    if missing:
+        print(f"Routes without scenario: {', '.join(missing)}")
+
+    if args.warmup:
+        run_benchmark(data, args.warmup, args.concurrency, args.seed + 10000)
+    report = run_benchmark(data, args.requests, args.concurrency, args.seed)
+    report.update(threshold=args.threshold, concurrency=args.concurrency, not_covered=missing)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    regressed = print_report(report, baseline)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(report, file, indent=2)
+    if regressed:
+        print(f"Regressed routes: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
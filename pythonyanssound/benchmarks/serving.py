@@ -0,0 +1,94 @@
+"""
+Compares throughput of development and production serving modes.
+
+Starts 'runserver' and gunicorn (gunicorn.conf.py) one by one and sends
+the same number of concurrent GET requests to each of them:
+
+    python -m benchmarks.serving --token <access token> --path /api/profile/short/
+
+Uses settings of DJANGO_SETTINGS_MODULE (database must be reachable)
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import local
+
+import requests
+
+SERVERS = {
+    "runserver": [sys.executable, "manage.py", "runserver", "--noreload", "{bind}"],
+    "gunicorn": [
+        sys.executable, "-m", "gunicorn", "pythonyanssound.wsgi:application",
+        "--config", "gunicorn.conf.py", "--bind", "{bind}"
+    ],
+}
+
+_sessions = local()
+
+
+def wait_for_server(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    """Waits until server accepts requests."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError("Server has not started")
+
+
+def send_request(url: str, headers: dict) -> int:
+    """Sends GET request with keep-alive session of current thread."""
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session.get(url, headers=headers).status_code
+
+
+def run_benchmark(url: str, headers: dict, requests_number: int, concurrency: int) -> dict:
+    """Returns requests per second and responses statuses of benchmark run."""
+    statuses = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for code in executor.map(lambda _: send_request(url, headers), range(requests_number)):
+            statuses[code] = statuses.get(code, 0) + 1
+    elapsed = time.perf_counter() - start
+    return {"rps": requests_number / elapsed, "statuses": statuses}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--path", default="/api/profile/short/")
+    parser.add_argument("--token", default=os.environ.get("BENCHMARK_TOKEN"), help="access token")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--bind", default="127.0.0.1:8765")
+    parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+    args = parser.parse_args()
+
+    url = f"http://{args.bind}{args.path}"
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    for name in args.servers:
+        command = [part.format(bind=args.bind) for part in SERVERS[name]]
+        process = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            env={**os.environ, "GUNICORN_ACCESS_LOG": ""}
+        )
+        try:
+            wait_for_server(url, process)
+            # warm up connections and caches
+            run_benchmark(url, headers, args.concurrency * 2, args.concurrency)
+            result = run_benchmark(url, headers, args.requests, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name}: {result['rps']:.1f} requests/s, statuses {result['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
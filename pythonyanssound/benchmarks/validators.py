@@ -0,0 +1,54 @@
+"""
+Measures validation time of large image uploads.
+
+Validates PNG and JPEG uploads padded to 50Mb with upload validators
+and reports time and number of bytes read per validation:
+
+    python -m benchmarks.validators --rounds 20
+
+Validators read only image header, so time doesn't depend on upload size
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pythonyanssound.settings")
+django.setup()
+
+from pythonyanssound.test_utils import UPLOAD_SIZE, CountingReadsUpload, create_image_upload  # noqa: E402
+from pythonyanssound.validators import validate_file_size, validate_image_resolution  # noqa: E402
+
+
+def run_benchmark(image_format: str, rounds: int) -> dict:
+    """Returns mean validation time (s) and bytes read of image upload."""
+    upload = create_image_upload((1000, 1000), image_format, UPLOAD_SIZE)
+    counting_upload = CountingReadsUpload(upload)
+    try:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            validate_image_resolution(counting_upload)
+            validate_file_size(counting_upload)
+        elapsed = time.perf_counter() - started
+    finally:
+        upload.close()
+    return {"time": elapsed / rounds, "bytes_read": counting_upload.bytes_read // rounds}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--formats", nargs="+", default=["PNG", "JPEG"])
+    args = parser.parse_args()
+
+    for image_format in args.formats:
+        result = run_benchmark(image_format, args.rounds)
+        print(
+            f"{image_format} 50Mb upload validation: "
+            f"{result['time'] * 1000:.2f} ms, {result['bytes_read']} bytes read"
+        )
+
+
+if __name__ == "__main__":
+    main()
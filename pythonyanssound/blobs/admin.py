@@ -0,0 +1,6 @@
+from django.contrib import admin
+
+from blobs.models import Blob
+
+
+admin.site.register(Blob)
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class BlobsConfig(AppConfig):
+    """Content addressed media files Django application config."""
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'blobs'
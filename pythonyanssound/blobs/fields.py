@@ -0,0 +1,117 @@
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import FileField, ImageField
+from django.db.models.fields.files import FieldFile, ImageFieldFile
+from django.db.models.signals import post_init, post_delete
+
+from blobs.services import save_blob, acquire_blob, release_blob
+from pythonyanssound.thumbnails import delete_thumbnails
+
+
+def get_file_name(value) -> str:
+    """Returns file name of model file field value (FieldFile or str)."""
+    return getattr(value, "name", value) or ""
+
+
+class ContentAddressedFieldFileMixin:
+    """Field file which saves content as blob (once per content)."""
+
+    def save(self, name, content, save=True):
+        self.name = save_blob(self.storage, content, name)
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+
+        if save:
+            self.instance.save()
+    save.alters_data = True
+
+
+class ContentAddressedFieldFile(ContentAddressedFieldFileMixin, FieldFile):
+    pass
+
+
+class ContentAddressedImageFieldFile(ContentAddressedFieldFileMixin, ImageFieldFile):
+    pass
+
+
+class ContentAddressedFieldMixin:
+    """
+    Model file field which saves files as blobs and counts references.
+
+    Blob is referenced when instance with new file name is saved,
+    reference is removed when file is replaced or instance is deleted
+    """
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            post_init.connect(self.remember_saved_name, sender=cls)
+            post_delete.connect(self.release_saved_name, sender=cls)
+
+    @property
+    def saved_name_attname(self) -> str:
+        """Returns instance attribute name with file name saved to database."""
+        return f"_saved_{self.attname}"
+
+    def remember_saved_name(self, instance, **kwargs):
+        # deferred field isn't loaded, its saved name stays unknown
+        if self.attname in instance.__dict__:
+            instance.__dict__[self.saved_name_attname] = get_file_name(
+                instance.__dict__[self.attname]
+            )
+
+    def release_saved_name(self, instance, **kwargs):
+        saved_name = instance.__dict__.get(self.saved_name_attname)
+        if saved_name:
+            self.release_saved_file(instance, saved_name)
+
+    def release_saved_file(self, instance, saved_name: str) -> None:
+        """Removes instance reference to replaced or deleted file."""
+        release_blob(saved_name)
+
+    def pre_save(self, model_instance, add):
+        file = super().pre_save(model_instance, add)
+        name = get_file_name(file)
+        saved_name = "" if add else model_instance.__dict__.get(self.saved_name_attname)
+        if saved_name is not None and saved_name != name:
+            if name:
+                acquire_blob(name)
+            if saved_name:
+                self.release_saved_file(model_instance, saved_name)
+        model_instance.__dict__[self.saved_name_attname] = name
+        return file
+
+
+class ContentAddressedFileField(ContentAddressedFieldMixin, FileField):
+    attr_class = ContentAddressedFieldFile
+
+
+class ContentAddressedImageField(ContentAddressedFieldMixin, ImageField):
+    """
+    Content addressed image field, thumbnails of image described
+    by instance 'thumbnails_field' are deleted with released image
+    (after transaction commit).
+    """
+    attr_class = ContentAddressedImageFieldFile
+
+    def __init__(self, *args, thumbnails_field: Optional[str] = None, **kwargs):
+        self.thumbnails_field = thumbnails_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.thumbnails_field:
+            kwargs["thumbnails_field"] = self.thumbnails_field
+        return name, path, args, kwargs
+
+    def release_saved_file(self, instance, saved_name: str) -> None:
+        super().release_saved_file(instance, saved_name)
+        if not self.thumbnails_field:
+            return
+        thumbnails = getattr(instance, self.thumbnails_field)
+        if not thumbnails:
+            return
+        # unlike shared blobs, thumbnails files belong to instance only
+        setattr(instance, self.thumbnails_field, {})
+        transaction.on_commit(lambda: delete_thumbnails(self.storage, thumbnails))
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Blob file name in storage.')),
+                ('digest', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256 hex digest of blob content.')),
+                ('size', models.BigIntegerField(verbose_name='Blob file size in bytes.')),
+                ('references', models.IntegerField(default=0, verbose_name='Number of model file fields referencing blob.')),
+                ('creation_date', models.DateTimeField(auto_now_add=True, verbose_name='Blob creation (uploading) date.')),
+                ('update_date', models.DateTimeField(auto_now=True, verbose_name='Date of last references number change.')),
+            ],
+            options={
+                'db_table': 'blobs',
+            },
+        ),
+    ]
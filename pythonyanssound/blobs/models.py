@@ -0,0 +1,47 @@
+from django.db.models import (
+    Model, CharField, BigIntegerField, IntegerField, DateTimeField
+)
+
+
+class Blob(Model):
+    """
+    Describes media file saved to storage once per content.
+
+    Files with equal content are saved under the same name
+    (derived from SHA-256 digest of content), model file fields
+    referencing blob are counted by 'references'
+    """
+    # Primitive fields
+    name = CharField(
+        verbose_name="Blob file name in storage.",
+        max_length=255,
+        unique=True
+    )
+    digest = CharField(
+        verbose_name="SHA-256 hex digest of blob content.",
+        max_length=64,
+        db_index=True
+    )
+    size = BigIntegerField(
+        verbose_name="Blob file size in bytes."
+    )
+    references = IntegerField(
+        verbose_name="Number of model file fields referencing blob.",
+        default=0
+    )
+    creation_date = DateTimeField(
+        verbose_name="Blob creation (uploading) date.",
+        auto_now_add=True
+    )
+    update_date = DateTimeField(
+        verbose_name="Date of last references number change.",
+        auto_now=True
+    )
+
+    def __str__(self):
+        """String representation of Blob."""
+        return self.name
+
+    class Meta:
+        """Additional settings for model."""
+        db_table = "blobs"
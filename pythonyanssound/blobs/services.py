@@ -0,0 +1,114 @@
+import hashlib
+import os
+from typing import Optional
+
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.db.models import F
+from django.utils import timezone
+
+from blobs.models import Blob
+
+
+def get_content_digest(content: File) -> str:
+    """
+    Returns SHA-256 hex digest of file content.
+
+    Digest computed by upload handler while upload was received
+    is used if present, otherwise file is read by chunks
+    """
+    digest = getattr(content, "content_digest", None)
+    if digest is not None:
+        return digest
+    content_hash = hashlib.sha256()
+    for chunk in content.chunks():
+        content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def get_blob_name(digest: str, extension: str) -> str:
+    """Returns storage name of blob with content digest."""
+    return f"blobs/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def find_blob(digest: str) -> Optional[str]:
+    """
+    Returns name of blob with content digest or None.
+
+    Found blob update date is refreshed, so unreferenced blob
+    isn't deleted while it's being referenced again
+    """
+    blob = Blob.objects.filter(digest=digest).first()
+    if blob is None:
+        return None
+    if not Blob.objects.filter(pk=blob.pk).update(update_date=timezone.now()):
+        return None
+    return blob.name
+
+
+def save_blob(storage: Storage, content: File, filename: str) -> str:
+    """
+    Saves file content to storage unless blob with equal content exists,
+    returns name of blob.
+
+    Blob is referenced when model file field with its name is saved
+    """
+    if not isinstance(content, File):
+        content = File(content)
+    digest = get_content_digest(content)
+    # storage may close file while saving it
+    size = content.size
+    name = find_blob(digest)
+    if name is not None:
+        return name
+
+    extension = os.path.splitext(filename)[1].lower()
+    name = storage.save(get_blob_name(digest, extension), content)
+    blob, _ = Blob.objects.get_or_create(
+        name=name, defaults={"digest": digest, "size": size}
+    )
+    return blob.name
+
+
+def register_stored_file(storage: Storage, name: str) -> str:
+    """
+    Registers file already saved to storage (with one reference) as blob,
+    returns name of blob with equal content if it exists.
+
+    Used for files which bytes don't pass through model file field
+    (direct uploads to storage)
+    """
+    if Blob.objects.filter(name=name).exists():
+        return name
+    with storage.open(name, "rb") as file:
+        digest = get_content_digest(file)
+        size = file.size
+
+    existing_name = find_blob(digest)
+    if existing_name is not None:
+        return existing_name
+    Blob.objects.create(name=name, digest=digest, size=size, references=1)
+    return name
+
+
+def is_blob(name: str) -> bool:
+    """Returns True if file with name is blob (deleted by references)."""
+    return Blob.objects.filter(name=name).exists()
+
+
+def acquire_blob(name: str) -> None:
+    """Adds reference to blob (does nothing for other files)."""
+    Blob.objects.filter(name=name).update(
+        references=F("references") + 1, update_date=timezone.now()
+    )
+
+
+def release_blob(name: str) -> None:
+    """
+    Removes reference to blob (does nothing for other files).
+
+    Unreferenced blobs are deleted by 'delete_unreferenced_blobs_task'
+    """
+    Blob.objects.filter(name=name).update(
+        references=F("references") - 1, update_date=timezone.now()
+    )
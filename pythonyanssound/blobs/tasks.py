@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from blobs.models import Blob
+from pythonyanssound.celery import app
+
+
+@app.task
+def delete_unreferenced_blobs_task() -> int:
+    """
+    Deletes blobs not referenced by any model file field.
+
+    Blob is deleted after 'APP_BLOB_DELETE_DELAY' seconds without
+    references, so it may be reused by concurrent uploads meanwhile
+    Returns number of deleted blobs
+    """
+    deleted = 0
+    threshold = timezone.now() - timedelta(seconds=settings.APP_BLOB_DELETE_DELAY)
+    unreferenced = Blob.objects.filter(references__lte=0, update_date__lt=threshold)
+    for blob in unreferenced.iterator():
+        # blob could be referenced again after it was selected
+        if unreferenced.filter(pk=blob.pk).delete()[0]:
+            default_storage.delete(blob.name)
+            deleted += 1
+    return deleted
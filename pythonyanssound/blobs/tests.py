@@ -0,0 +1,157 @@
+import hashlib
+import io
+from datetime import timedelta
+from unittest import mock
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blobs.models import Blob
+from blobs.tasks import delete_unreferenced_blobs_task
+from music.models import Song, Genre
+from music.tasks import validate_song_audio_task
+from music.tests import mock_s3_storage
+from playlists.models import Playlist
+from profiles.models import Profile
+from profiles.tokens import CustomRefreshToken
+
+
+def create_cover(color: str) -> bytes:
+    cover = io.BytesIO()
+    Image.new("RGB", (1000, 1000), color).save(cover, "PNG")
+    return cover.getvalue()
+
+
+class BlobsUploadTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        mock_s3_storage(self)
+        self.artist = Profile.objects.create_user(
+            "test_email@mail.ru",
+            "test_artist",
+            "test_password",
+            is_artist=True
+        )
+        self.genre = Genre.objects.create(genre="test_genre")
+        self.refresh_token = CustomRefreshToken.for_user(self.artist)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def upload_song(self, audio: bytes, cover: bytes) -> Song:
+        data = {
+            "title": "new_test_song",
+            "audio": SimpleUploadedFile("test.mp3", audio, content_type="audio/mp3"),
+            "cover": SimpleUploadedFile("cover.png", cover, content_type="image/png"),
+            "genre": self.genre.pk
+        }
+        response = self.client.post(reverse("songs-list-create"), data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Song.objects.get(pk=response.data["id"])
+
+    def test_equal_uploads_saved_once(self):
+        cover = create_cover("red")
+        with mock.patch.object(
+                Song.audio.field.storage, "save", wraps=Song.audio.field.storage.save
+        ) as save:
+            first_song = self.upload_song(b"test_bytes", cover)
+            second_song = self.upload_song(b"test_bytes", cover)
+        self.assertEqual(save.call_count, 2)
+
+        self.assertEqual(first_song.audio.name, second_song.audio.name)
+        self.assertEqual(first_song.cover.name, second_song.cover.name)
+        audio_blob = Blob.objects.get(name=first_song.audio.name)
+        self.assertEqual(audio_blob.references, 2)
+        self.assertEqual(audio_blob.digest, hashlib.sha256(b"test_bytes").hexdigest())
+        self.assertEqual(audio_blob.size, len(b"test_bytes"))
+        self.assertEqual(Blob.objects.get(name=first_song.cover.name).references, 2)
+
+    def test_blob_shared_by_models(self):
+        cover = create_cover("red")
+        song = self.upload_song(b"test_bytes", cover)
+        response = self.client.post(reverse("own-playlists"), data={
+            "title": "test_playlist",
+            "cover": SimpleUploadedFile("cover.png", cover, content_type="image/png"),
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        playlist = Playlist.objects.get(pk=response.data["id"])
+        self.assertEqual(playlist.cover.name, song.cover.name)
+        self.assertEqual(Blob.objects.get(name=song.cover.name).references, 2)
+
+    def test_replaced_file_released(self):
+        song = self.upload_song(b"test_bytes", create_cover("red"))
+        old_cover = song.cover.name
+
+        song.cover.save("cover.png", ContentFile(create_cover("blue")))
+        self.assertEqual(Blob.objects.get(name=old_cover).references, 0)
+        self.assertEqual(Blob.objects.get(name=song.cover.name).references, 1)
+
+    def test_deleted_instance_released(self):
+        song = self.upload_song(b"test_bytes", create_cover("red"))
+        self.upload_song(b"other_test_bytes", create_cover("red"))
+
+        # songs are deleted with artist too
+        self.artist.delete()
+        self.assertEqual(Blob.objects.get(name=song.audio.name).references, 0)
+        self.assertEqual(Blob.objects.get(name=song.cover.name).references, 0)
+
+
+class DeleteUnreferencedBlobsTestCase(TestCase):
+
+    def setUp(self) -> None:
+        mock_s3_storage(self)
+        self.artist = Profile.objects.create_user(
+            "test_email@mail.ru",
+            "test_artist",
+            "test_password",
+            is_artist=True
+        )
+        self.genre = Genre.objects.create(genre="test_genre")
+
+    def create_song(self, audio: bytes) -> Song:
+        song = Song(title="test_song", artist=self.artist, genre=self.genre)
+        song.audio.save("test.mp3", ContentFile(audio))
+        return song
+
+    def test_unreferenced_blob_deleted(self):
+        song = self.create_song(b"test_bytes")
+        kept = self.create_song(b"other_test_bytes")
+        song.delete()
+
+        # blob stays until delete delay passes
+        self.assertEqual(delete_unreferenced_blobs_task(), 0)
+        with mock.patch(
+                "blobs.tasks.timezone.now",
+                return_value=timezone.now() + timedelta(days=1)
+        ):
+            self.assertEqual(delete_unreferenced_blobs_task(), 1)
+
+        self.assertFalse(Blob.objects.filter(name=song.audio.name).exists())
+        self.assertFalse(default_storage.exists(song.audio.name))
+        self.assertTrue(default_storage.exists(kept.audio.name))
+
+    def test_stored_file_replaced_with_blob(self):
+        song = self.create_song(b"test_bytes")
+        name = default_storage.save(f"music/{self.artist.pk}/songs/direct.mp3", ContentFile(b"test_bytes"))
+        direct_song = Song.objects.create(title="test_song", audio=name, artist=self.artist, genre=self.genre)
+
+        self.assertTrue(validate_song_audio_task(direct_song.pk))
+        direct_song.refresh_from_db()
+        self.assertEqual(direct_song.audio.name, song.audio.name)
+        self.assertEqual(Blob.objects.get(name=song.audio.name).references, 2)
+        self.assertFalse(default_storage.exists(name))
+
+    def test_stored_file_registered_as_blob(self):
+        name = default_storage.save(f"music/{self.artist.pk}/songs/direct.mp3", ContentFile(b"test_bytes"))
+        song = Song.objects.create(title="test_song", audio=name, artist=self.artist, genre=self.genre)
+
+        self.assertTrue(validate_song_audio_task(song.pk))
+        song.refresh_from_db()
+        self.assertEqual(song.audio.name, name)
+        self.assertEqual(Blob.objects.get(name=name).references, 1)
@@ -0,0 +1,47 @@
+import hashlib
+
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler, TemporaryFileUploadHandler
+)
+
+
+class HashingMemoryFileUploadHandler(MemoryFileUploadHandler):
+    """
+    Memory upload handler which computes SHA-256 digest of uploaded file
+    while it's received (saved as 'content_digest' file attribute).
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.content_hash = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.activated:
+            self.content_hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_digest = self.content_hash.hexdigest()
+        return file
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Temporary file upload handler which computes SHA-256 digest of
+    uploaded file while it's received (saved as 'content_digest' file attribute).
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.content_hash = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.content_hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_digest = self.content_hash.hexdigest()
+        return file
@@ -0,0 +1,43 @@
+"""
+Gunicorn settings of production serving mode (see docker-entrypoint.sh).
+
+Workers and threads are sized with environment variables,
+every thread keeps its own persistent database connection
+(workers * threads connections, see 'DB_CONN_MAX_AGE')
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# requests mostly wait for database, Redis and S3
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+# application is imported once by master and shared with forked workers
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+# workers are restarted periodically to bound memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+# empty value disables access log
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+
+# workers write Prometheus metrics to files merged on '/metrics' scrape,
+# files of previous run are removed before application is imported
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+
+def post_fork(server, worker):
+    """Drops database connections inherited from master (sockets can't be shared)."""
+    from django.db import connections
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    """Removes live gauges of exited worker from metrics (counters are kept)."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -5,3 +5,7 @@ class MusicConfig(AppConfig):
     """Musics Django application config."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'music'
+
+    def ready(self):
+        # connects content versions signal receivers
+        from music import signals  # noqa: F401
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterable, Iterator, List
+
+import redis.exceptions
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count, Sum, F, Q, Value, OuterRef, Subquery, BigIntegerField,
+    ExpressionWrapper, QuerySet
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from music.models import Song, SongChart, Listen
+from profiles.models import SongLike
+from profiles.utils import chunked
+from pythonyanssound.db import insert_from_select, delete_rows
+
+# ids of songs with likes/listens changed since last charts refresh
+CHANGED_KEY = "charts_changed"
+# timestamp of last charts refresh
+REFRESHED_KEY = "charts_refreshed"
+
+WEEK = timedelta(days=7)
+
+
+def mark_songs_changed(song_ids: Iterable[int]) -> None:
+    """Adds songs to songs which charts rows are refreshed (after transaction commit)."""
+    song_ids = list(song_ids)
+    if not song_ids:
+        return
+
+    def write():
+        try:
+            get_redis_connection("default").sadd(CHANGED_KEY, *song_ids)
+        except redis.exceptions.ConnectionError:
+            pass
+
+    transaction.on_commit(write)
+
+
+def count_related(queryset: QuerySet, aggregate) -> Coalesce:
+    """Returns subquery of aggregate over song related rows (0 if there are none)."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(song=OuterRef("pk")).order_by().values("song").annotate(
+                value=aggregate
+            ).values("value"),
+            output_field=BigIntegerField()
+        ),
+        Value(0, output_field=BigIntegerField())
+    )
+
+
+def refresh_songs_charts(song_ids: List[int], now: datetime) -> None:
+    """
+    Recomputes charts rows of songs on database side in one transaction:
+    rows are deleted and inserted with one INSERT ... SELECT
+    (songs without likes and listens aren't ranked).
+    """
+    songs = Song.objects.filter(pk__in=song_ids).annotate(
+        week_likes_total=count_related(SongLike.objects.filter(like_date__gte=now - WEEK), Count("pk")),
+        likes_total=count_related(SongLike.objects.all(), Count("pk")),
+        listens_total=count_related(Listen.objects.all(), Sum("count")),
+    ).filter(Q(likes_total__gt=0) | Q(listens_total__gt=0))
+    with transaction.atomic():
+        delete_rows(SongChart.objects.filter(song_id__in=song_ids))
+        insert_from_select(
+            SongChart, songs,
+            song=F("pk"), genre=F("genre_id"), week_likes_count=F("week_likes_total"),
+            likes_count=F("likes_total"), listens_count=F("listens_total"),
+            score=ExpressionWrapper(
+                F("likes_total") * settings.APP_CHARTS_LIKE_WEIGHT
+                + F("listens_total") * settings.APP_CHARTS_LISTEN_WEIGHT,
+                output_field=BigIntegerField()
+            )
+        )
+
+
+def refresh_charts(song_ids: Iterable[int], now: datetime) -> int:
+    """Refreshes charts rows of songs in chunks, returns number of songs."""
+    refreshed = 0
+    for chunk in chunked(song_ids, settings.APP_CHARTS_CHUNK_SIZE):
+        refresh_songs_charts(chunk, now)
+        refreshed += len(chunk)
+    return refreshed
+
+
+def pop_changed_songs(connection) -> Iterator[List[int]]:
+    """Yields chunks of ids of songs with changed activity (removes them)."""
+    while True:
+        chunk = connection.spop(CHANGED_KEY, settings.APP_CHARTS_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield [int(pk) for pk in chunk]
+
+
+def update_changed_charts() -> int:
+    """
+    Refreshes charts rows of songs with new likes/listens
+    and songs which likes left weekly window since last refresh,
+    returns number of refreshed songs.
+
+    Charts of all songs are computed on first refresh
+    """
+    connection = get_redis_connection("default")
+    now = timezone.now()
+    refreshed = connection.get(REFRESHED_KEY)
+    if refreshed is None:
+        # changes made during full refresh are processed next time
+        connection.delete(CHANGED_KEY)
+        song_ids = Song.objects.order_by("pk").values_list("pk", flat=True).iterator()
+    else:
+        previous = datetime.fromtimestamp(float(refreshed), tz=dt_timezone.utc)
+        song_ids = set(
+            SongLike.objects.filter(
+                like_date__gte=previous - WEEK, like_date__lt=now - WEEK
+            ).order_by().values_list("song_id", flat=True).distinct()
+        )
+        for chunk in pop_changed_songs(connection):
+            song_ids.update(chunk)
+        song_ids = sorted(song_ids)
+
+    updated = refresh_charts(song_ids, now)
+    connection.set(REFRESHED_KEY, now.timestamp())
+    return updated
@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from music.models import Genre, GenreCounter, Song
+
+# in-process cache of genres: (genres ordered by name, expiration timestamp)
+_genres_cache: Optional[tuple] = None
+_genres_cache_lock = threading.Lock()
+
+
+def get_genres() -> List[Genre]:
+    """
+    Returns genres ordered by name from in-process cache
+    (loaded for 'APP_GENRES_CACHE_TIMEOUT' seconds).
+    """
+    global _genres_cache
+    cached = _genres_cache
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+    with _genres_cache_lock:
+        if _genres_cache is None or _genres_cache[1] <= time.time():
+            genres = list(Genre.objects.order_by("genre", "pk"))
+            _genres_cache = (genres, time.time() + settings.APP_GENRES_CACHE_TIMEOUT)
+        return _genres_cache[0]
+
+
+def get_genre(genre_id: int) -> Optional[Genre]:
+    """Returns cached genre with 'genre_id' or None."""
+    return next((genre for genre in get_genres() if genre.pk == genre_id), None)
+
+
+def clear_genres_cache() -> None:
+    """Clears in-process cache of genres (other processes wait for timeout)."""
+    global _genres_cache
+    with _genres_cache_lock:
+        _genres_cache = None
+
+
+def get_genres_songs_counts() -> Dict[int, int]:
+    """Returns {genre id: number of genre songs} from counters table."""
+    return dict(GenreCounter.objects.values_list("genre_id", "songs_count"))
+
+
+def change_genre_songs_count(genre_id: int, delta: int) -> None:
+    """Changes counter of genre songs with one UPDATE."""
+    GenreCounter.objects.filter(genre_id=genre_id).update(
+        songs_count=F("songs_count") + delta
+    )
+
+
+def recount_genres_songs() -> int:
+    """
+    Recounts songs of all genres with one UPDATE
+    (counters drift when songs are changed bypassing signals, e.g. by queryset update),
+    returns number of counters.
+    """
+    songs_count = Song.objects.filter(
+        genre=OuterRef("genre")
+    ).order_by().values("genre").annotate(value=Count("pk")).values("value")
+    return GenreCounter.objects.update(
+        songs_count=Coalesce(Subquery(songs_count), Value(0))
+    )
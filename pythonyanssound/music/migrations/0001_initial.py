@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+import django.core.validators
+from django.db import migrations, models
+import pythonyanssound.validators
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre', models.CharField(max_length=255, verbose_name='Genre name.')),
+            ],
+            options={
+                'db_table': 'genres',
+            },
+        ),
+        migrations.CreateModel(
+            name='Listen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0, verbose_name='Number of song listens.')),
+            ],
+            options={
+                'db_table': 'songs_listens',
+            },
+        ),
+        migrations.CreateModel(
+            name='Song',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Song title name.')),
+                ('audio', models.FileField(upload_to='', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['mp3']), pythonyanssound.validators.validate_file_size], verbose_name='Song audio file link (saved to S3 bucket).')),
+                ('cover', models.ImageField(blank=True, upload_to='', validators=[pythonyanssound.validators.validate_image_resolution, pythonyanssound.validators.validate_file_size], verbose_name='Song cover image file link (saved to S3 bucket).')),
+                ('creation_date', models.DateTimeField(auto_now_add=True, verbose_name='Song creation (uploading) date.')),
+            ],
+            options={
+                'db_table': 'music',
+            },
+        ),
+    ]
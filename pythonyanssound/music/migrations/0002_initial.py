@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('music', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='artist',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='songs', to=settings.AUTH_USER_MODEL, verbose_name="Song's owner instance."),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='genre',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='songs', to='music.genre', verbose_name="Song's genre instance."),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='listens',
+            field=models.ManyToManyField(related_name='listens', through='music.Listen', to=settings.AUTH_USER_MODEL, verbose_name='List of songs listens by Profiles.'),
+        ),
+        migrations.AddField(
+            model_name='listen',
+            name='profile',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL, verbose_name='Profile who have listened the song.'),
+        ),
+        migrations.AddField(
+            model_name='listen',
+            name='song',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='song', to='music.song', verbose_name='Song instance which have been listened by Profile.'),
+        ),
+    ]
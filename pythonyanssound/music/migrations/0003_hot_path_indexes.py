@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_listens(apps, schema_editor):
+    """Merges listens of the same song by profile into the first one."""
+    Listen = apps.get_model("music", "Listen")
+    duplicates = Listen.objects.values("profile", "song").annotate(
+        listens_count=Count("pk"), first_pk=Min("pk"), total=Sum("count")
+    ).filter(listens_count__gt=1)
+    for duplicate in duplicates.iterator():
+        listens = Listen.objects.filter(
+            profile=duplicate["profile"], song=duplicate["song"]
+        )
+        listens.exclude(pk=duplicate["first_pk"]).delete()
+        listens.update(count=duplicate["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_listens, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['artist', 'title'], name='music_artist_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['creation_date'], name='music_creation_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='listen',
+            constraint=models.UniqueConstraint(fields=('profile', 'song'), name='songs_listens_profile_song_uniq'),
+        ),
+    ]
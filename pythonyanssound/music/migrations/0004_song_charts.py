@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SongChart',
+            fields=[
+                ('week_likes_count', models.IntegerField(default=0, verbose_name='Number of song likes during last week.')),
+                ('likes_count', models.IntegerField(default=0, verbose_name='Number of song likes.')),
+                ('listens_count', models.BigIntegerField(default=0, verbose_name='Number of song listens.')),
+                ('score', models.BigIntegerField(default=0, verbose_name='All-time rank score of song.')),
+                ('song', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='chart', serialize=False, to='music.song', verbose_name='Ranked song instance.')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='charts', to='music.genre', verbose_name='Genre of ranked song (denormalized).')),
+            ],
+            options={
+                'db_table': 'music_charts',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='songchart',
+            index=models.Index(fields=['genre', '-week_likes_count', '-song'], name='music_charts_week_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='songchart',
+            index=models.Index(fields=['genre', '-score', '-song'], name='music_charts_all_time_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:26
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def count_genres_songs(apps, schema_editor):
+    """Creates counters of existing genres with numbers of their songs."""
+    Genre = apps.get_model("music", "Genre")
+    GenreCounter = apps.get_model("music", "GenreCounter")
+    GenreCounter.objects.bulk_create(
+        GenreCounter(genre_id=pk, songs_count=songs_count)
+        for pk, songs_count in Genre.objects.annotate(
+            songs_count=Count("songs")
+        ).values_list("pk", "songs_count").iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0004_song_charts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenreCounter',
+            fields=[
+                ('songs_count', models.IntegerField(default=0, verbose_name='Number of genre songs.')),
+                ('genre', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counter', serialize=False, to='music.genre', verbose_name='Counted genre instance.')),
+            ],
+            options={
+                'db_table': 'genres_counters',
+            },
+        ),
+        migrations.RunPython(count_genres_songs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['genre', '-creation_date', '-id'], name='music_genre_date_idx'),
+        ),
+        # replaced by genre browse index (its prefix)
+        migrations.AlterField(
+            model_name='song',
+            name='genre',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='songs', to='music.genre', verbose_name="Song's genre instance."),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 17:28
+
+import blobs.fields
+import django.core.validators
+from django.db import migrations, models
+import pythonyanssound.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0005_genre_browse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Song cover thumbnails names (by size and format).'),
+        ),
+        migrations.AlterField(
+            model_name='song',
+            name='audio',
+            field=blobs.fields.ContentAddressedFileField(upload_to='', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['mp3']), pythonyanssound.validators.validate_file_size], verbose_name='Song audio file link (saved to S3 bucket).'),
+        ),
+        migrations.AlterField(
+            model_name='song',
+            name='cover',
+            field=blobs.fields.ContentAddressedImageField(blank=True, upload_to='', validators=[pythonyanssound.validators.validate_image_resolution, pythonyanssound.validators.validate_file_size], verbose_name='Song cover image file link (saved to S3 bucket).'),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.core.validators import FileExtensionValidator
 from django.db.models import (
-    Model, CharField, FileField, ImageField, ForeignKey, CASCADE,
-    IntegerField, ManyToManyField, DateTimeField
+    Model, CharField, ForeignKey, CASCADE,
+    IntegerField, ManyToManyField, DateTimeField, JSONField,
+    Index, UniqueConstraint, OneToOneField, BigIntegerField
 )
 
-from music.utils import song_upload_folder, song_cover_upload_folder
+from blobs.fields import (
+    ContentAddressedFileField, ContentAddressedImageField
+)
 from pythonyanssound.validators import (
     validate_image_resolution, validate_file_size
 )
@@ -28,6 +31,33 @@ class Genre(Model):
         db_table = "genres"
 
 
+class GenreCounter(Model):
+    """
+    Genre counter model keeps number of genre songs,
+    so genres list is served without counting songs.
+
+    Counters are changed on songs creation/deletion
+    and recounted periodically (see music.genres)
+    """
+    # Primitive fields
+    songs_count = IntegerField(
+        verbose_name="Number of genre songs.",
+        default=0
+    )
+    # ForeignKey fields
+    genre = OneToOneField(
+        verbose_name="Counted genre instance.",
+        to=Genre,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="counter"
+    )
+
+    class Meta:
+        """Additional settings for model."""
+        db_table = "genres_counters"
+
+
 class Song(Model):
     """Describes song instance owned by user with is_artist flag."""
     # Primitive fields
@@ -36,30 +66,37 @@ class Song(Model):
         max_length=255,
         blank=False
     )
-    audio = FileField(
+    audio = ContentAddressedFileField(
         verbose_name="Song audio file link (saved to S3 bucket).",
         validators=(
             FileExtensionValidator(allowed_extensions=["mp3"]),
             validate_file_size
-        ),
-        upload_to=song_upload_folder
+        )
     )
-    cover = ImageField(
+    cover = ContentAddressedImageField(
         verbose_name="Song cover image file link (saved to S3 bucket).",
         blank=True,
         validators=(validate_image_resolution, validate_file_size),
-        upload_to=song_cover_upload_folder
+        thumbnails_field="thumbnails"
+    )
+    thumbnails = JSONField(
+        verbose_name="Song cover thumbnails names (by size and format).",
+        default=dict,
+        blank=True,
+        editable=False
     )
     creation_date = DateTimeField(
         verbose_name="Song creation (uploading) date.",
         auto_now_add=True
     )
     # ForeignKey fields
+    # indexed by genre browse index (see Meta)
     genre = ForeignKey(
         verbose_name="Song's genre instance.",
         to=Genre,
         on_delete=CASCADE,
-        related_name="songs"
+        related_name="songs",
+        db_index=False
     )
     artist = ForeignKey(
         verbose_name="Song's owner instance.",
@@ -82,6 +119,14 @@ class Song(Model):
     class Meta:
         """Additional settings for model."""
         db_table = "music"
+        indexes = (
+            # artist's songs ordered by title
+            Index(fields=("artist", "title"), name="music_artist_title_idx"),
+            # latest releases
+            Index(fields=("creation_date", ), name="music_creation_date_idx"),
+            # genre songs in keyset pages order
+            Index(fields=("genre", "-creation_date", "-id"), name="music_genre_date_idx"),
+        )
 
 
 class Listen(Model):
@@ -117,3 +162,63 @@ class Listen(Model):
     class Meta:
         """Additional settings for model."""
         db_table = "songs_listens"
+        constraints = (
+            UniqueConstraint(
+                fields=("profile", "song"), name="songs_listens_profile_song_uniq"
+            ),
+        )
+
+
+class SongChart(Model):
+    """
+    Song chart model keeps summary of song likes and listens
+    which songs are ranked by in genre charts.
+
+    Rows are recomputed on database side for songs with new activity
+    (see music.charts), charts are read from indexes without aggregation
+    Includes:
+        - week_likes_count: number of song likes during last week;
+        - likes_count: number of song likes;
+        - listens_count: number of song listens;
+        - score: all-time rank score of song (weighted likes and listens).
+    """
+    # Primitive fields
+    week_likes_count = IntegerField(
+        verbose_name="Number of song likes during last week.",
+        default=0
+    )
+    likes_count = IntegerField(
+        verbose_name="Number of song likes.",
+        default=0
+    )
+    listens_count = BigIntegerField(
+        verbose_name="Number of song listens.",
+        default=0
+    )
+    score = BigIntegerField(
+        verbose_name="All-time rank score of song.",
+        default=0
+    )
+    # ForeignKey fields
+    song = OneToOneField(
+        verbose_name="Ranked song instance.",
+        to=Song,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="chart"
+    )
+    genre = ForeignKey(
+        verbose_name="Genre of ranked song (denormalized).",
+        to=Genre,
+        on_delete=CASCADE,
+        related_name="charts"
+    )
+
+    class Meta:
+        """Additional settings for model."""
+        db_table = "music_charts"
+        indexes = (
+            # genre charts in pages order
+            Index(fields=("genre", "-week_likes_count", "-song"), name="music_charts_week_idx"),
+            Index(fields=("genre", "-score", "-song"), name="music_charts_all_time_idx"),
+        )
@@ -1,8 +1,38 @@
-from rest_framework.fields import BooleanField
-from rest_framework.serializers import ModelSerializer
+import os
 
-from music.models import Song
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import (
+    BooleanField, CharField, IntegerField, ListField, FloatField, ChoiceField
+)
+from rest_framework.serializers import ModelSerializer, Serializer
+
+from music.models import Song, SongChart
+from profiles.likes import LIKED_SONGS, set_is_liked
 from profiles.models import Profile, SongLike
+from pythonyanssound.serializers import (
+    ThumbnailField, MediaURLsListSerializer
+)
+
+
+class LikedSongsListSerializer(MediaURLsListSerializer):
+    """
+    List serializer which resolves 'is_liked' of the whole list (page)
+    for authenticated user at once.
+    """
+    # attribute of list instances with song id
+    song_pk_attr = "pk"
+
+    def prefetch(self, instances: list) -> None:
+        super().prefetch(instances)
+        request = self.context.get("request")
+        if request is not None:
+            set_is_liked(instances, request.user, LIKED_SONGS, self.song_pk_attr)
+
+
+class ChartSongsListSerializer(LikedSongsListSerializer):
+    """List serializer of charts rows (liked songs ids are rows 'song_id')."""
+    song_pk_attr = "song_id"
 
 
 class SongArtistSerializer(ModelSerializer):
@@ -15,19 +45,31 @@ class SongArtistSerializer(ModelSerializer):
 class SongSerializer(ModelSerializer):
     artist = SongArtistSerializer()
     is_liked = BooleanField(default=False)
+    cover_thumbnail = ThumbnailField("cover", 64)
 
     class Meta:
         model = Song
-        exclude = ("genre", "listens", "creation_date")
+        list_serializer_class = LikedSongsListSerializer
+        exclude = ("genre", "listens", "creation_date", "thumbnails")
         read_only_fields = ("id", "artist")
 
 
+class SongDetailsSerializer(SongSerializer):
+    cover_thumbnail = ThumbnailField("cover", 1000)
+
+
+class TrendingSongSerializer(SongSerializer):
+    score = FloatField(source="trending_score")
+
+
 class SongWithoutLikeSerializer(ModelSerializer):
     artist = SongArtistSerializer()
+    cover_thumbnail = ThumbnailField("cover", 64)
 
     class Meta:
         model = Song
-        exclude = ("genre", "listens", "creation_date")
+        list_serializer_class = MediaURLsListSerializer
+        exclude = ("genre", "listens", "creation_date", "thumbnails")
         read_only_fields = ("id", "artist")
 
 
@@ -35,14 +77,85 @@ class SongCreateUpdateDeleteSerializer(ModelSerializer):
 
     class Meta:
         model = Song
-        exclude = ("artist", "listens", "creation_date")
+        exclude = ("artist", "listens", "creation_date", "thumbnails")
         read_only_fields = ("id", )
 
 
+class SongAudioUploadSerializer(Serializer):
+    filename = CharField(max_length=255)
+    size = IntegerField(min_value=1, max_value=settings.APP_FILE_MAX_SIZE)
+
+    def validate_filename(self, filename: str):
+        if os.path.splitext(filename)[1].lower() != ".mp3":
+            raise ValidationError("File extension should be 'mp3'.")
+        return filename
+
+
+class SongUploadPartSerializer(Serializer):
+    part_number = IntegerField(min_value=1, max_value=10000)
+    etag = CharField(max_length=255)
+
+
+class SongDirectUploadSerializer(ModelSerializer):
+    audio_key = CharField(max_length=Song.audio.field.max_length, write_only=True)
+    upload_id = CharField(max_length=1024, write_only=True)
+    parts = ListField(child=SongUploadPartSerializer(), min_length=1, write_only=True)
+
+    class Meta:
+        model = Song
+        fields = ("id", "title", "audio", "genre", "audio_key", "upload_id", "parts")
+        read_only_fields = ("id", "audio")
+
+
+class SongResumableUploadSerializer(ModelSerializer):
+    resumable_upload_id = CharField(max_length=32, write_only=True)
+
+    class Meta:
+        model = Song
+        fields = ("id", "title", "audio", "genre", "resumable_upload_id")
+        read_only_fields = ("id", "audio")
+
+
+class SongIdsSerializer(Serializer):
+    song_ids = ListField(
+        child=IntegerField(min_value=1),
+        min_length=1,
+        max_length=settings.APP_BULK_SONGS_MAX_SIZE
+    )
+
+
+class GenreSerializer(Serializer):
+    id = IntegerField()
+    genre = CharField()
+    songs_count = IntegerField()
+
+
+class TrendingQuerySerializer(Serializer):
+    genre = IntegerField(min_value=1, required=False)
+
+
 class SongLikeSerializer(ModelSerializer):
     song = SongWithoutLikeSerializer()
     is_liked = BooleanField(default=False)
 
     class Meta:
         model = SongLike
+        list_serializer_class = MediaURLsListSerializer
         fields = ("song", "like_date", "is_liked")
+
+
+class ChartQuerySerializer(Serializer):
+    period = ChoiceField(choices=("week", "all"), default="week")
+
+
+class ChartSongSerializer(ModelSerializer):
+    song = SongWithoutLikeSerializer()
+    is_liked = BooleanField(default=False)
+
+    class Meta:
+        model = SongChart
+        list_serializer_class = ChartSongsListSerializer
+        fields = (
+            "song", "week_likes_count", "likes_count", "listens_count",
+            "score", "is_liked"
+        )
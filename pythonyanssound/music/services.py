@@ -1,18 +1,56 @@
-from django.db.models import Exists, OuterRef
+import hashlib
+import math
+import os
+import tempfile
+import uuid
+from typing import Iterable, List, Tuple
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Exists, OuterRef, F, Value, DateTimeField
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.exceptions import ValidationError, NotFound, APIException
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from music.models import Song
-from music.serializers import SongSerializer
+from blobs.services import save_blob
+from music.models import Song, Listen
+from music.serializers import (
+    SongSerializer, SongAudioUploadSerializer, SongDirectUploadSerializer,
+    SongResumableUploadSerializer, SongIdsSerializer
+)
+from music.charts import mark_songs_changed
+from music.tasks import validate_song_audio_task
+from music.trending import add_trending_events
+from music.uploads import (
+    get_resumable_upload_key, hold_resumable_upload_blob, release_resumable_upload_blob
+)
+from music.utils import song_upload_folder
+from profiles.likes import LIKED_SONGS, add_likes, remove_likes
+from profiles.models import Profile, SongLike
+from pythonyanssound.db import insert_from_select, delete_rows
 from pythonyanssound.pagination import CustomPageNumberPagination
+from pythonyanssound.versions import (
+    bump_content_versions, content_version_key, relations_version_key
+)
+
+
+class ResumableUploadConflict(APIException):
+    """Raised when chunk offset doesn't match resumable upload offset."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Chunk offset doesn't match upload offset."
+    default_code = "conflict"
 
 
 def get_paginated_songs_list_response(request: Request, view) -> Response:
     """Returns paginated response with list of songs."""
-    # annotate songs with current user's likes
-    songs = Song.objects.filter(artist=request.user).annotate(
-        is_liked=Exists(request.user.liked_songs.filter(pk=OuterRef("pk")))
-    ).order_by("title")
+    # songs page is marked with current user's likes by serializer
+    songs = Song.objects.filter(artist=request.user).order_by("title")
 
     paginator = CustomPageNumberPagination()
     paged_songs = paginator.paginate_queryset(songs, request, view)
@@ -22,3 +60,409 @@ def get_paginated_songs_list_response(request: Request, view) -> Response:
     )
 
     return paginator.get_paginated_response(serializer.data)
+
+
+def get_s3_object_key(storage, name: str) -> str:
+    """Returns S3 object key of file saved to S3 storage with 'name'."""
+    return storage._normalize_name(storage._clean_name(name))
+
+
+def create_song_audio_upload(request: Request) -> dict:
+    """
+    Starts S3 multipart upload of song audio file (first upload step).
+
+    Returns storage name of future audio file, upload id and list of
+    presigned URLs to PUT file parts (size of 'APP_UPLOAD_PART_SIZE')
+    directly to S3 bucket
+    """
+    serializer = SongAudioUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    extension = os.path.splitext(serializer.validated_data["filename"])[1]
+    size = serializer.validated_data["size"]
+
+    storage = Song.audio.field.storage
+    client = storage.connection.meta.client
+    name = song_upload_folder(
+        Song(artist=request.user), f"{uuid.uuid4().hex}{extension.lower()}"
+    )
+    key = get_s3_object_key(storage, name)
+
+    upload = client.create_multipart_upload(
+        Bucket=storage.bucket_name, Key=key, ContentType="audio/mpeg"
+    )
+    parts_count = math.ceil(size / settings.APP_UPLOAD_PART_SIZE)
+    parts = [
+        {
+            "part_number": part_number,
+            "url": client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": storage.bucket_name,
+                    "Key": key,
+                    "UploadId": upload["UploadId"],
+                    "PartNumber": part_number,
+                },
+                ExpiresIn=settings.APP_UPLOAD_URL_EXPIRE,
+                HttpMethod="PUT"
+            )
+        }
+        for part_number in range(1, parts_count + 1)
+    ]
+    return {
+        "audio_key": name,
+        "upload_id": upload["UploadId"],
+        "part_size": settings.APP_UPLOAD_PART_SIZE,
+        "parts": parts,
+    }
+
+
+def create_song_from_direct_upload(request: Request) -> dict:
+    """
+    Completes S3 multipart upload and creates song (second upload step).
+
+    Audio file bytes never pass through the server,
+    audio file validation runs asynchronously after song creation
+    """
+    serializer = SongDirectUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    name = serializer.validated_data.pop("audio_key")
+    upload_id = serializer.validated_data.pop("upload_id")
+    parts = serializer.validated_data.pop("parts")
+
+    artist_folder = os.path.dirname(song_upload_folder(Song(artist=request.user), ""))
+    if not name.startswith(f"{artist_folder}/"):
+        raise ValidationError({"audio_key": ["Incorrect audio key."]})
+
+    storage = Song.audio.field.storage
+    try:
+        storage.connection.meta.client.complete_multipart_upload(
+            Bucket=storage.bucket_name,
+            Key=get_s3_object_key(storage, name),
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [
+                {"PartNumber": part["part_number"], "ETag": part["etag"]}
+                for part in sorted(parts, key=lambda part: part["part_number"])
+            ]}
+        )
+    except ClientError:
+        raise ValidationError({"upload_id": ["Upload can't be completed."]})
+
+    song = serializer.save(artist=request.user, audio=name)
+    transaction.on_commit(lambda: validate_song_audio_task.delay(song.pk))
+    return serializer.data
+
+
+def get_resumable_upload_chunk_name(upload_id: str, offset: int) -> str:
+    """
+    Returns unique storage name of resumable upload chunk started at 'offset'
+    (chunks of concurrent requests with the same offset don't overwrite each other).
+    """
+    return f"uploads/resumable/{upload_id}/{offset}-{uuid.uuid4().hex}"
+
+
+def create_resumable_upload(artist: Profile, length: int) -> str:
+    """
+    Creates state of resumable upload in Redis and returns upload id.
+
+    State is stored as Redis hash:
+        - artist: id of uploading Profile;
+        - length: total audio file size;
+        - offset: number of received bytes;
+        - chunks: space separated storage names of saved chunks;
+        - audio_key: storage name of assembled audio file;
+        - audio_reference: reference of upload to assembled audio blob;
+        - song: set while song is being created from upload.
+    """
+    if not 0 < length <= settings.APP_FILE_MAX_SIZE:
+        raise ValidationError(
+            {"Upload-Length": ["Incorrect audio file size."]}
+        )
+    upload_id = uuid.uuid4().hex
+    key = get_resumable_upload_key(upload_id)
+    redis = get_redis_connection("default")
+    redis.hset(key, mapping={
+        "artist": artist.pk, "length": length, "offset": 0, "chunks": ""
+    })
+    redis.expire(key, settings.APP_RESUMABLE_UPLOAD_EXPIRE)
+    return upload_id
+
+
+def get_resumable_upload(upload_id: str, artist: Profile) -> dict:
+    """Returns state of artist's resumable upload or raises 404 error."""
+    redis = get_redis_connection("default")
+    upload = {
+        field.decode(): value.decode()
+        for field, value in redis.hgetall(
+            get_resumable_upload_key(upload_id)
+        ).items()
+    }
+    if not upload or int(upload["artist"]) != artist.pk:
+        raise NotFound("Upload does not exist.")
+    return upload
+
+
+def append_resumable_upload_chunk(
+        upload_id: str, artist: Profile, offset: int, chunk: bytes
+) -> int:
+    """
+    Appends chunk to resumable upload and returns new upload offset.
+
+    Chunk is saved to separate temporary storage object,
+    upload offset is moved in Redis transaction only if it hasn't been
+    moved by concurrent request (chunk is deleted otherwise)
+    Audio file is assembled when the last chunk is received,
+    before offset is moved
+    """
+    upload = get_resumable_upload(upload_id, artist)
+    length = int(upload["length"])
+    if offset != int(upload["offset"]):
+        raise ResumableUploadConflict()
+    if not chunk or offset + len(chunk) > length:
+        raise ValidationError({"detail": "Incorrect chunk size."})
+
+    storage = Song.audio.field.storage
+    chunk_name = storage.save(
+        get_resumable_upload_chunk_name(upload_id, offset), ContentFile(chunk)
+    )
+    chunk_names = upload["chunks"].split() + [chunk_name]
+    new_offset = offset + len(chunk)
+    state = {"offset": new_offset, "chunks": " ".join(chunk_names)}
+    key = get_resumable_upload_key(upload_id)
+
+    def move_offset(pipe) -> None:
+        current_offset = pipe.hget(key, "offset")
+        if current_offset is None or int(current_offset) != offset:
+            raise ResumableUploadConflict()
+        pipe.multi()
+        pipe.hset(key, mapping=state)
+        pipe.expire(key, settings.APP_RESUMABLE_UPLOAD_EXPIRE)
+
+    try:
+        if new_offset == length:
+            # audio file is assembled before offset is moved,
+            # so failed assembly is retried by resending the last chunk
+            state["audio_key"] = assemble_resumable_upload(upload_id, chunk_names)
+            state["audio_reference"] = hold_resumable_upload_blob(upload_id, state["audio_key"])
+        get_redis_connection("default").transaction(move_offset, key)
+    except Exception:
+        storage.delete(chunk_name)
+        if "audio_reference" in state:
+            release_resumable_upload_blob(state["audio_reference"])
+        raise
+
+    if new_offset == length:
+        for name in chunk_names:
+            storage.delete(name)
+    return new_offset
+
+
+def assemble_resumable_upload(upload_id: str, chunk_names: List[str]) -> str:
+    """
+    Concatenates saved chunks to audio file and returns its storage name.
+
+    Chunks are concatenated to temporary file on disk
+    (memory usage is limited by chunk size) and hashed meanwhile,
+    audio file is saved as blob
+    """
+    storage = Song.audio.field.storage
+    content_hash = hashlib.sha256()
+    size = 0
+    with tempfile.TemporaryFile() as audio:
+        for chunk_name in chunk_names:
+            with storage.open(chunk_name, "rb") as chunk:
+                for data in chunk.chunks():
+                    audio.write(data)
+                    content_hash.update(data)
+                    size += len(data)
+        audio_file = File(audio)
+        audio_file.content_digest = content_hash.hexdigest()
+        audio_file.size = size
+        return save_blob(storage, audio_file, f"{upload_id}.mp3")
+
+
+def create_song_from_resumable_upload(request: Request) -> dict:
+    """
+    Creates song with audio file assembled by completed resumable upload.
+
+    Upload is claimed by request until song is created, so song is created
+    only once per upload, upload state and its audio blob reference
+    are removed after song (referencing blob) is committed
+    Audio file validation runs asynchronously after song creation
+    """
+    serializer = SongResumableUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    upload_id = serializer.validated_data.pop("resumable_upload_id")
+
+    upload = get_resumable_upload(upload_id, request.user)
+    if "audio_key" not in upload:
+        raise ValidationError(
+            {"resumable_upload_id": ["Upload isn't completed."]}
+        )
+    key = get_resumable_upload_key(upload_id)
+    redis = get_redis_connection("default")
+
+    def claim_upload(pipe) -> None:
+        if not pipe.exists(key) or pipe.hexists(key, "song"):
+            raise NotFound("Upload does not exist.")
+        pipe.multi()
+        pipe.hset(key, "song", 1)
+
+    redis.transaction(claim_upload, key)
+    try:
+        with transaction.atomic():
+            song = serializer.save(artist=request.user, audio=upload["audio_key"])
+            transaction.on_commit(lambda: redis.delete(key))
+            if "audio_reference" in upload:
+                transaction.on_commit(
+                    lambda: release_resumable_upload_blob(upload["audio_reference"])
+                )
+            transaction.on_commit(lambda: validate_song_audio_task.delay(song.pk))
+    except Exception:
+        redis.hdel(key, "song")
+        raise
+    return serializer.data
+
+
+def get_bulk_song_ids(request: Request) -> List[int]:
+    """Returns validated unique song ids of bulk request (in request order)."""
+    serializer = SongIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return list(dict.fromkeys(serializer.validated_data["song_ids"]))
+
+
+def get_bulk_results(
+        song_ids: List[int], found_ids: Iterable[int],
+        changed_ids: Iterable[int], statuses: Tuple[str, str]
+) -> List[dict]:
+    """
+    Returns per song results of bulk request:
+    'statuses' of changed and unchanged songs or 'not_found'.
+    """
+    found_ids, changed_ids = set(found_ids), set(changed_ids)
+    changed_status, unchanged_status = statuses
+    return [
+        {
+            "song_id": pk,
+            "status": (
+                "not_found" if pk not in found_ids
+                else changed_status if pk in changed_ids
+                else unchanged_status
+            )
+        }
+        for pk in song_ids
+    ]
+
+
+def get_songs_liked_by(profile: Profile, song_ids: List[int]) -> dict:
+    """Returns {song id: (artist id, is liked by Profile)} of existing songs."""
+    songs = Song.objects.filter(pk__in=song_ids).annotate(
+        is_liked=Exists(
+            SongLike.objects.filter(profile=profile, song=OuterRef("pk"))
+        )
+    ).values_list("pk", "artist_id", "is_liked")
+    return {pk: (artist_id, is_liked) for pk, artist_id, is_liked in songs}
+
+
+def bump_likes_versions(profile: Profile, artist_ids: Iterable[int]) -> None:
+    """Bumps versions of content changed by Profile likes."""
+    bump_content_versions((
+        relations_version_key(profile.pk),
+        *(content_version_key(Profile, pk) for pk in artist_ids)
+    ))
+
+
+def like_songs(profile: Profile, song_ids: List[int]) -> List[dict]:
+    """
+    Appends songs to Profile liked songs, returns per song results.
+
+    Songs are validated with one query and liked with one insert
+    (concurrently liked songs are skipped by unique constraint)
+    """
+    songs = get_songs_liked_by(profile, song_ids)
+    new_ids = [pk for pk in song_ids if pk in songs and not songs[pk][1]]
+    if new_ids:
+        SongLike.objects.bulk_create(
+            (SongLike(profile=profile, song_id=pk) for pk in new_ids),
+            ignore_conflicts=True
+        )
+        add_likes(profile.pk, LIKED_SONGS, new_ids)
+        add_trending_events(new_ids, settings.APP_TRENDING_LIKE_WEIGHT)
+        mark_songs_changed(new_ids)
+        bump_likes_versions(profile, {songs[pk][0] for pk in new_ids})
+    return get_bulk_results(song_ids, songs, new_ids, ("liked", "already_liked"))
+
+
+def unlike_songs(profile: Profile, song_ids: List[int]) -> List[dict]:
+    """
+    Removes songs from Profile liked songs, returns per song results.
+
+    Songs are validated with one query and unliked with one delete
+    """
+    songs = get_songs_liked_by(profile, song_ids)
+    liked_ids = [pk for pk in song_ids if pk in songs and songs[pk][1]]
+    if liked_ids:
+        SongLike.objects.filter(profile=profile, song_id__in=liked_ids).delete()
+        remove_likes(profile.pk, LIKED_SONGS, liked_ids)
+        mark_songs_changed(liked_ids)
+        bump_likes_versions(profile, {songs[pk][0] for pk in liked_ids})
+    return get_bulk_results(song_ids, songs, liked_ids, ("unliked", "not_liked"))
+
+
+def like_song(profile: Profile, song_id: int) -> None:
+    """
+    Appends song to Profile liked songs with one INSERT ... SELECT
+    (liking liked song changes nothing).
+
+    Song existence is checked only if nothing was inserted
+    Version of song artist isn't bumped (artist isn't selected),
+    artist's content validators change within 'APP_CONDITIONAL_GET_PERIOD'
+    """
+    liked = insert_from_select(
+        SongLike, Song.objects.filter(pk=song_id),
+        profile=Value(profile.pk), song=F("pk"),
+        like_date=Value(timezone.now(), output_field=DateTimeField())
+    )
+    if liked:
+        add_likes(profile.pk, LIKED_SONGS, (song_id, ))
+        add_trending_events((song_id, ), settings.APP_TRENDING_LIKE_WEIGHT)
+        mark_songs_changed((song_id, ))
+        bump_content_versions((relations_version_key(profile.pk), ))
+    elif not Song.objects.filter(pk=song_id).exists():
+        raise NotFound("Song not found.")
+
+
+def unlike_song(profile: Profile, song_id: int) -> None:
+    """
+    Removes song from Profile liked songs with one DELETE
+    (unliking not liked song changes nothing).
+
+    Song existence is checked only if nothing was deleted
+    """
+    unliked = delete_rows(SongLike.objects.filter(profile=profile, song_id=song_id))
+    if unliked:
+        remove_likes(profile.pk, LIKED_SONGS, (song_id, ))
+        mark_songs_changed((song_id, ))
+        bump_content_versions((relations_version_key(profile.pk), ))
+    elif not Song.objects.filter(pk=song_id).exists():
+        raise NotFound("Song not found.")
+
+
+def listen_song(profile: Profile, song_id: int) -> None:
+    """
+    Counts Profile listen of song with one UPDATE
+    (INSERT ... SELECT on first listen) and adds it to trending charts.
+    """
+    listens = Listen.objects.filter(profile=profile, song_id=song_id)
+    counted = listens.update(count=F("count") + 1)
+    if not counted:
+        counted = insert_from_select(
+            Listen, Song.objects.filter(pk=song_id),
+            profile=Value(profile.pk), song=F("pk"), count=Value(1)
+        )
+    if not counted:
+        # first listen was counted concurrently
+        counted = listens.update(count=F("count") + 1)
+    if not counted:
+        raise NotFound("Song not found.")
+    add_trending_events((song_id, ), settings.APP_TRENDING_LISTEN_WEIGHT)
+    mark_songs_changed((song_id, ))
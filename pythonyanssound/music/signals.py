@@ -0,0 +1,87 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from music.charts import mark_songs_changed
+from music.genres import clear_genres_cache, change_genre_songs_count
+from music.models import Song, Genre, GenreCounter
+from profiles.models import Profile
+from pythonyanssound.versions import content_version_key, artist_version_key, bump_content_versions
+
+# Song fields shown by song serializers
+SONG_CONTENT_FIELDS = {"title", "audio", "cover", "thumbnails", "artist"}
+
+
+def get_song_version_keys(song: Song) -> list:
+    """
+    Returns version keys of content showing song
+    (song, artist Profile and artist content, which includes playlists with song).
+    """
+    return [
+        content_version_key(Song, song.pk),
+        content_version_key(Profile, song.artist_id),
+        artist_version_key(song.artist_id)
+    ]
+
+
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+def bump_song_versions(sender, instance: Song, update_fields=None, **kwargs):
+    """Bumps versions of content showing saved or deleted song."""
+    if update_fields is not None and SONG_CONTENT_FIELDS.isdisjoint(update_fields):
+        return
+    bump_content_versions(get_song_version_keys(instance))
+
+
+@receiver(post_save, sender=Song)
+def mark_song_charts_changed(sender, instance: Song, created: bool, update_fields=None, **kwargs):
+    """Marks charts row of song for refresh when song genre may have changed."""
+    if created or (update_fields is not None and "genre" not in update_fields):
+        return
+    mark_songs_changed((instance.pk, ))
+
+
+@receiver(post_save, sender=Song)
+def count_created_song(sender, instance: Song, created: bool, **kwargs):
+    """Increments songs counter of created song genre."""
+    if created:
+        change_genre_songs_count(instance.genre_id, 1)
+
+
+@receiver(pre_save, sender=Song)
+def remember_saved_song_genre(sender, instance: Song, update_fields=None, **kwargs):
+    """Remembers genre of song saved to database before it may be changed."""
+    if instance._state.adding or (update_fields is not None and "genre" not in update_fields):
+        return
+    instance._saved_genre_id = Song.objects.filter(
+        pk=instance.pk
+    ).values_list("genre_id", flat=True).first()
+
+
+@receiver(post_save, sender=Song)
+def count_changed_song_genre(sender, instance: Song, created: bool, **kwargs):
+    """Moves song from songs counter of previous genre to counter of new one."""
+    saved_genre_id = instance.__dict__.pop("_saved_genre_id", None)
+    if created or saved_genre_id is None or saved_genre_id == instance.genre_id:
+        return
+    change_genre_songs_count(saved_genre_id, -1)
+    change_genre_songs_count(instance.genre_id, 1)
+
+
+@receiver(post_delete, sender=Song)
+def count_deleted_song(sender, instance: Song, **kwargs):
+    """Decrements songs counter of deleted song genre."""
+    change_genre_songs_count(instance.genre_id, -1)
+
+
+@receiver(post_save, sender=Genre)
+def create_genre_counter(sender, instance: Genre, created: bool, **kwargs):
+    """Creates songs counter of created genre."""
+    if created:
+        GenreCounter.objects.create(genre=instance)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def clear_genres(sender, instance: Genre, **kwargs):
+    """Clears in-process genres cache when genres change."""
+    clear_genres_cache()
@@ -0,0 +1,74 @@
+from django.core.exceptions import ValidationError
+
+from blobs.services import is_blob, register_stored_file
+from music.charts import update_changed_charts
+from music.genres import recount_genres_songs
+from music.models import Song
+from music.trending import compact_trending_charts
+from music.uploads import release_expired_resumable_uploads
+from pythonyanssound.celery import app
+
+
+@app.task
+def validate_song_audio_task(song_id: int) -> bool:
+    """
+    Validates audio file of song uploaded directly to storage.
+
+    Runs audio model field validators (file extension and size),
+    song and its audio file are deleted if validation fails
+    Valid audio file is registered as blob, it's replaced
+    with existing blob if file with equal content was uploaded before
+    """
+    song = Song.objects.filter(pk=song_id).first()
+    if song is None:
+        return False
+    name = song.audio.name
+    storage = song.audio.storage
+    try:
+        for validator in Song.audio.field.validators:
+            validator(song.audio)
+    except ValidationError:
+        song.delete()
+        if not is_blob(name):
+            storage.delete(name)
+        return False
+
+    blob_name = register_stored_file(storage, name)
+    if blob_name != name:
+        song.audio = blob_name
+        song.save(update_fields=["audio"])
+        storage.delete(name)
+    return True
+
+
+@app.task
+def compact_trending_charts_task() -> int:
+    """
+    Rolls trending charts over to current epoch, moves pending scores
+    to genre charts and trims charts (see music.trending).
+    """
+    return compact_trending_charts()
+
+
+@app.task
+def update_songs_charts_task() -> int:
+    """
+    Refreshes genre charts rows of songs with new activity
+    (see music.charts).
+    """
+    return update_changed_charts()
+
+
+@app.task
+def recount_genres_songs_task() -> int:
+    """Recounts songs of genres counters (see music.genres)."""
+    return recount_genres_songs()
+
+
+@app.task
+def release_expired_resumable_uploads_task() -> int:
+    """
+    Releases audio blobs of expired resumable uploads, which songs
+    weren't created from (see music.uploads).
+    """
+    return release_expired_resumable_uploads()
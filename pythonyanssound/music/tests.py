@@ -1,18 +1,59 @@
+import io
+import time
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from PIL import Image
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
 from rest_framework import status
+from moto import mock_s3
 from rest_framework.test import APITestCase
-
-from music.models import Song, Genre
-from profiles.models import Profile
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from blobs.models import Blob
+from music.charts import CHANGED_KEY, REFRESHED_KEY
+from music.genres import clear_genres_cache
+from music.models import Song, Genre, Listen
+from music.tasks import (
+    validate_song_audio_task, compact_trending_charts_task, update_songs_charts_task,
+    recount_genres_songs_task, release_expired_resumable_uploads_task
+)
+from music.trending import get_epoch
+from profiles.models import Profile, SongLike
 from profiles.tokens import CustomRefreshToken
+from pythonyanssound.pagination import KeysetPagination
+from pythonyanssound.storage import CachedURLS3Storage
+from pythonyanssound.tasks import generate_thumbnails_task
 
 TEST_USERNAME = "test_username"
 TEST_EMAIL = "test_email@mail.ru"
 TEST_PASSWORD = "test_password_69"
 
 
+def mock_s3_storage(test_case) -> CachedURLS3Storage:
+    """
+    Replaces default storage (used by model file fields) with storage
+    of mocked S3 bucket until test ends, returns the storage.
+    """
+    s3_mock = mock_s3()
+    s3_mock.start()
+    test_case.addCleanup(s3_mock.stop)
+
+    storage = CachedURLS3Storage(bucket_name="test-bucket", region_name="us-east-1")
+    storage.connection.create_bucket(Bucket="test-bucket")
+    storage_patcher = mock.patch.object(default_storage, "_wrapped", storage)
+    storage_patcher.start()
+    test_case.addCleanup(storage_patcher.stop)
+    return storage
+
+
 class SongsListCreateTestCase(APITestCase):
 
     def setUp(self) -> None:
@@ -190,6 +231,55 @@ class SongDetailUpdateDeleteTestCase(APITestCase):
         response = self.client.get(reverse("songs-detail-update-delete", kwargs={"song_id": self.song.pk}))
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_songs_detail_not_modified(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        url = reverse("songs-detail-update-delete", kwargs={"song_id": self.song.pk})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with mock.patch("music.views.Song.objects.get") as get_song:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        get_song.assert_not_called()
+
+    def test_songs_detail_artist_modified(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        url = reverse("songs-detail-update-delete", kwargs={"song_id": self.song.pk})
+        etag = self.client.get(url)["ETag"]
+
+        # login doesn't change artist content
+        with self.captureOnCommitCallbacks(execute=True):
+            self.song.artist.save(update_fields=["last_login"])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.song.artist.username = "new_username"
+            self.song.artist.save(update_fields=["username"])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["artist"]["username"], "new_username")
+
+    def test_songs_detail_modified(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        url = reverse("songs-detail-update-delete", kwargs={"song_id": self.song.pk})
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("songs-likes-management", kwargs={"song_id": self.song.pk}))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["is_liked"])
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(url, data={"title": "new_title"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "new_title")
+
     def test_songs_detail_song_id_not_found(self):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
 
@@ -353,11 +443,30 @@ class SongsLikeManagementTestCase(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
 
         response = self.client.post(reverse("songs-likes-management", kwargs={"song_id": self.song.pk}))
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         liked_songs = self.profile.liked_songs.all()
         self.assertEqual(len(liked_songs), 2)
 
+    def test_like_song_idempotent(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        url = reverse("songs-likes-management", kwargs={"song_id": self.song.pk})
+
+        # authentication and insert
+        with self.assertNumQueries(2):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(SongLike.objects.filter(profile=self.profile, song=self.song).count(), 1)
+
+        with self.assertNumQueries(2):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(SongLike.objects.filter(profile=self.profile, song=self.song).exists())
+
     def test_like_song_not_found(self):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
 
@@ -372,7 +481,7 @@ class SongsLikeManagementTestCase(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
 
         response = self.client.delete(reverse("songs-likes-management", kwargs={"song_id": self.other_song.pk}))
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         liked_songs = self.profile.liked_songs.all()
         self.assertEqual(len(liked_songs), 0)
@@ -386,3 +495,706 @@ class SongsLikeManagementTestCase(APITestCase):
     def test_unlike_song_unauthorized(self):
         response = self.client.delete(reverse("songs-likes-management", kwargs={"song_id": self.other_song.pk}))
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SongsBulkLikeManagementTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.profile = Profile.objects.create_user(
+            TEST_EMAIL,
+            TEST_USERNAME,
+            TEST_PASSWORD,
+            is_artist=True
+        )
+        genre = Genre.objects.create(genre="test_genre")
+        self.songs = [
+            Song.objects.create(title=f"test_song_{i}", audio="test_uri", genre=genre, artist=self.profile)
+            for i in range(3)
+        ]
+        self.profile.liked_songs.add(self.songs[0])
+        self.refresh_token = CustomRefreshToken.for_user(self.profile)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def test_like_songs(self):
+        song_ids = [song.pk for song in self.songs] + [69]
+        # authentication, validation and insert
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                reverse("songs-likes-bulk-management"), data={"song_ids": song_ids}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["already_liked", "liked", "liked", "not_found"]
+        )
+        self.assertEqual(self.profile.liked_songs.count(), 3)
+
+    def test_unlike_songs(self):
+        song_ids = [self.songs[0].pk, self.songs[1].pk, 69]
+        response = self.client.delete(
+            reverse("songs-likes-bulk-management"), data={"song_ids": song_ids}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["unliked", "not_liked", "not_found"]
+        )
+        self.assertFalse(self.profile.liked_songs.exists())
+
+    def test_like_songs_bad_request(self):
+        for data in ({}, {"song_ids": []}, {"song_ids": ["song"]}):
+            response = self.client.post(reverse("songs-likes-bulk-management"), data=data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_like_songs_unauthorized(self):
+        self.client.credentials()
+        response = self.client.post(
+            reverse("songs-likes-bulk-management"), data={"song_ids": [self.songs[1].pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(APP_TRENDING_HALF_LIFE=3600, APP_TRENDING_EPOCH_PERIOD=86400)
+class TrendingSongsTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.profile = Profile.objects.create_user(TEST_EMAIL, TEST_USERNAME, TEST_PASSWORD, is_artist=True)
+        self.genres = [Genre.objects.create(genre=f"test_genre_{i}") for i in range(2)]
+        self.songs = [
+            Song.objects.create(
+                title=f"test_song_{i}", audio="test_uri", genre=self.genres[i // 2], artist=self.profile
+            )
+            for i in range(4)
+        ]
+        self.refresh_token = CustomRefreshToken.for_user(self.profile)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+        connection = get_redis_connection("default")
+        keys = list(connection.scan_iter("trending:*"))
+        if keys:
+            connection.delete(*keys)
+        self.addCleanup(lambda: [connection.delete(key) for key in connection.scan_iter("trending:*")])
+
+    def listen(self, song: Song, at: float = None):
+        with mock.patch("music.trending.time.time", return_value=at or time.time()):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("songs-listens", kwargs={"song_id": song.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def get_chart(self, at: float = None, **params) -> list:
+        with mock.patch("music.trending.time.time", return_value=at or time.time()):
+            response = self.client.get(reverse("songs-trending"), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(song["id"], round(song["score"], 2)) for song in response.data["results"]]
+
+    def test_listen_song(self):
+        self.listen(self.songs[0])
+        self.listen(self.songs[0])
+        self.assertEqual(Listen.objects.get(profile=self.profile, song=self.songs[0]).count, 2)
+
+        response = self.client.post(reverse("songs-listens", kwargs={"song_id": 69}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_trending_charts(self):
+        first, second, third, _ = self.songs
+        for _ in range(3):
+            self.listen(third)
+        self.listen(first)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("songs-likes-management", kwargs={"song_id": second.pk}))
+
+        self.assertEqual(self.get_chart(), [(second.pk, 5), (third.pk, 3), (first.pk, 1)])
+        # genre charts are updated on compaction
+        self.assertEqual(self.get_chart(genre=self.genres[0].pk), [])
+        self.assertEqual(compact_trending_charts_task(), 3)
+        self.assertEqual(self.get_chart(genre=self.genres[0].pk), [(second.pk, 5), (first.pk, 1)])
+        self.assertEqual(self.get_chart(genre=self.genres[1].pk), [(third.pk, 3)])
+
+        response = self.client.get(reverse("songs-trending"), data={"genre": "rock"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_trending_scores_decay(self):
+        first, second, *_ = self.songs
+        start = get_epoch(time.time()) + 600
+        for _ in range(3):
+            self.listen(first, at=start)
+        self.listen(second, at=start + 3600)
+
+        self.assertEqual(self.get_chart(at=start + 3600), [(first.pk, 1.5), (second.pk, 1)])
+        self.assertEqual(self.get_chart(at=start + 7200), [(first.pk, 0.75), (second.pk, 0.5)])
+
+        # scores are rescaled to next epoch on read and compaction
+        next_epoch = start - 600 + 86400
+        self.listen(second, at=next_epoch)
+        with mock.patch("music.trending.time.time", return_value=next_epoch + 1800):
+            compact_trending_charts_task()
+        self.assertEqual(self.get_chart(at=next_epoch + 3600), [(second.pk, 0.5), (first.pk, 0)])
+
+    @override_settings(APP_TRENDING_CHART_SIZE=2)
+    def test_trending_charts_trimmed(self):
+        for song in self.songs:
+            self.listen(song)
+        self.listen(self.songs[3])
+        compact_trending_charts_task()
+        self.assertEqual([pk for pk, _ in self.get_chart()], [self.songs[3].pk, self.songs[2].pk])
+
+    def test_trending_unauthorized(self):
+        self.client.credentials()
+        response = self.client.get(reverse("songs-trending"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class GenreChartTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.profiles = [
+            Profile.objects.create_user(f"test_email_{i}@mail.ru", f"test_username_{i}", TEST_PASSWORD)
+            for i in range(2)
+        ]
+        self.genres = [Genre.objects.create(genre=f"test_genre_{i}") for i in range(2)]
+        self.songs = [
+            Song.objects.create(
+                title=f"test_song_{i}", audio="test_uri", genre=self.genres[i // 2], artist=self.profiles[0]
+            )
+            for i in range(3)
+        ]
+        first, second, third = self.songs
+        for profile in self.profiles:
+            profile.liked_songs.add(first)
+        self.profiles[0].liked_songs.add(second)
+        Listen.objects.create(profile=self.profiles[0], song=second, count=10)
+        Listen.objects.create(profile=self.profiles[1], song=third, count=1)
+
+        get_redis_connection("default").delete(CHANGED_KEY, REFRESHED_KEY)
+        self.addCleanup(get_redis_connection("default").delete, CHANGED_KEY, REFRESHED_KEY)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {str(CustomRefreshToken.for_user(self.profiles[1]).access_token)}"
+        )
+
+    def get_chart(self, genre: Genre, **params) -> dict:
+        response = self.client.get(reverse("songs-genre-chart", kwargs={"genre_id": genre.pk}), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def get_chart_ids(self, genre: Genre, **params) -> list:
+        return [row["song"]["id"] for row in self.get_chart(genre, **params)["results"]]
+
+    def test_genre_charts(self):
+        first, second, third = self.songs
+        # all songs are ranked on first refresh
+        self.assertEqual(update_songs_charts_task(), 3)
+
+        # authentication, chart page and liked songs (loaded to Redis once)
+        with self.assertNumQueries(3):
+            results = self.get_chart(self.genres[0])["results"]
+        self.assertEqual([row["song"]["id"] for row in results], [first.pk, second.pk])
+        self.assertEqual([row["week_likes_count"] for row in results], [2, 1])
+        self.assertEqual([row["is_liked"] for row in results], [True, False])
+        self.assertEqual(self.get_chart_ids(self.genres[0], period="all"), [second.pk, first.pk])
+        self.assertEqual(self.get_chart_ids(self.genres[1]), [])
+        self.assertEqual(self.get_chart_ids(self.genres[1], period="all"), [third.pk])
+
+        response = self.client.get(
+            reverse("songs-genre-chart", kwargs={"genre_id": self.genres[0].pk}), data={"period": "day"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_genre_charts_refreshed_incrementally(self):
+        first, second, third = self.songs
+        update_songs_charts_task()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("songs-likes-management", kwargs={"song_id": third.pk}))
+            self.client.post(reverse("songs-likes-management", kwargs={"song_id": second.pk}))
+        # songs with new activity only
+        self.assertEqual(update_songs_charts_task(), 2)
+        self.assertEqual(self.get_chart_ids(self.genres[0]), [second.pk, first.pk])
+        self.assertEqual(self.get_chart_ids(self.genres[1]), [third.pk])
+
+        # likes leave weekly charts
+        with mock.patch("music.charts.timezone.now", return_value=timezone.now() + timedelta(days=7, seconds=1)):
+            self.assertEqual(update_songs_charts_task(), 3)
+        self.assertEqual(self.get_chart_ids(self.genres[0]), [])
+        self.assertEqual(self.get_chart_ids(self.genres[0], period="all"), [second.pk, first.pk])
+
+    def test_genre_charts_pages(self):
+        first, second, third = self.songs
+        # songs with equal week likes are paged by song id
+        third.genre = self.genres[0]
+        third.save()
+        self.profiles[1].liked_songs.add(second, third)
+        update_songs_charts_task()
+
+        for params, expected in (({}, [second, first, third]), ({"period": "all"}, [second, first, third])):
+            song_ids = []
+            with mock.patch.object(KeysetPagination, "page_size", 1):
+                page = self.get_chart(self.genres[0], **params)
+                song_ids.extend(row["song"]["id"] for row in page["results"])
+                while page["next"] is not None:
+                    page = self.get_chart(self.genres[0], cursor=page["next"], **params)
+                    song_ids.extend(row["song"]["id"] for row in page["results"])
+            self.assertEqual(song_ids, [song.pk for song in expected])
+
+    def test_genre_charts_unauthorized(self):
+        self.client.credentials()
+        response = self.client.get(reverse("songs-genre-chart", kwargs={"genre_id": self.genres[0].pk}))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class GenresBrowseTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        clear_genres_cache()
+        self.profile = Profile.objects.create_user(TEST_EMAIL, TEST_USERNAME, TEST_PASSWORD, is_artist=True)
+        self.rock, self.jazz = Genre.objects.create(genre="rock"), Genre.objects.create(genre="jazz")
+        self.songs = [
+            Song.objects.create(title=f"test_song_{i}", audio="test_uri", genre=self.rock, artist=self.profile)
+            for i in range(5)
+        ]
+        Song.objects.create(title="jazz_song", audio="test_uri", genre=self.jazz, artist=self.profile)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {str(CustomRefreshToken.for_user(self.profile).access_token)}"
+        )
+
+    def get_counts(self) -> list:
+        response = self.client.get(reverse("genres-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(genre["genre"], genre["songs_count"]) for genre in response.data]
+
+    def test_genres_list(self):
+        self.assertEqual(self.get_counts(), [("jazz", 1), ("rock", 5)])
+        # authentication and counters (genres are cached)
+        with self.assertNumQueries(2):
+            self.get_counts()
+
+        self.songs[0].delete()
+        Genre.objects.create(genre="blues")
+        self.assertEqual(self.get_counts(), [("blues", 0), ("jazz", 1), ("rock", 4)])
+
+        # counters drifted by queryset update of genre are recounted
+        Song.objects.filter(pk=self.songs[1].pk).update(genre=self.jazz)
+        self.assertEqual(recount_genres_songs_task(), 3)
+        self.assertEqual(self.get_counts(), [("blues", 0), ("jazz", 2), ("rock", 3)])
+
+    def test_genre_change_counted(self):
+        song = self.songs[0]
+        song.genre = self.jazz
+        song.save()
+        self.assertEqual(self.get_counts(), [("jazz", 2), ("rock", 4)])
+
+        # saves of other fields don't recount
+        song.title = "new_title"
+        song.save(update_fields=["title"])
+        song.save()
+        self.assertEqual(self.get_counts(), [("jazz", 2), ("rock", 4)])
+
+    def test_genre_songs_pages(self):
+        now = timezone.now()
+        for days, song in zip((3, 1, 1, 2, 0), self.songs):
+            Song.objects.filter(pk=song.pk).update(creation_date=now - timedelta(days=days))
+        expected = [
+            self.songs[4].pk, max(self.songs[1].pk, self.songs[2].pk),
+            min(self.songs[1].pk, self.songs[2].pk), self.songs[3].pk, self.songs[0].pk
+        ]
+        url = reverse("genre-songs", kwargs={"genre_id": self.rock.pk})
+
+        song_ids, params = [], {}
+        with mock.patch.object(KeysetPagination, "page_size", 2):
+            while True:
+                response = self.client.get(url, data=params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                song_ids.extend(song["id"] for song in response.data["results"])
+                if response.data["next"] is None:
+                    break
+                params = {"cursor": response.data["next"]}
+        self.assertEqual(song_ids, expected)
+
+    def test_genre_songs_not_found(self):
+        response = self.client.get(reverse("genre-songs", kwargs={"genre_id": 69}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(
+            reverse("genre-songs", kwargs={"genre_id": self.rock.pk}), data={"cursor": "invalid"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_genres_unauthorized(self):
+        self.client.credentials()
+        response = self.client.get(reverse("genres-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SongCoverThumbnailsTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        mock_s3_storage(self)
+        self.artist = Profile.objects.create_user(
+            TEST_EMAIL,
+            TEST_USERNAME,
+            TEST_PASSWORD,
+            is_artist=True
+        )
+        self.genre = Genre.objects.create(
+            genre="test_genre"
+        )
+        self.refresh_token = CustomRefreshToken.for_user(self.artist)
+
+    def create_song_with_cover(self):
+        cover = io.BytesIO()
+        Image.new("RGB", (1000, 1000), "red").save(cover, "PNG")
+        data = {
+            "title": "new_test_song",
+            "audio": SimpleUploadedFile("test.mp3", b"test_bytes", content_type="audio/mp3"),
+            "cover": SimpleUploadedFile("cover.png", cover.getvalue(), content_type="image/png"),
+            "genre": self.genre.pk
+        }
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+        with mock.patch("pythonyanssound.tasks.generate_thumbnails_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("songs-list-create"), data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        delay.assert_called_once()
+        return Song.objects.get(pk=response.data["id"])
+
+    def test_thumbnails_generation(self):
+        song = self.create_song_with_cover()
+        generate_thumbnails_task(Song._meta.label, song.pk, "cover")
+
+        song.refresh_from_db()
+        self.assertEqual(song.thumbnails["source"], song.cover.name)
+        for size in (64, 256, 1000):
+            for extension in ("webp", "jpeg"):
+                with song.cover.storage.open(song.thumbnails[str(size)][extension]) as thumbnail:
+                    self.assertEqual(Image.open(thumbnail).size, (size, size))
+
+    def create_song_thumbnails(self):
+        song = self.create_song_with_cover()
+        generate_thumbnails_task(Song._meta.label, song.pk, "cover")
+        song.refresh_from_db()
+        names = [name for size in (64, 256, 1000) for name in song.thumbnails[str(size)].values()]
+        self.assertTrue(all(song.cover.storage.exists(name) for name in names))
+        return song, names
+
+    def test_thumbnails_deleted_with_replaced_cover(self):
+        song, names = self.create_song_thumbnails()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            song.cover = ""
+            song.save()
+        song.refresh_from_db()
+        self.assertEqual(song.thumbnails, {})
+        self.assertFalse(any(song.cover.storage.exists(name) for name in names))
+
+    def test_thumbnails_deleted_with_owner(self):
+        song, names = self.create_song_thumbnails()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.artist.delete()
+        self.assertFalse(any(song.cover.storage.exists(name) for name in names))
+
+    def test_songs_list_cover_thumbnail(self):
+        song = self.create_song_with_cover()
+
+        response = self.client.get(reverse("songs-list-create"))
+        self.assertIsNone(response.data["results"][0]["cover_thumbnail"])
+
+        generate_thumbnails_task(Song._meta.label, song.pk, "cover")
+        song.refresh_from_db()
+
+        response = self.client.get(reverse("songs-list-create"))
+        self.assertEqual(
+            set(response.data["results"][0]["cover_thumbnail"]), {"webp", "jpeg"}
+        )
+        self.assertIn(song.thumbnails["64"]["webp"], response.data["results"][0]["cover_thumbnail"]["webp"])
+
+        response = self.client.get(reverse("songs-detail-update-delete", kwargs={"song_id": song.pk}))
+        self.assertIn(song.thumbnails["1000"]["jpeg"], response.data["cover_thumbnail"]["jpeg"])
+
+
+class SongDirectUploadTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        s3_mock = mock_s3()
+        s3_mock.start()
+        self.addCleanup(s3_mock.stop)
+
+        self.storage = S3Boto3Storage(bucket_name="test-bucket", region_name="us-east-1")
+        self.storage.connection.create_bucket(Bucket="test-bucket")
+        storage_patcher = mock.patch.object(Song.audio.field, "storage", self.storage)
+        storage_patcher.start()
+        self.addCleanup(storage_patcher.stop)
+
+        self.artist = Profile.objects.create_user(
+            TEST_EMAIL,
+            TEST_USERNAME,
+            TEST_PASSWORD,
+            is_artist=True
+        )
+        self.genre = Genre.objects.create(
+            genre="test_genre"
+        )
+        self.refresh_token = CustomRefreshToken.for_user(self.artist)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def upload_audio(self, content: bytes) -> dict:
+        response = self.client.post(
+            reverse("songs-audio-upload"), data={"filename": "test.mp3", "size": len(content)}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["parts"]), 1)
+
+        part_response = requests.put(response.data["parts"][0]["url"], data=content)
+        self.assertEqual(part_response.status_code, status.HTTP_200_OK)
+        return {
+            "title": "uploaded_song",
+            "genre": self.genre.pk,
+            "audio_key": response.data["audio_key"],
+            "upload_id": response.data["upload_id"],
+            "parts": [{"part_number": 1, "etag": part_response.headers["ETag"]}]
+        }
+
+    def test_direct_upload(self):
+        data = self.upload_audio(b"test_bytes")
+
+        with mock.patch("music.services.validate_song_audio_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("songs-list-create"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        delay.assert_called_once()
+
+        song = Song.objects.get(pk=response.data["id"])
+        self.assertEqual(song.audio.name, data["audio_key"])
+        self.assertEqual(self.storage.size(song.audio.name), len(b"test_bytes"))
+        self.assertTrue(validate_song_audio_task(song.pk))
+
+    def test_direct_upload_parts_count(self):
+        with override_settings(APP_UPLOAD_PART_SIZE=4):
+            response = self.client.post(reverse("songs-audio-upload"), data={"filename": "test.mp3", "size": 10})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([part["part_number"] for part in response.data["parts"]], [1, 2, 3])
+
+    def test_direct_upload_wrong_file_extension(self):
+        response = self.client.post(reverse("songs-audio-upload"), data={"filename": "test.wav", "size": 10})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_direct_upload_too_large_file(self):
+        response = self.client.post(
+            reverse("songs-audio-upload"), data={"filename": "test.mp3", "size": 1024 * 1024 * 51}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_direct_upload_not_own_audio_key(self):
+        data = self.upload_audio(b"test_bytes")
+        data["audio_key"] = data["audio_key"].replace(f"music/{self.artist.pk}/", "music/69/")
+
+        response = self.client.post(reverse("songs-list-create"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_direct_upload_wrong_etag(self):
+        data = self.upload_audio(b"test_bytes")
+        data["parts"][0]["etag"] = "wrong_etag"
+
+        response = self.client.post(reverse("songs-list-create"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Song.objects.exists())
+
+    def test_direct_upload_async_validation_failed(self):
+        data = self.upload_audio(b"test_bytes")
+        response = self.client.post(reverse("songs-list-create"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with override_settings(APP_FILE_MAX_SIZE=4):
+            self.assertFalse(validate_song_audio_task(response.data["id"]))
+        self.assertFalse(Song.objects.filter(pk=response.data["id"]).exists())
+        self.assertFalse(self.storage.exists(data["audio_key"]))
+
+    def test_direct_upload_by_not_artist(self):
+        profile = Profile.objects.create_user("profile@mail.ru", "profile", "profile_password")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(CustomRefreshToken.for_user(profile).access_token)}")
+
+        response = self.client.post(reverse("songs-audio-upload"), data={"filename": "test.mp3", "size": 10})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SongResumableUploadTestCase(APITestCase):
+    CONTENT = b"0123456789" * 10
+
+    def setUp(self) -> None:
+        self.storage = mock_s3_storage(self)
+        self.artist = Profile.objects.create_user(
+            TEST_EMAIL,
+            TEST_USERNAME,
+            TEST_PASSWORD,
+            is_artist=True
+        )
+        self.genre = Genre.objects.create(
+            genre="test_genre"
+        )
+        self.refresh_token = CustomRefreshToken.for_user(self.artist)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def create_upload(self) -> str:
+        response = self.client.post(
+            reverse("songs-resumable-upload-create"), HTTP_UPLOAD_LENGTH=str(len(self.CONTENT))
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(response.data["resumable_upload_id"], response["Location"])
+        return response.data["resumable_upload_id"]
+
+    def send_chunk(self, upload_id: str, offset: int, chunk: bytes):
+        return self.client.patch(
+            reverse("songs-resumable-upload", kwargs={"upload_id": upload_id}),
+            data=chunk,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def get_offset(self, upload_id: str) -> int:
+        response = self.client.head(reverse("songs-resumable-upload", kwargs={"upload_id": upload_id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return int(response["Upload-Offset"])
+
+    def test_resumable_upload(self):
+        upload_id = self.create_upload()
+
+        for offset in range(0, len(self.CONTENT), 30):
+            self.assertEqual(self.get_offset(upload_id), offset)
+            response = self.send_chunk(upload_id, offset, self.CONTENT[offset:offset + 30])
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_offset(upload_id), len(self.CONTENT))
+
+        data = {"title": "uploaded_song", "genre": self.genre.pk, "resumable_upload_id": upload_id}
+        response = self.client.post(reverse("songs-list-create"), data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        song = Song.objects.get(pk=response.data["id"])
+        with song.audio.open("rb"):
+            self.assertEqual(song.audio.read(), self.CONTENT)
+
+        # song is created only once
+        response = self.client.post(reverse("songs-list-create"), data=data)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_resumable_upload_state_removed_after_song_created(self):
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, 0, self.CONTENT)
+        # chunks are deleted after audio file is assembled
+        self.assertEqual(self.storage.listdir(f"uploads/resumable/{upload_id}"), ([], []))
+
+        data = {"title": "uploaded_song", "genre": self.genre.pk, "resumable_upload_id": upload_id}
+        with mock.patch("music.services.validate_song_audio_task.delay"), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("songs-list-create"), data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(get_redis_connection("default").exists(f"resumable_upload:{upload_id}"))
+
+    def test_resumable_upload_blob_referenced_until_song_created(self):
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, 0, self.CONTENT)
+        blob = Blob.objects.get()
+        self.assertEqual(blob.references, 1)
+
+        data = {"title": "uploaded_song", "genre": self.genre.pk, "resumable_upload_id": upload_id}
+        with mock.patch("music.services.validate_song_audio_task.delay"), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("songs-list-create"), data=data)
+        # upload reference is replaced by song reference
+        blob.refresh_from_db()
+        self.assertEqual(blob.references, 1)
+        self.assertEqual(release_expired_resumable_uploads_task(), 0)
+
+    def test_resumable_upload_blob_released_after_expiry(self):
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, 0, self.CONTENT)
+
+        # upload isn't expired yet
+        self.assertEqual(release_expired_resumable_uploads_task(), 0)
+        get_redis_connection("default").delete(f"resumable_upload:{upload_id}")
+        expired = time.time() + settings.APP_RESUMABLE_UPLOAD_EXPIRE + 1
+        with mock.patch("music.uploads.time.time", return_value=expired):
+            self.assertEqual(release_expired_resumable_uploads_task(), 1)
+        self.assertEqual(Blob.objects.get().references, 0)
+
+    def test_resumable_upload_concurrent_chunk_deleted(self):
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, 0, self.CONTENT[:50])
+
+        # offset is moved by concurrent request after this request has read upload state
+        stale_upload = {"artist": str(self.artist.pk), "length": str(len(self.CONTENT)), "offset": "0", "chunks": ""}
+        with mock.patch("music.services.get_resumable_upload", return_value=stale_upload):
+            response = self.send_chunk(upload_id, 0, self.CONTENT[:50])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        _, chunks = self.storage.listdir(f"uploads/resumable/{upload_id}")
+        self.assertEqual(len(chunks), 1)
+
+    def test_resumable_upload_assembly_retried(self):
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, 0, self.CONTENT[:50])
+
+        with mock.patch("music.services.save_blob", side_effect=OSError), self.assertRaises(OSError):
+            self.send_chunk(upload_id, 50, self.CONTENT[50:])
+        # offset isn't moved, so the last chunk can be resent
+        self.assertEqual(self.get_offset(upload_id), 50)
+
+        response = self.send_chunk(upload_id, 50, self.CONTENT[50:])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        data = {"title": "uploaded_song", "genre": self.genre.pk, "resumable_upload_id": upload_id}
+        response = self.client.post(reverse("songs-list-create"), data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        song = Song.objects.get(pk=response.data["id"])
+        with song.audio.open("rb"):
+            self.assertEqual(song.audio.read(), self.CONTENT)
+
+    def test_resumable_upload_resend_after_interruption(self):
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, 0, self.CONTENT[:50])
+
+        # chunk for already received offset (response of previous request was lost)
+        response = self.send_chunk(upload_id, 20, self.CONTENT[20:50])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        offset = self.get_offset(upload_id)
+        response = self.send_chunk(upload_id, offset, self.CONTENT[offset:])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(int(response["Upload-Offset"]), len(self.CONTENT))
+
+    def test_resumable_upload_not_completed(self):
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, 0, self.CONTENT[:50])
+
+        data = {"title": "uploaded_song", "genre": self.genre.pk, "resumable_upload_id": upload_id}
+        response = self.client.post(reverse("songs-list-create"), data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resumable_upload_chunk_exceeds_length(self):
+        upload_id = self.create_upload()
+
+        response = self.send_chunk(upload_id, 0, self.CONTENT + b"0")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resumable_upload_wrong_content_type(self):
+        upload_id = self.create_upload()
+
+        response = self.client.patch(
+            reverse("songs-resumable-upload", kwargs={"upload_id": upload_id}),
+            data=self.CONTENT, content_type="audio/mp3", HTTP_UPLOAD_OFFSET="0"
+        )
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_resumable_upload_too_large_file(self):
+        response = self.client.post(
+            reverse("songs-resumable-upload-create"), HTTP_UPLOAD_LENGTH=str(1024 * 1024 * 51)
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resumable_upload_not_own_upload(self):
+        upload_id = self.create_upload()
+        other_artist = Profile.objects.create_user(
+            "other_artist@mail.ru", "other_artist", "other_password", is_artist=True
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {str(CustomRefreshToken.for_user(other_artist).access_token)}"
+        )
+
+        response = self.send_chunk(upload_id, 0, self.CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,182 @@
+import time
+from typing import Iterable, List, Optional
+
+import redis.exceptions
+from django.conf import settings
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from music.models import Song, Genre
+from profiles.utils import chunked
+
+TRENDING_KEY_PREFIX = "trending:"
+# scores of events not yet added to genre charts
+PENDING = "pending"
+GLOBAL = "global"
+
+
+def get_epoch(timestamp: float) -> int:
+    """Returns start of trending scores epoch which timestamp belongs to."""
+    period = settings.APP_TRENDING_EPOCH_PERIOD
+    return int(timestamp // period * period)
+
+
+def get_growth(seconds: float) -> float:
+    """Returns factor score grows by in 'seconds' (halves back with decay)."""
+    return 2 ** (seconds / settings.APP_TRENDING_HALF_LIFE)
+
+
+def get_trending_key(epoch: int, chart: str = GLOBAL) -> str:
+    """Returns Redis key of sorted set with chart scores of epoch."""
+    return f"{TRENDING_KEY_PREFIX}{epoch}:{chart}"
+
+
+def get_genre_chart(genre_id: int) -> str:
+    """Returns name of genre chart."""
+    return f"genre:{genre_id}"
+
+
+def add_trending_events(song_ids: Iterable[int], weight: float) -> None:
+    """
+    Adds scores of songs listen/like events to trending charts
+    after transaction commit (with one Redis pipeline).
+
+    Scores decay exponentially with 'APP_TRENDING_HALF_LIFE':
+    instead of decreasing old scores, event score grows with time
+    passed since epoch start (forward decay), so order of songs
+    is the same as of decayed scores
+    Global chart is updated immediately, genre charts on compaction
+    """
+    song_ids = list(song_ids)
+    if not song_ids:
+        return
+
+    def write():
+        now = time.time()
+        epoch = get_epoch(now)
+        score = weight * get_growth(now - epoch)
+        try:
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            for chart in (GLOBAL, PENDING):
+                key = get_trending_key(epoch, chart)
+                for pk in song_ids:
+                    pipe.zincrby(key, score, pk)
+                pipe.expire(key, 2 * settings.APP_TRENDING_EPOCH_PERIOD)
+            pipe.execute()
+        except redis.exceptions.ConnectionError:
+            pass
+
+    transaction.on_commit(write)
+
+
+def roll_over_charts(connection, epoch: int, charts: Iterable[str]) -> None:
+    """
+    Moves scores of charts from previous epoch to epoch
+    (scaled to epoch start) with one MULTI/EXEC.
+
+    Repeated roll over does nothing (previous keys are deleted)
+    """
+    period = settings.APP_TRENDING_EPOCH_PERIOD
+    scale = 1 / get_growth(period)
+    pipe = connection.pipeline()
+    for chart in charts:
+        key = get_trending_key(epoch, chart)
+        previous = get_trending_key(epoch - period, chart)
+        pipe.zunionstore(key, {key: 1, previous: scale})
+        pipe.delete(previous)
+        pipe.expire(key, 2 * period)
+    pipe.execute()
+
+
+def pop_pending_scores(connection, epoch: int) -> List[tuple]:
+    """Returns [(song id, score), ...] of events pending for genre charts (removes them)."""
+    key = get_trending_key(epoch, PENDING)
+    pipe = connection.pipeline()
+    pipe.zrange(key, 0, -1, withscores=True)
+    pipe.delete(key)
+    scores, _ = pipe.execute()
+    return [(int(pk), score) for pk, score in scores]
+
+
+def compact_trending_charts() -> int:
+    """
+    Rolls charts over to current epoch, adds pending scores
+    to genre charts and trims charts to 'APP_TRENDING_CHART_SIZE'.
+
+    Returns number of songs added to genre charts
+    """
+    connection = get_redis_connection("default")
+    epoch = get_epoch(time.time())
+    charts = [GLOBAL, *(get_genre_chart(pk) for pk in Genre.objects.values_list("pk", flat=True))]
+    roll_over_charts(connection, epoch, (*charts, PENDING))
+
+    scores = pop_pending_scores(connection, epoch)
+    pipe = connection.pipeline(transaction=False)
+    for chunk in chunked(scores, settings.APP_TRENDING_CHUNK_SIZE):
+        genres = dict(
+            Song.objects.filter(
+                pk__in=[pk for pk, _ in chunk]
+            ).values_list("pk", "genre_id")
+        )
+        for pk, score in chunk:
+            if pk in genres:
+                pipe.zincrby(get_trending_key(epoch, get_genre_chart(genres[pk])), score, pk)
+    for chart in charts:
+        key = get_trending_key(epoch, chart)
+        pipe.zremrangebyrank(key, 0, -settings.APP_TRENDING_CHART_SIZE - 1)
+        pipe.expire(key, 2 * settings.APP_TRENDING_EPOCH_PERIOD)
+    pipe.execute()
+    return len(scores)
+
+
+class TrendingChart:
+    """
+    Songs of trending chart (highest scores first) read from Redis
+    sorted set, sliced by paginator.
+
+    Length is one ZCARD, slice is one ZREVRANGE (O(log n + k))
+    and one query of page songs
+    Chart is rolled over to current epoch if compaction hasn't yet
+    """
+
+    def __init__(self, genre_id: Optional[int] = None):
+        self.now = time.time()
+        self.epoch = get_epoch(self.now)
+        self.chart = GLOBAL if genre_id is None else get_genre_chart(genre_id)
+        self.key = get_trending_key(self.epoch, self.chart)
+        self.connection = get_redis_connection("default")
+
+    def __len__(self) -> int:
+        previous = get_trending_key(self.epoch - settings.APP_TRENDING_EPOCH_PERIOD, self.chart)
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.exists(previous)
+        pipe.zcard(self.key)
+        has_previous, length = pipe.execute()
+        if has_previous:
+            roll_over_charts(self.connection, self.epoch, (self.chart, ))
+            length = self.connection.zcard(self.key)
+        return length
+
+    def __getitem__(self, item: slice) -> List[Song]:
+        """Returns songs of chart slice with decayed 'trending_score'."""
+        start, stop = item.start or 0, item.stop
+        if stop is not None and stop <= start:
+            return []
+        scores = self.connection.zrevrange(
+            self.key, start, -1 if stop is None else stop - 1, withscores=True
+        )
+        songs = Song.objects.select_related("artist").in_bulk(
+            [int(pk) for pk, _ in scores]
+        )
+        deleted = [pk for pk, _ in scores if int(pk) not in songs]
+        if deleted:
+            self.connection.zrem(self.key, *deleted)
+
+        decay = get_growth(self.now - self.epoch)
+        chart = []
+        for pk, score in scores:
+            if int(pk) in songs:
+                song = songs[int(pk)]
+                song.trending_score = score / decay
+                chart.append(song)
+        return chart
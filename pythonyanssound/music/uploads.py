@@ -0,0 +1,60 @@
+import time
+import uuid
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from blobs.services import acquire_blob, release_blob
+
+# references of completed resumable uploads to assembled audio blobs
+# ("<upload id> <reference id> <blob name>" scored by upload expiration time)
+RESUMABLE_UPLOAD_BLOBS_KEY = "resumable_upload_blobs"
+
+
+def get_resumable_upload_key(upload_id: str) -> str:
+    """Returns Redis key of resumable upload state hash."""
+    return f"resumable_upload:{upload_id}"
+
+
+def hold_resumable_upload_blob(upload_id: str, name: str) -> str:
+    """
+    Adds reference of completed resumable upload to assembled blob
+    (so it isn't deleted before song is created from upload),
+    returns reference released by 'release_resumable_upload_blob'.
+
+    Reference is released when song is created or upload expires
+    """
+    reference = f"{upload_id} {uuid.uuid4().hex} {name}"
+    acquire_blob(name)
+    get_redis_connection("default").zadd(
+        RESUMABLE_UPLOAD_BLOBS_KEY,
+        {reference: time.time() + settings.APP_RESUMABLE_UPLOAD_EXPIRE}
+    )
+    return reference
+
+
+def release_resumable_upload_blob(reference: str) -> bool:
+    """
+    Removes resumable upload reference to assembled blob,
+    returns False if it has been already removed.
+    """
+    if not get_redis_connection("default").zrem(RESUMABLE_UPLOAD_BLOBS_KEY, reference):
+        return False
+    release_blob(reference.split(" ", 2)[2])
+    return True
+
+
+def release_expired_resumable_uploads() -> int:
+    """
+    Removes references of expired resumable uploads to assembled blobs,
+    returns number of released blobs.
+    """
+    redis = get_redis_connection("default")
+    released = 0
+    for reference in redis.zrangebyscore(RESUMABLE_UPLOAD_BLOBS_KEY, "-inf", time.time()):
+        reference = reference.decode()
+        # upload state expires a bit later (after offset is moved)
+        if redis.exists(get_resumable_upload_key(reference.split(" ", 1)[0])):
+            continue
+        released += release_resumable_upload_blob(reference)
+    return released
@@ -2,7 +2,10 @@ from django.urls import path
 
 from music.views import (
     SongDetailsUpdateDeleteView, SongsListCreateView, LikedSongsListView,
-    LikeSongView, SongsNewReleasesView
+    LikeSongView, SongsNewReleasesView, SongAudioUploadView,
+    SongResumableUploadCreateView, SongResumableUploadView, LikeSongsBulkView,
+    ListenSongView, TrendingSongsView, GenreChartView, GenresListView,
+    GenreSongsListView
 )
 
 urlpatterns = [
@@ -11,16 +14,41 @@ urlpatterns = [
         view=SongsListCreateView.as_view(),
         name="songs-list-create"
     ),
+    path(
+        route='uploads/',
+        view=SongAudioUploadView.as_view(),
+        name="songs-audio-upload"
+    ),
+    path(
+        route='resumable-uploads/',
+        view=SongResumableUploadCreateView.as_view(),
+        name="songs-resumable-upload-create"
+    ),
+    path(
+        route='resumable-uploads/<str:upload_id>/',
+        view=SongResumableUploadView.as_view(),
+        name="songs-resumable-upload"
+    ),
     path(
         route='<int:song_id>/',
         view=SongDetailsUpdateDeleteView.as_view(),
         name="songs-detail-update-delete"
     ),
+    path(
+        route='<int:song_id>/listens/',
+        view=ListenSongView.as_view(),
+        name="songs-listens"
+    ),
     path(
         route='likes/',
         view=LikedSongsListView.as_view(),
         name="songs-likes"
     ),
+    path(
+        route='likes/bulk/',
+        view=LikeSongsBulkView.as_view(),
+        name="songs-likes-bulk-management"
+    ),
     path(
         route='likes/<int:song_id>/',
         view=LikeSongView.as_view(),
@@ -31,4 +59,24 @@ urlpatterns = [
         view=SongsNewReleasesView.as_view(),
         name="songs-releases"
     ),
+    path(
+        route='trending/',
+        view=TrendingSongsView.as_view(),
+        name="songs-trending"
+    ),
+    path(
+        route='charts/<int:genre_id>/',
+        view=GenreChartView.as_view(),
+        name="songs-genre-chart"
+    ),
+    path(
+        route='genres/',
+        view=GenresListView.as_view(),
+        name="genres-list"
+    ),
+    path(
+        route='genres/<int:genre_id>/songs/',
+        view=GenreSongsListView.as_view(),
+        name="genre-songs"
+    ),
 ]
@@ -1,3 +1,5 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
 
 
 def song_upload_folder(song_instance, filename: str):
@@ -5,6 +7,9 @@ def song_upload_folder(song_instance, filename: str):
     return f'music/{song_instance.artist.pk}/songs/{filename}'
 
 
-def song_cover_upload_folder(song_instance, filename: str):
-    """Returns path to upload Song cover image file."""
-    return f'music/{song_instance.artist.pk}/covers/{filename}'
+def get_integer_header(request: Request, header: str) -> int:
+    """Returns value of request header which must be non-negative integer."""
+    value = request.headers.get(header, "")
+    if not value.isdigit():
+        raise ValidationError({header: ["Header must be non-negative integer."]})
+    return int(value)
@@ -2,21 +2,42 @@ from datetime import timedelta
 
 from django.db.models import Exists, OuterRef, BooleanField, Case
 from django.utils import timezone
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import status
+from rest_framework.exceptions import UnsupportedMediaType, NotFound
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from music.models import Song
+from music.models import Song, SongChart
 from music.permissions import IsSongOwner, IsArtist
 from music.serializers import (
-    SongSerializer, SongCreateUpdateDeleteSerializer, SongLikeSerializer
+    SongSerializer, SongCreateUpdateDeleteSerializer, SongLikeSerializer,
+    SongDetailsSerializer, TrendingSongSerializer, TrendingQuerySerializer,
+    ChartSongSerializer, ChartQuerySerializer, GenreSerializer
 )
-from music.services import get_paginated_songs_list_response
+from music.services import (
+    get_paginated_songs_list_response, create_song_audio_upload,
+    create_song_from_direct_upload, create_resumable_upload,
+    get_resumable_upload, append_resumable_upload_chunk,
+    create_song_from_resumable_upload, get_bulk_song_ids, like_songs,
+    unlike_songs, like_song, unlike_song, listen_song
+)
+from music.genres import get_genres, get_genre, get_genres_songs_counts
+from music.trending import TrendingChart
+from music.utils import get_integer_header
+from profiles.likes import LIKED_SONGS, set_is_liked
 from profiles.models import SongLike
-from pythonyanssound.pagination import CustomPageNumberPagination
+from pythonyanssound.pagination import (
+    CustomPageNumberPagination, KeysetPagination
+)
+from pythonyanssound.tasks import schedule_thumbnails_generation
+from pythonyanssound.versions import (
+    ContentValidators, content_version_key, artist_version_key, relations_version_key
+)
 
 
 class SongsListCreateView(APIView):
@@ -37,28 +58,140 @@ class SongsListCreateView(APIView):
         return get_paginated_songs_list_response(request, self)
 
     def post(self, request: Request):
-        """Creates new song for authenticated user."""
+        """
+        Creates new song for authenticated user.
+
+        Song audio is either uploaded with request,
+        or has been uploaded directly to storage before ('audio_key'),
+        or has been uploaded with resumable upload ('resumable_upload_id')
+        """
+        if "audio_key" in request.data:
+            data = create_song_from_direct_upload(request)
+            return Response(data, status=status.HTTP_201_CREATED)
+        if "resumable_upload_id" in request.data:
+            data = create_song_from_resumable_upload(request)
+            return Response(data, status=status.HTTP_201_CREATED)
         serializer = SongCreateUpdateDeleteSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(artist=request.user)
+        song = serializer.save(artist=request.user)
+        schedule_thumbnails_generation(song, "cover")
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class SongAudioUploadView(APIView):
+    """
+    Processes POST method to start direct upload of song audio file
+    to storage with presigned multipart upload URLs.
+    """
+    permission_classes = [IsAuthenticated, IsArtist]
+
+    def post(self, request: Request):
+        """Returns audio key, upload id and presigned URLs of file parts."""
+        data = create_song_audio_upload(request)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class SongResumableUploadCreateView(APIView):
+    """
+    Processes POST method to start tus-like resumable upload
+    of song audio file (total size passed with 'Upload-Length' header).
+    """
+    permission_classes = [IsAuthenticated, IsArtist]
+
+    def post(self, request: Request):
+        """Creates resumable upload and returns its URL ('Location')."""
+        upload_id = create_resumable_upload(
+            request.user, get_integer_header(request, "Upload-Length")
+        )
+        location = reverse(
+            "songs-resumable-upload", kwargs={"upload_id": upload_id}
+        )
+        return Response(
+            data={"resumable_upload_id": upload_id},
+            status=status.HTTP_201_CREATED,
+            headers={
+                "Location": request.build_absolute_uri(location),
+                "Tus-Resumable": settings.APP_TUS_VERSION
+            }
+        )
+
+
+class SongResumableUploadView(APIView):
+    """
+    Processes HEAD/PATCH methods to get offset of/append chunk to
+    resumable upload of song audio file.
+    """
+    permission_classes = [IsAuthenticated, IsArtist]
+
+    def head(self, request: Request, upload_id: str):
+        """Returns number of received bytes ('Upload-Offset')."""
+        upload = get_resumable_upload(upload_id, request.user)
+        return Response(headers={
+            "Upload-Offset": upload["offset"],
+            "Upload-Length": upload["length"],
+            "Cache-Control": "no-store",
+            "Tus-Resumable": settings.APP_TUS_VERSION
+        })
+
+    def patch(self, request: Request, upload_id: str):
+        """
+        Appends chunk passed as request body to upload at 'Upload-Offset'.
+
+        Audio file is assembled when the last chunk is received,
+        after that song can be created with 'resumable_upload_id'
+        """
+        if request.content_type != "application/offset+octet-stream":
+            raise UnsupportedMediaType(request.content_type)
+        if (
+            get_integer_header(request, "Content-Length")
+            > settings.APP_RESUMABLE_CHUNK_MAX_SIZE
+        ):
+            return Response(
+                data={"detail": "Chunk is too large."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        offset = get_integer_header(request, "Upload-Offset")
+        chunk = request.stream.read() if request.stream else b""
+
+        new_offset = append_resumable_upload_chunk(
+            upload_id, request.user, offset, chunk
+        )
+        return Response(
+            status=status.HTTP_204_NO_CONTENT,
+            headers={
+                "Upload-Offset": new_offset,
+                "Tus-Resumable": settings.APP_TUS_VERSION
+            }
+        )
+
+
 class SongDetailsUpdateDeleteView(APIView):
     """Processes GET/PUT/DELETE method to retrieve/update/delete song."""
     permission_classes = [IsAuthenticated, IsSongOwner]
-    serializer_class = SongSerializer
+    serializer_class = SongDetailsSerializer
 
     def get(self, request: Request, song_id: int):
-        """Returns song identified by 'song_id' parameter."""
+        """
+        Returns song identified by 'song_id' parameter.
+
+        Responds with 304 (Not Modified) if song hasn't changed
+        since request 'If-None-Match'/'If-Modified-Since' validators
+        """
         # custom exception handler takes care about ObjectDoesNotExist
-        song = Song.objects.annotate(
-            is_liked=Exists(
-                request.user.liked_songs.filter(pk=OuterRef("pk"))
-            )
-        ).get(pk=song_id)
+        artist_id = Song.objects.values_list("artist_id", flat=True).get(pk=song_id)
+        validators = ContentValidators(request, (
+            content_version_key(Song, song_id),
+            artist_version_key(artist_id),
+            relations_version_key(request.user.pk)
+        ))
+        not_modified = validators.get_not_modified_response()
+        if not_modified is not None:
+            return not_modified
+
+        song = Song.objects.get(pk=song_id)
+        set_is_liked((song, ), request.user, LIKED_SONGS)
         serializer = self.serializer_class(instance=song)
-        return Response(serializer.data)
+        return validators.set_headers(Response(serializer.data))
 
     def put(self, request: Request, song_id: int):
         """
@@ -73,6 +206,7 @@ class SongDetailsUpdateDeleteView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        schedule_thumbnails_generation(song, "cover")
         return Response(serializer.data)
 
     def delete(self, request: Request, song_id: int):
@@ -96,7 +230,7 @@ class LikedSongsListView(ListAPIView):
 
     def get_queryset(self):
         """Returns queryset of liked songs by user."""
-        return SongLike.objects.annotate(
+        return SongLike.objects.select_related("song__artist").annotate(
             is_liked=Case(default=True, output_field=BooleanField())
         ).filter(profile=self.request.user)
 
@@ -106,21 +240,50 @@ class LikeSongView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request: Request, song_id: int):
-        """Appends Song with 'song_id' to liked song list."""
-        song = Song.objects.get(pk=song_id)
-
-        request.user.liked_songs.add(song)
-        return Response(
-            data={"message": f"Song successful added to liked list"}
-        )
+        """Appends Song with 'song_id' to liked song list (idempotent)."""
+        like_song(request.user, song_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     def delete(self, request: Request, song_id: int):
-        """Removes Song with 'song_id' from liked song list."""
-        song = Song.objects.get(pk=song_id)
-        request.user.liked_songs.remove(song)
-        return Response(
-            data={"message": f"Song successful removed from liked list."}
-        )
+        """Removes Song with 'song_id' from liked song list (idempotent)."""
+        unlike_song(request.user, song_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ListenSongView(APIView):
+    """Processes POST method to count listen of song."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request, song_id: int):
+        """Counts user's listen of Song with 'song_id' (trending charts too)."""
+        listen_song(request.user, song_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class LikeSongsBulkView(APIView):
+    """
+    Processes POST/DELETE methods to add/remove list of songs
+    to/from like list.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request):
+        """
+        Appends songs with 'song_ids' to liked song list.
+
+        Returns status of every song ('liked', 'already_liked', 'not_found')
+        """
+        results = like_songs(request.user, get_bulk_song_ids(request))
+        return Response(data={"results": results})
+
+    def delete(self, request: Request):
+        """
+        Removes songs with 'song_ids' from liked song list.
+
+        Returns status of every song ('unliked', 'not_liked', 'not_found')
+        """
+        results = unlike_songs(request.user, get_bulk_song_ids(request))
+        return Response(data={"results": results})
 
 
 class SongsNewReleasesView(ListAPIView):
@@ -138,11 +301,82 @@ class SongsNewReleasesView(ListAPIView):
         return Song.objects.annotate(
             is_followed_on_artist=Exists(
                 self.request.user.followings.filter(pk=OuterRef("artist"))
-            ),
-            is_liked=Exists(
-                self.request.user.liked_songs.filter(pk=OuterRef("pk"))
             )
         ).filter(
             is_followed_on_artist=True,
             creation_date__gte=one_week_ago
         ).order_by("-creation_date", "title")[:10]
+
+
+class TrendingSongsView(ListAPIView):
+    """
+    Processes GET method to obtain trending songs
+    (all songs or songs of 'genre' query parameter).
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = TrendingSongSerializer
+    pagination_class = CustomPageNumberPagination
+
+    def get_queryset(self):
+        """Returns chart of songs with highest decayed listens/likes scores."""
+        serializer = TrendingQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return TrendingChart(serializer.validated_data.get("genre"))
+
+
+class GenreChartView(ListAPIView):
+    """
+    Processes GET method to obtain weekly or all-time ('period'
+    query parameter) chart of genre songs.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ChartSongSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        """
+        Returns charts rows of genre songs in index order
+        (paged by keyset of ordering field and song id):
+        by likes during last week or by all-time score.
+        """
+        serializer = ChartQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        charts = SongChart.objects.filter(
+            genre_id=self.kwargs["genre_id"]
+        ).select_related("song__artist")
+        if serializer.validated_data["period"] == "week":
+            return charts.filter(week_likes_count__gt=0).order_by("-week_likes_count", "-song_id")
+        return charts.order_by("-score", "-song_id")
+
+
+class GenresListView(APIView):
+    """Processes GET method to obtain genres with numbers of their songs."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request: Request):
+        """
+        Returns genres ordered by name (in-process cache)
+        with songs counts (counters table, one query).
+        """
+        counts = get_genres_songs_counts()
+        serializer = GenreSerializer(
+            instance=[
+                {"id": genre.pk, "genre": genre.genre, "songs_count": counts.get(genre.pk, 0)}
+                for genre in get_genres()
+            ],
+            many=True
+        )
+        return Response(data=serializer.data)
+
+
+class GenreSongsListView(ListAPIView):
+    """Processes GET method to obtain genre songs (newest first)."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = SongSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        """Returns queryset of genre songs paged by keyset of creation date."""
+        if get_genre(self.kwargs["genre_id"]) is None:
+            raise NotFound("Genre not found.")
+        return Song.objects.filter(genre_id=self.kwargs["genre_id"]).select_related("artist")
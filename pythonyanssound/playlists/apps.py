@@ -5,3 +5,7 @@ class PlaylistsConfig(AppConfig):
     """Playlists Django application config."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'playlists'
+
+    def ready(self):
+        # connects content versions signal receivers
+        from playlists import signals  # noqa: F401
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import pythonyanssound.validators
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('music', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Playlist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Playlist title name.')),
+                ('cover', models.ImageField(blank=True, upload_to='', validators=[pythonyanssound.validators.validate_image_resolution, pythonyanssound.validators.validate_file_size], verbose_name='Playlist cover image link (saved to S3 bucket).')),
+                ('creation_date', models.DateTimeField(auto_now_add=True, verbose_name='Playlist creation date.')),
+            ],
+            options={
+                'db_table': 'playlists',
+            },
+        ),
+        migrations.CreateModel(
+            name='SongInPlaylist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('adding_date', models.DateTimeField(auto_now_add=True, verbose_name='Date of Song adding to Playlist.')),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='songs_through', to='playlists.playlist', verbose_name='Playlist instance which contains song.')),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playlists_through', to='music.song', verbose_name='Song instance added to Playlist')),
+            ],
+            options={
+                'db_table': 'playlists_songs',
+                'ordering': ('-adding_date',),
+            },
+        ),
+    ]
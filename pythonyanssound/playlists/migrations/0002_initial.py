@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('music', '0002_initial'),
+        ('playlists', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playlists', to=settings.AUTH_USER_MODEL, verbose_name='Profile instance which owns playlist.'),
+        ),
+        migrations.AddField(
+            model_name='playlist',
+            name='songs',
+            field=models.ManyToManyField(blank=True, related_name='playlists', through='playlists.SongInPlaylist', to='music.Song', verbose_name='List of songs in playlist.'),
+        ),
+    ]
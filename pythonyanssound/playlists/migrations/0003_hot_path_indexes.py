@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playlist',
+            index=models.Index(fields=['owner', 'title'], name='playlists_owner_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='songinplaylist',
+            index=models.Index(fields=['playlist', '-adding_date'], name='playlists_songs_date_idx'),
+        ),
+    ]
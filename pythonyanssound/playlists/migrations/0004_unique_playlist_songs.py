@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:07
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_playlist_songs(apps, schema_editor):
+    """Keeps the first adding of the same song to playlist."""
+    SongInPlaylist = apps.get_model("playlists", "SongInPlaylist")
+    duplicates = SongInPlaylist.objects.values("playlist", "song").annotate(
+        songs_count=Count("pk"), first_pk=Min("pk")
+    ).filter(songs_count__gt=1)
+    for duplicate in duplicates.iterator():
+        SongInPlaylist.objects.filter(
+            playlist=duplicate["playlist"], song=duplicate["song"]
+        ).exclude(pk=duplicate["first_pk"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_playlist_songs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='songinplaylist',
+            constraint=models.UniqueConstraint(fields=('playlist', 'song'), name='playlists_songs_playlist_song_uniq'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+# APP_PLAYLIST_POSITION_GAP at the moment of migration
+POSITION_GAP = 2 ** 16
+
+
+def set_positions_by_adding_date(apps, schema_editor):
+    """Numbers songs of every playlist in previous order (newest first)."""
+    SongInPlaylist = apps.get_model("playlists", "SongInPlaylist")
+    playlist_ids = SongInPlaylist.objects.values_list("playlist_id", flat=True).distinct()
+    for playlist_id in playlist_ids.iterator():
+        songs = list(
+            SongInPlaylist.objects.filter(
+                playlist_id=playlist_id
+            ).order_by("-adding_date", "-pk").only("pk")
+        )
+        for index, song in enumerate(songs, 1):
+            song.position = index * POSITION_GAP
+        SongInPlaylist.objects.bulk_update(songs, ["position"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0004_unique_playlist_songs'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='songinplaylist',
+            options={'ordering': ('position',)},
+        ),
+        migrations.RemoveIndex(
+            model_name='songinplaylist',
+            name='playlists_songs_date_idx',
+        ),
+        migrations.AddField(
+            model_name='songinplaylist',
+            name='position',
+            field=models.BigIntegerField(default=0, verbose_name='Song position in Playlist (ascending, with gaps).'),
+        ),
+        migrations.RunPython(set_positions_by_adding_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='songinplaylist',
+            index=models.Index(fields=['playlist', 'position'], name='playlists_songs_position_idx'),
+        ),
+    ]
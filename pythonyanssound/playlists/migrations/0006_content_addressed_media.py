@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-19 17:28
+
+import blobs.fields
+from django.db import migrations, models
+import pythonyanssound.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0005_songs_positions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Playlist cover thumbnails names (by size and format).'),
+        ),
+        migrations.AlterField(
+            model_name='playlist',
+            name='cover',
+            field=blobs.fields.ContentAddressedImageField(blank=True, upload_to='', validators=[pythonyanssound.validators.validate_image_resolution, pythonyanssound.validators.validate_file_size], verbose_name='Playlist cover image link (saved to S3 bucket).'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-19 17:48
+
+import blobs.fields
+from django.db import migrations
+import pythonyanssound.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0006_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='playlist',
+            name='cover',
+            field=blobs.fields.ContentAddressedImageField(blank=True, thumbnails_field='thumbnails', upload_to='', validators=[pythonyanssound.validators.validate_image_resolution, pythonyanssound.validators.validate_file_size], verbose_name='Playlist cover image link (saved to S3 bucket).'),
+        ),
+    ]
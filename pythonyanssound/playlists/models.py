@@ -1,9 +1,9 @@
 from django.db.models import (
-    Model, CharField, ImageField, ForeignKey, CASCADE, ManyToManyField,
-    DateTimeField
+    Model, CharField, ForeignKey, CASCADE, ManyToManyField,
+    DateTimeField, JSONField, Index, UniqueConstraint, BigIntegerField
 )
 
-from playlists.utils import playlist_cover_upload_folder
+from blobs.fields import ContentAddressedImageField
 from pythonyanssound.validators import (
     validate_image_resolution, validate_file_size
 )
@@ -17,11 +17,17 @@ class Playlist(Model):
         max_length=255,
         blank=False
     )
-    cover = ImageField(
+    cover = ContentAddressedImageField(
         verbose_name="Playlist cover image link (saved to S3 bucket).",
         blank=True,
         validators=(validate_image_resolution, validate_file_size),
-        upload_to=playlist_cover_upload_folder
+        thumbnails_field="thumbnails"
+    )
+    thumbnails = JSONField(
+        verbose_name="Playlist cover thumbnails names (by size and format).",
+        default=dict,
+        blank=True,
+        editable=False
     )
     creation_date = DateTimeField(
         verbose_name="Playlist creation date.",
@@ -51,6 +57,10 @@ class Playlist(Model):
     class Meta:
         """Additional settings for model."""
         db_table = "playlists"
+        indexes = (
+            # owner's playlists ordered by title
+            Index(fields=("owner", "title"), name="playlists_owner_title_idx"),
+        )
 
 
 class SongInPlaylist(Model):
@@ -59,13 +69,20 @@ class SongInPlaylist(Model):
     (Song is included to playlist/Playlist contains song).
 
     Model used as separate table to describe relation
-    Extend common M2M relation with 'adding_date'
+    Extend common M2M relation with 'adding_date' and 'position'
+
+    Songs are ordered by gapped positions, so song is moved
+    by updating its position only (see playlists.services)
     """
     # Primitive fields
     adding_date = DateTimeField(
         verbose_name="Date of Song adding to Playlist.",
         auto_now_add=True
     )
+    position = BigIntegerField(
+        verbose_name="Song position in Playlist (ascending, with gaps).",
+        default=0
+    )
     # ForeignKey fields
     playlist = ForeignKey(
         verbose_name="Playlist instance which contains song.",
@@ -83,4 +100,13 @@ class SongInPlaylist(Model):
     class Meta:
         """Additional settings for model."""
         db_table = "playlists_songs"
-        ordering = ("-adding_date",)
+        ordering = ("position",)
+        indexes = (
+            # playlist songs in default ordering
+            Index(fields=("playlist", "position"), name="playlists_songs_position_idx"),
+        )
+        constraints = (
+            UniqueConstraint(
+                fields=("playlist", "song"), name="playlists_songs_playlist_song_uniq"
+            ),
+        )
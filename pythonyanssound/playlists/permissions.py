@@ -14,4 +14,4 @@ class IsPlaylistOwner(BasePermission):
         """
         if request.method in SAFE_METHODS:
             return True
-        return obj.owner == request.user
+        return obj.owner_id == request.user.pk
@@ -1,10 +1,17 @@
-from django.db.models import Exists, OuterRef
-from rest_framework.fields import SerializerMethodField, BooleanField
-from rest_framework.serializers import ModelSerializer
-
-from music.serializers import SongSerializer, SongWithoutLikeSerializer
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import (
+    SerializerMethodField, BooleanField, IntegerField, CharField
+)
+from rest_framework.serializers import ModelSerializer, Serializer
+
+from music.serializers import (
+    SongSerializer, SongWithoutLikeSerializer, LikedSongsListSerializer
+)
 from playlists.models import Playlist, SongInPlaylist
 from profiles.models import Profile
+from pythonyanssound.serializers import (
+    ThumbnailField, MediaURLsListSerializer
+)
 
 
 class PlaylistOwnerSerializer(ModelSerializer):
@@ -14,12 +21,18 @@ class PlaylistOwnerSerializer(ModelSerializer):
         fields = ("id", "username")
 
 
+class LikedSongsInPlaylistListSerializer(LikedSongsListSerializer):
+    """Resolves 'is_liked' of songs added to playlist."""
+    song_pk_attr = "song_id"
+
+
 class SongInPlaylistSerializer(ModelSerializer):
     song = SongWithoutLikeSerializer()
     is_liked = BooleanField(default=False)
 
     class Meta:
         model = SongInPlaylist
+        list_serializer_class = LikedSongsInPlaylistListSerializer
         fields = ("id", "song", "adding_date", "is_liked")
 
 
@@ -27,18 +40,17 @@ class PlaylistDetailsSerializer(ModelSerializer):
     songs = SerializerMethodField("annotate_songs_with_likes")
     owner = PlaylistOwnerSerializer()
     is_liked = BooleanField(default=False)
+    cover_thumbnail = ThumbnailField("cover", 256)
 
     class Meta:
         model = Playlist
-        fields = "__all__"
+        exclude = ("thumbnails", )
         read_only_fields = ("id", "title", "cover", "owner", "songs", "creation_date")
 
     def annotate_songs_with_likes(self, instance: Playlist):
-        profile = self.context.get("request").user
-        # use m2m through model to order by adding date
-        songs = instance.songs_through.annotate(
-            is_liked=Exists(profile.liked_songs.filter(pk=OuterRef("song__pk")))
-        )
+        # use m2m through model to order by position,
+        # 'is_liked' is resolved by list serializer
+        songs = instance.songs_through.select_related("song__artist")
         serializer = SongInPlaylistSerializer(instance=songs, many=True, context=self.context)
         return serializer.data
 
@@ -47,17 +59,19 @@ class PlaylistCreateUpdateDeleteSerializer(ModelSerializer):
 
     class Meta:
         model = Playlist
-        fields = "__all__"
+        exclude = ("thumbnails", )
         read_only_fields = ("id", "songs", "owner", "creation_date")
 
 
 class ListPlaylistsSerializer(ModelSerializer):
 
     owner = PlaylistOwnerSerializer()
+    cover_thumbnail = ThumbnailField("cover", 64)
 
     class Meta:
         model = Playlist
-        fields = ("id", "title", "owner", "cover")
+        list_serializer_class = MediaURLsListSerializer
+        fields = ("id", "title", "owner", "cover", "cover_thumbnail")
         read_only_fields = ("id", "title", "owner", "cover", "creation_date")
 
 
@@ -67,3 +81,17 @@ class ShortListPlaylistsSerializer(ModelSerializer):
         model = Playlist
         fields = ("id", "title", )
         read_only_fields = ("id", "title")
+
+
+class SongMovePlaylistSerializer(Serializer):
+    before = IntegerField(min_value=1, required=False)
+    after = IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs: dict):
+        if len(attrs) != 1:
+            raise ValidationError("Either 'before' or 'after' song id is required.")
+        return attrs
+
+
+class PlaylistForkSerializer(Serializer):
+    title = CharField(max_length=255, required=False)
@@ -0,0 +1,266 @@
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Exists, OuterRef, Min, Subquery, F, Value, DateTimeField,
+    BigIntegerField, ExpressionWrapper
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError, PermissionDenied
+
+from music.models import Song
+from music.services import get_bulk_results
+from playlists.models import Playlist, SongInPlaylist
+from playlists.tasks import rebalance_playlist_positions_task
+from profiles.likes import LIKED_PLAYLISTS, add_likes, remove_likes
+from profiles.models import Profile
+from pythonyanssound.db import insert_from_select, delete_rows
+from pythonyanssound.versions import (
+    bump_content_versions, content_version_key, relations_version_key
+)
+
+PlaylistLike = Profile.liked_playlists.through
+
+
+def get_top_position(playlist: Playlist, songs_count: int = 1) -> int:
+    """
+    Returns position of the first of 'songs_count' songs
+    added on top of playlist (new songs are shown first).
+    """
+    top = SongInPlaylist.objects.filter(
+        playlist=playlist
+    ).aggregate(top=Min("position"))["top"]
+    gap = settings.APP_PLAYLIST_POSITION_GAP
+    return (gap if top is None else top) - gap * songs_count
+
+
+def get_playlist_artist_ids(playlist_id: int) -> set:
+    """Returns ids of Profiles shown in playlist details (owner and songs artists)."""
+    return set(
+        Playlist.objects.filter(pk=playlist_id).order_by().values_list("owner_id", flat=True).union(
+            SongInPlaylist.objects.filter(
+                playlist_id=playlist_id
+            ).order_by().values_list("song__artist_id", flat=True)
+        )
+    )
+
+
+def get_songs_in_playlist(playlist: Playlist, song_ids: List[int]) -> dict:
+    """Returns {song id: is added to playlist} of existing songs."""
+    return dict(
+        Song.objects.filter(pk__in=song_ids).annotate(
+            is_added=Exists(
+                SongInPlaylist.objects.filter(playlist=playlist, song=OuterRef("pk"))
+            )
+        ).values_list("pk", "is_added")
+    )
+
+
+def add_songs_to_playlist(playlist: Playlist, song_ids: List[int]) -> List[dict]:
+    """
+    Appends songs to playlist, returns per song results.
+
+    Songs are validated with one query and added with one insert
+    (concurrently added songs are skipped by unique constraint)
+    """
+    songs = get_songs_in_playlist(playlist, song_ids)
+    new_ids = [pk for pk in song_ids if pk in songs and not songs[pk]]
+    if new_ids:
+        top = get_top_position(playlist, len(new_ids))
+        gap = settings.APP_PLAYLIST_POSITION_GAP
+        SongInPlaylist.objects.bulk_create(
+            (
+                SongInPlaylist(playlist=playlist, song_id=pk, position=top + index * gap)
+                for index, pk in enumerate(new_ids)
+            ),
+            ignore_conflicts=True
+        )
+        bump_content_versions((content_version_key(Playlist, playlist.pk), ))
+    return get_bulk_results(song_ids, songs, new_ids, ("added", "already_added"))
+
+
+def remove_songs_from_playlist(playlist: Playlist, song_ids: List[int]) -> List[dict]:
+    """
+    Removes songs from playlist, returns per song results.
+
+    Songs are validated with one query and removed with one delete
+    """
+    songs = get_songs_in_playlist(playlist, song_ids)
+    added_ids = [pk for pk in song_ids if pk in songs and songs[pk]]
+    if added_ids:
+        SongInPlaylist.objects.filter(playlist=playlist, song_id__in=added_ids).delete()
+    return get_bulk_results(song_ids, songs, added_ids, ("removed", "not_added"))
+
+
+def check_playlist_song(owner: Profile, playlist_id: int, song_id: int) -> None:
+    """
+    Explains with one query why write of playlist song changed nothing:
+    raises NotFound for missing playlist or song
+    and PermissionDenied if playlist isn't owned by 'owner'.
+    """
+    playlist = Playlist.objects.filter(pk=playlist_id).annotate(
+        has_song=Exists(Song.objects.filter(pk=song_id))
+    ).values_list("owner_id", "has_song").first()
+    if playlist is None:
+        raise NotFound("Playlist not found.")
+    owner_id, has_song = playlist
+    if owner_id != owner.pk:
+        raise PermissionDenied()
+    if not has_song:
+        raise NotFound("Song not found.")
+
+
+def add_song_to_playlist(owner: Profile, playlist_id: int, song_id: int) -> None:
+    """
+    Appends song on top of owner's playlist with one INSERT ... SELECT
+    (adding added song changes nothing).
+
+    Playlist ownership and top position are selected by subqueries,
+    playlist and song are checked only if nothing was inserted
+    """
+    gap = Value(settings.APP_PLAYLIST_POSITION_GAP, output_field=BigIntegerField())
+    top = SongInPlaylist.objects.filter(
+        playlist_id=playlist_id
+    ).order_by("position").values("position")[:1]
+    added = insert_from_select(
+        SongInPlaylist,
+        Song.objects.filter(
+            Exists(Playlist.objects.filter(pk=playlist_id, owner=owner)), pk=song_id
+        ),
+        playlist=Value(playlist_id), song=F("pk"),
+        position=ExpressionWrapper(
+            Coalesce(Subquery(top), gap) - gap, output_field=BigIntegerField()
+        ),
+        adding_date=Value(timezone.now(), output_field=DateTimeField())
+    )
+    if added:
+        bump_content_versions((content_version_key(Playlist, playlist_id), ))
+    else:
+        check_playlist_song(owner, playlist_id, song_id)
+
+
+def remove_song_from_playlist(owner: Profile, playlist_id: int, song_id: int) -> None:
+    """
+    Removes song from owner's playlist with one DELETE
+    (removing not added song changes nothing).
+
+    Playlist and song are checked only if nothing was deleted
+    """
+    removed = delete_rows(
+        SongInPlaylist.objects.filter(
+            playlist_id=playlist_id, playlist__owner=owner, song_id=song_id
+        )
+    )
+    if removed:
+        bump_content_versions((content_version_key(Playlist, playlist_id), ))
+    else:
+        check_playlist_song(owner, playlist_id, song_id)
+
+
+def like_playlist(profile: Profile, playlist_id: int) -> None:
+    """
+    Appends playlist to Profile liked playlists with one INSERT ... SELECT
+    (liking liked playlist changes nothing).
+
+    Playlist existence is checked only if nothing was inserted
+    """
+    liked = insert_from_select(
+        PlaylistLike, Playlist.objects.filter(pk=playlist_id),
+        profile=Value(profile.pk), playlist=F("pk")
+    )
+    if liked:
+        add_likes(profile.pk, LIKED_PLAYLISTS, (playlist_id, ))
+        bump_content_versions((relations_version_key(profile.pk), ))
+    elif not Playlist.objects.filter(pk=playlist_id).exists():
+        raise NotFound("Playlist not found.")
+
+
+def unlike_playlist(profile: Profile, playlist_id: int) -> None:
+    """
+    Removes playlist from Profile liked playlists with one DELETE
+    (unliking not liked playlist changes nothing).
+
+    Playlist existence is checked only if nothing was deleted
+    """
+    unliked = delete_rows(PlaylistLike.objects.filter(profile=profile, playlist_id=playlist_id))
+    if unliked:
+        remove_likes(profile.pk, LIKED_PLAYLISTS, (playlist_id, ))
+        bump_content_versions((relations_version_key(profile.pk), ))
+    elif not Playlist.objects.filter(pk=playlist_id).exists():
+        raise NotFound("Playlist not found.")
+
+
+def move_song_in_playlist(
+        playlist: Playlist, song_id: int, anchor_song_id: int, after: bool
+) -> int:
+    """
+    Moves song before/after anchor song, returns new song position.
+
+    Anchor position and position of its neighbour are selected
+    with one query, moved song gets position between them (one row update)
+    Playlist is rebalanced in background when gap becomes too small
+    and immediately when there's no room between songs
+    """
+    if song_id == anchor_song_id:
+        raise ValidationError({"detail": "Song can't be moved next to itself."})
+
+    playlist_songs = SongInPlaylist.objects.filter(playlist=playlist)
+    neighbours = playlist_songs.exclude(song_id=song_id)
+    if after:
+        neighbour = neighbours.filter(position__gt=OuterRef("position")).order_by("position")
+    else:
+        neighbour = neighbours.filter(position__lt=OuterRef("position")).order_by("-position")
+    positions = playlist_songs.filter(song_id=anchor_song_id).annotate(
+        neighbour_position=Subquery(neighbour.values("position")[:1])
+    ).values_list("position", "neighbour_position").first()
+    if positions is None:
+        raise NotFound("Song is not in playlist.")
+
+    anchor_position, neighbour_position = positions
+    gap = settings.APP_PLAYLIST_POSITION_GAP
+    if neighbour_position is None:
+        position = anchor_position + gap if after else anchor_position - gap
+    else:
+        position = (anchor_position + neighbour_position) // 2
+        if position in (anchor_position, neighbour_position):
+            rebalance_playlist_positions_task(playlist.pk)
+            return move_song_in_playlist(playlist, song_id, anchor_song_id, after)
+
+    if not playlist_songs.filter(song_id=song_id).update(position=position):
+        raise NotFound("Song is not in playlist.")
+    if (
+            neighbour_position is not None
+            and abs(neighbour_position - anchor_position) < 2 * settings.APP_PLAYLIST_POSITION_MIN_GAP
+    ):
+        transaction.on_commit(lambda: rebalance_playlist_positions_task.delay(playlist.pk))
+    bump_content_versions((content_version_key(Playlist, playlist.pk), ))
+    return position
+
+
+def copy_playlist_songs(source_pk: int, target_pk: int) -> int:
+    """
+    Copies songs (with positions) of playlist to other playlist
+    with one INSERT ... SELECT, returns number of copied songs.
+    """
+    return insert_from_select(
+        SongInPlaylist, SongInPlaylist.objects.filter(playlist_id=source_pk),
+        playlist=Value(target_pk), song=F("song_id"), position=F("position"),
+        adding_date=Value(timezone.now(), output_field=DateTimeField())
+    )
+
+
+def fork_playlist(playlist: Playlist, owner: Profile, title: Optional[str] = None) -> Playlist:
+    """
+    Creates copy of playlist (with its cover and songs) owned by 'owner'.
+
+    Playlist and its songs are created in one transaction,
+    songs are copied on database side
+    """
+    with transaction.atomic():
+        fork = Playlist.objects.create(
+            title=title or playlist.title, owner=owner, cover=playlist.cover.name
+        )
+        copy_playlist_songs(playlist.pk, fork.pk)
+    return fork
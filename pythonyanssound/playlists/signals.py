@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from playlists.models import Playlist, SongInPlaylist
+from profiles.models import Profile
+from pythonyanssound.versions import content_version_key, bump_content_versions
+
+
+@receiver(post_save, sender=Playlist)
+@receiver(post_delete, sender=Playlist)
+def bump_playlist_versions(sender, instance: Playlist, **kwargs):
+    """Bumps versions of playlist and its owner Profile (shows playlists)."""
+    bump_content_versions((
+        content_version_key(Playlist, instance.pk),
+        content_version_key(Profile, instance.owner_id)
+    ))
+
+
+@receiver(post_save, sender=SongInPlaylist)
+@receiver(post_delete, sender=SongInPlaylist)
+def bump_song_in_playlist_versions(sender, instance: SongInPlaylist, **kwargs):
+    """Bumps version of playlist which song is added to or removed from."""
+    bump_content_versions((content_version_key(Playlist, instance.playlist_id), ))
+
+
+@receiver(m2m_changed, sender=Playlist.songs.through)
+def bump_playlist_songs_versions(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    """Bumps versions of playlists with changed songs set."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        bump_content_versions((content_version_key(Playlist, instance.pk), ))
+    elif pk_set:
+        bump_content_versions(content_version_key(Playlist, pk) for pk in pk_set)
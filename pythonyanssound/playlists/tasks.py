@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import transaction
+
+from playlists.models import SongInPlaylist
+from pythonyanssound.celery import app
+
+
+@app.task
+def rebalance_playlist_positions_task(playlist_id: int) -> int:
+    """
+    Spreads positions of playlist songs 'APP_PLAYLIST_POSITION_GAP' apart
+    keeping their order, returns number of songs.
+
+    Runs when gaps between moved songs become too small
+    """
+    gap = settings.APP_PLAYLIST_POSITION_GAP
+    with transaction.atomic():
+        songs = list(
+            SongInPlaylist.objects.select_for_update().filter(
+                playlist_id=playlist_id
+            ).order_by("position", "-adding_date").only("pk", "position")
+        )
+        for index, song in enumerate(songs, 1):
+            song.position = index * gap
+        SongInPlaylist.objects.bulk_update(songs, ["position"], batch_size=1000)
+    return len(songs)
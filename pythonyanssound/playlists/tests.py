@@ -1,9 +1,13 @@
+from unittest import mock
+
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from blobs.models import Blob
 from music.models import Song, Genre
-from playlists.models import Playlist
+from playlists.models import Playlist, SongInPlaylist
+from playlists.tasks import rebalance_playlist_positions_task
 from profiles.models import Profile
 from profiles.tokens import CustomRefreshToken
 
@@ -134,6 +138,34 @@ class PlaylistDetailsUpdateDeleteTestCase(APITestCase):
         response = self.client.get(reverse("playlist-management", kwargs={"playlist_id": self.playlist.pk}))
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_playlist_details_not_modified(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        url = reverse("playlist-management", kwargs={"playlist_id": self.playlist.pk})
+
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        artist = Profile.objects.create_user("artist@mail.ru", "test_artist", TEST_PASSWORD, is_artist=True)
+        song = Song.objects.create(
+            title="test_song", audio="test_uri", artist=artist, genre=Genre.objects.create(genre="test_genre")
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(
+                "playlists-songs-management", kwargs={"playlist_id": self.playlist.pk, "song_id": song.pk}
+            ))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["songs"]), 1)
+
+        # song shown in playlist is changed by artist
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            song.title = "new_title"
+            song.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_playlist_update(self):
         data = {
             "title": "new_test_title"
@@ -211,7 +243,48 @@ class SongAddRemovePlaylistTestCase(APITestCase):
             kwargs={"playlist_id": self.playlist.pk, "song_id": new_song.pk}
         ))
 
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_song_add_to_playlist_idempotent(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        new_song = Song.objects.create(title="second_song", audio="test_uri", genre=self.genre, artist=self.profile)
+        url = reverse("playlists-songs-management", kwargs={"playlist_id": self.playlist.pk, "song_id": new_song.pk})
+
+        # authentication and insert (with ownership and top position subqueries)
+        with self.assertNumQueries(2):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        positions = dict(SongInPlaylist.objects.filter(playlist=self.playlist).values_list("song_id", "position"))
+        self.assertEqual(len(positions), 2)
+        self.assertLess(positions[new_song.pk], positions[self.first_song.pk])
+
+        with self.assertNumQueries(2):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(SongInPlaylist.objects.filter(playlist=self.playlist, song=new_song).exists())
+
+    def test_song_add_remove_playlist_not_owner(self):
+        other = Profile.objects.create_user("other@mail.ru", "other_username", TEST_PASSWORD)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(CustomRefreshToken.for_user(other).access_token)}")
+        new_song = Song.objects.create(title="second_song", audio="test_uri", genre=self.genre, artist=self.profile)
+
+        response = self.client.post(reverse(
+            "playlists-songs-management", kwargs={"playlist_id": self.playlist.pk, "song_id": new_song.pk}
+        ))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.delete(reverse(
+            "playlists-songs-management", kwargs={"playlist_id": self.playlist.pk, "song_id": self.first_song.pk}
+        ))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            list(SongInPlaylist.objects.filter(playlist=self.playlist).values_list("song_id", flat=True)),
+            [self.first_song.pk]
+        )
 
     def test_song_add_to_playlist_unauthorized(self):
 
@@ -264,7 +337,7 @@ class SongAddRemovePlaylistTestCase(APITestCase):
             kwargs={"playlist_id": self.playlist.pk, "song_id": self.first_song.pk}
         ))
 
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
     def test_song_remove_from_playlist_unauthorized(self):
         response = self.client.delete(reverse(
@@ -295,6 +368,216 @@ class SongAddRemovePlaylistTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+class SongsBulkAddRemovePlaylistTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.profile = Profile.objects.create_user(
+            TEST_EMAIL,
+            TEST_USERNAME,
+            TEST_PASSWORD,
+            is_artist=True
+        )
+        self.playlist = Playlist.objects.create(title="test_playlist", owner=self.profile)
+        genre = Genre.objects.create(genre="test_genre")
+        self.songs = [
+            Song.objects.create(title=f"test_song_{i}", audio="test_uri", genre=genre, artist=self.profile)
+            for i in range(3)
+        ]
+        self.playlist.songs.add(self.songs[0])
+        self.url = reverse("playlists-songs-bulk-management", kwargs={"playlist_id": self.playlist.pk})
+        self.refresh_token = CustomRefreshToken.for_user(self.profile)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def test_songs_add_to_playlist(self):
+        song_ids = [song.pk for song in self.songs] + [69]
+        response = self.client.post(self.url, data={"song_ids": song_ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["already_added", "added", "added", "not_found"]
+        )
+        self.assertEqual(self.playlist.songs.count(), 3)
+
+    def test_songs_remove_from_playlist(self):
+        song_ids = [self.songs[0].pk, self.songs[1].pk, 69]
+        response = self.client.delete(self.url, data={"song_ids": song_ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["removed", "not_added", "not_found"]
+        )
+        self.assertFalse(self.playlist.songs.exists())
+
+    def test_songs_add_to_not_own_playlist(self):
+        other = Profile.objects.create_user("other_email@mail.ru", "other_username", TEST_PASSWORD)
+        playlist = Playlist.objects.create(title="other_playlist", owner=other)
+        response = self.client.post(
+            reverse("playlists-songs-bulk-management", kwargs={"playlist_id": playlist.pk}),
+            data={"song_ids": [self.songs[1].pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(playlist.songs.exists())
+
+    def test_songs_add_to_playlist_not_found(self):
+        response = self.client.post(
+            reverse("playlists-songs-bulk-management", kwargs={"playlist_id": 69}),
+            data={"song_ids": [self.songs[1].pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SongMovePlaylistTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.profile = Profile.objects.create_user(
+            TEST_EMAIL,
+            TEST_USERNAME,
+            TEST_PASSWORD,
+            is_artist=True
+        )
+        self.playlist = Playlist.objects.create(title="test_playlist", owner=self.profile)
+        genre = Genre.objects.create(genre="test_genre")
+        self.songs = [
+            Song.objects.create(title=f"test_song_{i}", audio="test_uri", genre=genre, artist=self.profile)
+            for i in range(4)
+        ]
+        self.refresh_token = CustomRefreshToken.for_user(self.profile)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        self.client.post(
+            reverse("playlists-songs-bulk-management", kwargs={"playlist_id": self.playlist.pk}),
+            data={"song_ids": [song.pk for song in self.songs]}, format="json"
+        )
+
+    def move(self, song: Song, **anchor):
+        return self.client.post(
+            reverse("playlists-songs-move", kwargs={"playlist_id": self.playlist.pk, "song_id": song.pk}),
+            data={key: value.pk for key, value in anchor.items()}, format="json"
+        )
+
+    def get_order(self) -> list:
+        response = self.client.get(reverse("playlist-management", kwargs={"playlist_id": self.playlist.pk}))
+        return [song["song"]["id"] for song in response.data["songs"]]
+
+    def test_added_songs_order(self):
+        self.assertEqual(self.get_order(), [song.pk for song in self.songs])
+        self.client.post(reverse(
+            "playlists-songs-management",
+            kwargs={"playlist_id": self.playlist.pk, "song_id": self.songs[0].pk}
+        ))
+        self.assertEqual(self.get_order(), [song.pk for song in self.songs])
+
+    def test_song_move(self):
+        first, second, third, fourth = self.songs
+        # anchor lookup and single row update
+        with self.assertNumQueries(4):
+            response = self.move(fourth, before=second)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_order(), [first.pk, fourth.pk, second.pk, third.pk])
+
+        self.move(first, after=third)
+        self.move(second, after=first)
+        self.assertEqual(self.get_order(), [fourth.pk, third.pk, first.pk, second.pk])
+
+    def test_song_move_rebalances_playlist(self):
+        first, second, third, fourth = self.songs
+        for position, song in enumerate(self.songs):
+            SongInPlaylist.objects.filter(playlist=self.playlist, song=song).update(position=position)
+
+        with mock.patch("playlists.services.rebalance_playlist_positions_task.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.move(fourth, after=first)
+        delay.assert_not_called()
+        self.assertEqual(self.get_order(), [first.pk, fourth.pk, second.pk, third.pk])
+        self.assertEqual(
+            list(self.playlist.songs_through.values_list("position", flat=True)),
+            [65536, 98304, 131072, 196608]
+        )
+        # small gap is rebalanced in background
+        for position, song in enumerate(self.songs):
+            SongInPlaylist.objects.filter(playlist=self.playlist, song=song).update(position=position * 10)
+        with mock.patch("playlists.services.rebalance_playlist_positions_task.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.move(third, after=first)
+        delay.assert_called_once_with(self.playlist.pk)
+        rebalance_playlist_positions_task(self.playlist.pk)
+        self.assertEqual(self.get_order(), [first.pk, third.pk, second.pk, fourth.pk])
+        self.assertEqual(
+            list(self.playlist.songs_through.values_list("position", flat=True)),
+            [65536, 131072, 196608, 262144]
+        )
+
+    def test_song_move_bad_request(self):
+        response = self.move(self.songs[0], before=self.songs[1], after=self.songs[2])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.move(self.songs[0], before=self.songs[0])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_song_move_not_found(self):
+        other_song = Song.objects.create(
+            title="other_song", audio="test_uri", genre=self.songs[0].genre, artist=self.profile
+        )
+        response = self.move(other_song, before=self.songs[0])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.move(self.songs[0], before=other_song)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PlaylistForkTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.owner = Profile.objects.create_user("owner_email@mail.ru", "owner_username", TEST_PASSWORD)
+        self.profile = Profile.objects.create_user(TEST_EMAIL, TEST_USERNAME, TEST_PASSWORD)
+        self.cover = Blob.objects.create(name="blobs/ab/cd/abcd.png", digest="abcd", size=1)
+        self.playlist = Playlist.objects.create(
+            title="test_playlist", owner=self.owner, cover=self.cover.name
+        )
+        genre = Genre.objects.create(genre="test_genre")
+        self.songs = [
+            Song.objects.create(title=f"test_song_{i}", audio="test_uri", genre=genre, artist=self.owner)
+            for i in range(20)
+        ]
+        SongInPlaylist.objects.bulk_create(
+            SongInPlaylist(playlist=self.playlist, song=song, position=-index)
+            for index, song in enumerate(self.songs)
+        )
+        self.refresh_token = CustomRefreshToken.for_user(self.profile)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def test_playlist_fork(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse("playlist-fork", kwargs={"playlist_id": self.playlist.pk}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        fork = Playlist.objects.get(pk=response.data["id"])
+        self.assertEqual(fork.owner, self.profile)
+        self.assertEqual(fork.title, self.playlist.title)
+        self.assertEqual(
+            list(fork.songs_through.values_list("song_id", flat=True)),
+            [song.pk for song in reversed(self.songs)]
+        )
+        self.assertEqual(self.playlist.songs.count(), len(self.songs))
+        # fork references the same cover blob, gets own thumbnails
+        self.assertEqual(fork.cover.name, self.cover.name)
+        self.cover.refresh_from_db()
+        self.assertEqual(self.cover.references, 2)
+        self.assertTrue(callbacks)
+
+    def test_playlist_fork_title(self):
+        response = self.client.post(
+            reverse("playlist-fork", kwargs={"playlist_id": self.playlist.pk}), data={"title": "fork"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["title"], "fork")
+
+    def test_playlist_fork_not_found(self):
+        response = self.client.post(reverse("playlist-fork", kwargs={"playlist_id": 69}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_playlist_fork_unauthorized(self):
+        self.client.credentials()
+        response = self.client.post(reverse("playlist-fork", kwargs={"playlist_id": self.playlist.pk}))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
 class LikedPlaylistsListTestCase(APITestCase):
 
     def setUp(self) -> None:
@@ -356,7 +639,7 @@ class LikeUnlikePlaylistTestCase(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
 
         response = self.client.post(reverse("liked-playlists-management", kwargs={"playlist_id": self.playlist.pk}))
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         response = self.client.get(reverse("liked-playlists"))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -376,7 +659,7 @@ class LikeUnlikePlaylistTestCase(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
 
         response = self.client.delete(reverse("liked-playlists-management", kwargs={"playlist_id": self.liked_playlist.pk}))
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         response = self.client.get(reverse("liked-playlists"))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
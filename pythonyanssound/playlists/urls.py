@@ -3,7 +3,8 @@ from django.urls import path
 from playlists.views import (
     PlaylistListCreateView, PlaylistRetrieveUpdateDeleteView,
     LikedPlaylistsListView, ShortPlaylistListView, LikeUnlikePlaylistView,
-    SongAddRemovePlaylistView
+    SongAddRemovePlaylistView, SongsBulkAddRemovePlaylistView,
+    SongMovePlaylistView, PlaylistForkView
 )
 
 urlpatterns = [
@@ -21,11 +22,26 @@ urlpatterns = [
         view=PlaylistRetrieveUpdateDeleteView.as_view(),
         name="playlist-management"
     ),
+    path(
+        route='<int:playlist_id>/fork/',
+        view=PlaylistForkView.as_view(),
+        name="playlist-fork"
+    ),
+    path(
+        route='songs/<int:playlist_id>/bulk/',
+        view=SongsBulkAddRemovePlaylistView.as_view(),
+        name="playlists-songs-bulk-management"
+    ),
     path(
         route='songs/<int:playlist_id>/<int:song_id>/',
         view=SongAddRemovePlaylistView.as_view(),
         name="playlists-songs-management"
     ),
+    path(
+        route='songs/<int:playlist_id>/<int:song_id>/move/',
+        view=SongMovePlaylistView.as_view(),
+        name="playlists-songs-move"
+    ),
     path(
         route='likes/',
         view=LikedPlaylistsListView.as_view(),
@@ -1,4 +1,3 @@
-from django.db.models import Exists, OuterRef
 from rest_framework import generics, status
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
@@ -6,14 +5,25 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from music.models import Song
-from playlists.models import Playlist, SongInPlaylist
+from music.services import get_bulk_song_ids
+from playlists.models import Playlist
 from playlists.permissions import IsPlaylistOwner
+from playlists.services import (
+    add_songs_to_playlist, remove_songs_from_playlist, add_song_to_playlist,
+    remove_song_from_playlist, move_song_in_playlist, fork_playlist,
+    like_playlist, unlike_playlist, get_playlist_artist_ids
+)
 from playlists.serializers import (
     PlaylistDetailsSerializer, ShortListPlaylistsSerializer,
-    PlaylistCreateUpdateDeleteSerializer, ListPlaylistsSerializer
+    PlaylistCreateUpdateDeleteSerializer, ListPlaylistsSerializer,
+    SongMovePlaylistSerializer, PlaylistForkSerializer
 )
+from profiles.likes import LIKED_PLAYLISTS, set_is_liked
 from pythonyanssound.pagination import CustomPageNumberPagination
+from pythonyanssound.tasks import schedule_thumbnails_generation
+from pythonyanssound.versions import (
+    ContentValidators, content_version_key, artist_version_key, relations_version_key
+)
 
 
 class PlaylistListCreateView(generics.ListCreateAPIView):
@@ -39,7 +49,8 @@ class PlaylistListCreateView(generics.ListCreateAPIView):
         """
         serializer = PlaylistCreateUpdateDeleteSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(owner=request.user)
+        playlist = serializer.save(owner=request.user)
+        schedule_thumbnails_generation(playlist, "cover")
         headers = self.get_success_headers(serializer.data)
         return Response(
             serializer.data, status=status.HTTP_201_CREATED, headers=headers
@@ -68,16 +79,26 @@ class PlaylistRetrieveUpdateDeleteView(APIView):
         """
         Returns playlist identified with 'playlist_id'
         passed as URL parameter.
+
+        Responds with 304 (Not Modified) if playlist hasn't changed
+        since request 'If-None-Match'/'If-Modified-Since' validators
         """
-        playlist = Playlist.objects.annotate(
-            is_liked=Exists(
-                self.request.user.liked_playlists.filter(pk=OuterRef("pk"))
-            )
-        ).get(pk=playlist_id)
+        # artists versions cover owner and songs shown in playlist
+        validators = ContentValidators(request, (
+            content_version_key(Playlist, playlist_id),
+            *(artist_version_key(pk) for pk in sorted(get_playlist_artist_ids(playlist_id))),
+            relations_version_key(request.user.pk)
+        ))
+        not_modified = validators.get_not_modified_response()
+        if not_modified is not None:
+            return not_modified
+
+        playlist = Playlist.objects.get(pk=playlist_id)
+        set_is_liked((playlist, ), request.user, LIKED_PLAYLISTS)
         serializer = self.serializer_class(
             instance=playlist, context=self.get_serializer_context()
         )
-        return Response(serializer.data)
+        return validators.set_headers(Response(serializer.data))
 
     def put(self, request: Request, playlist_id: int):
         """
@@ -91,6 +112,7 @@ class PlaylistRetrieveUpdateDeleteView(APIView):
         )
         if serializer.is_valid(raise_exception=True):
             serializer.save()
+            schedule_thumbnails_generation(playlist, "cover")
             return Response(serializer.data)
 
     def delete(self, request: Request, playlist_id: int):
@@ -105,6 +127,29 @@ class PlaylistRetrieveUpdateDeleteView(APIView):
         return Response(serializer.data)
 
 
+class PlaylistForkView(APIView):
+    """Processes POST method to copy playlist to user's playlists."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request, playlist_id: int):
+        """
+        Creates user's playlist with cover and songs
+        of playlist identified with 'playlist_id'.
+
+        Title of copied playlist is used if 'title' isn't passed
+        """
+        serializer = PlaylistForkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        playlist = Playlist.objects.get(pk=playlist_id)
+
+        fork = fork_playlist(playlist, request.user, serializer.validated_data.get("title"))
+        schedule_thumbnails_generation(fork, "cover")
+        return Response(
+            PlaylistCreateUpdateDeleteSerializer(instance=fork).data,
+            status=status.HTTP_201_CREATED
+        )
+
+
 class ShortPlaylistListView(ListAPIView):
     """Processes GET method to retrieve playlists with minimum info."""
     permission_classes = [IsAuthenticated]
@@ -122,39 +167,88 @@ class ShortPlaylistListView(ListAPIView):
 
 
 class SongAddRemovePlaylistView(APIView):
-    """Processes POST method to add song with song_id to user's playlist with playlist_id
-    Allowed only for authenticated user's and playlist's owners
+    """
+    Processes POST/DELETE methods to add/remove song with song_id
+    to/from user's playlist with playlist_id.
+
+    Allowed only for playlist's owner
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request, playlist_id: int, song_id: int):
+        """
+        Appends Song with 'song_id' on top of Playlist with 'playlist_id'
+        by creating SongInPlaylist instance (idempotent).
+        """
+        add_song_to_playlist(request.user, playlist_id, song_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def delete(self, request: Request, playlist_id: int, song_id: int):
+        """
+        Delete Song with 'song_id' from Playlist with 'playlist_id'
+        by removing SongInPlaylist instance (idempotent).
+        """
+        remove_song_from_playlist(request.user, playlist_id, song_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SongMovePlaylistView(APIView):
+    """
+    Processes POST method to move song with song_id
+    before/after other song of user's playlist with playlist_id.
+
+    Allowed only for playlist's owner
     """
     permission_classes = [IsAuthenticated, IsPlaylistOwner]
 
     def post(self, request: Request, playlist_id: int, song_id: int):
         """
-        Appends Song with 'song_id' to Playlist with 'playlist_id'
-        by creating SongInPlaylist instance (separate model).
+        Moves Song with 'song_id' before ('before')
+        or after ('after') song with passed id.
         """
-        # TODO replace creating instance with playlist and song instances
-        #  with playlist and song ids
+        serializer = SongMovePlaylistSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         playlist = Playlist.objects.get(pk=playlist_id)
         self.check_object_permissions(request, playlist)
-        song = Song.objects.get(pk=song_id)
 
-        SongInPlaylist.objects.create(playlist=playlist, song=song)
-        return Response(
-            data={"message": f"{song}  successful added to {playlist}."}
+        after = "after" in serializer.validated_data
+        position = move_song_in_playlist(
+            playlist, song_id,
+            serializer.validated_data["after" if after else "before"], after
         )
+        return Response(data={"song_id": song_id, "position": position})
 
-    def delete(self, request: Request, playlist_id: int, song_id: int):
+
+class SongsBulkAddRemovePlaylistView(APIView):
+    """
+    Processes POST/DELETE methods to add/remove list of songs
+    to/from user's playlist with playlist_id.
+
+    Allowed only for playlist's owner
+    """
+    permission_classes = [IsAuthenticated, IsPlaylistOwner]
+
+    def post(self, request: Request, playlist_id: int):
         """
-        Delete Song with 'song_id' from Playlist with 'playlist_id'
-        by removing SongInInstance.
+        Appends songs with 'song_ids' to Playlist with 'playlist_id'.
+
+        Returns status of every song ('added', 'already_added', 'not_found')
         """
         playlist = Playlist.objects.get(pk=playlist_id)
         self.check_object_permissions(request, playlist)
-        song = Song.objects.get(pk=song_id)
-        playlist.songs.remove(song)
-        return Response(
-            data={"message": f"{song}  successful removed from {playlist}."}
-        )
+        results = add_songs_to_playlist(playlist, get_bulk_song_ids(request))
+        return Response(data={"results": results})
+
+    def delete(self, request: Request, playlist_id: int):
+        """
+        Removes songs with 'song_ids' from Playlist with 'playlist_id'.
+
+        Returns status of every song ('removed', 'not_added', 'not_found')
+        """
+        playlist = Playlist.objects.get(pk=playlist_id)
+        self.check_object_permissions(request, playlist)
+        results = remove_songs_from_playlist(playlist, get_bulk_song_ids(request))
+        return Response(data={"results": results})
 
 
 class LikedPlaylistsListView(ListAPIView):
@@ -181,30 +275,18 @@ class LikeUnlikePlaylistView(APIView):
     def post(self, request: Request, playlist_id: int):
         """
         Appends playlist with 'playlist_id' identifier
-        to user's liked playlists.
+        to user's liked playlists (idempotent).
         """
-        playlist = Playlist.objects.get(pk=playlist_id)
-        request.user.liked_playlists.add(playlist)
-        return Response(
-            data={
-                "message": f"{playlist} playlist "
-                           f"successful added to liked list."
-            }
-        )
+        like_playlist(request.user, playlist_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     def delete(self, request: Request, playlist_id: int):
         """
         Removes playlist with 'playlist_id' identifier
-        from user's liked playlists.
+        from user's liked playlists (idempotent).
         """
-        playlist = Playlist.objects.get(pk=playlist_id)
-        request.user.liked_playlists.remove(playlist)
-        return Response(
-            data={
-                "message": f"{playlist} playlist "
-                           f"successful removed from liked list."
-            }
-        )
+        unlike_playlist(request.user, playlist_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class PlaylistsNewReleasesView(ListAPIView):
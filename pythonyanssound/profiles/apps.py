@@ -5,3 +5,7 @@ class ProfilesConfig(AppConfig):
     """Profiles Django application config."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'profiles'
+
+    def ready(self):
+        # connects content versions signal receivers
+        from profiles import signals  # noqa: F401
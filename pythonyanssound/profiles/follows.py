@@ -0,0 +1,216 @@
+from typing import Iterable, List, Sequence, Set, Tuple
+
+import redis.exceptions
+from django.conf import settings
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from .models import Profile
+from .suggestions import mark_followings_changed
+from .utils import chunked
+
+FOLLOWERS = "followers"
+FOLLOWINGS = "followings"
+
+# member of every loaded set (ids are positive, so it has the lowest score),
+# distinguishes loaded set without follows from missing one
+LOADED_MEMBER = 0
+
+Follows = Profile.followings.through
+
+
+def get_follows_key(relation: str, profile_pk: int) -> str:
+    """
+    Returns Redis key of sorted set with Profile followers/followings ids
+    (scored by id, so newest Profiles have the highest scores).
+    """
+    return f"{relation}_sorted:{profile_pk}"
+
+
+def get_mutuals_key(profile_pk: int) -> str:
+    """Returns Redis key of sorted set with Profile mutuals ids."""
+    return f"mutuals:{profile_pk}"
+
+
+class FollowsIds:
+    """
+    Lazy sequence of Profile ids in sorted set (descending)
+    for Django paginator: count is ZCARD, page is ZREVRANGE.
+    """
+
+    def __init__(self, connection, key: str):
+        self.connection = connection
+        self.key = key
+
+    def count(self) -> int:
+        # loaded sets member isn't counted
+        return max(self.connection.zcard(self.key) - 1, 0)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, index: slice) -> List[int]:
+        members = self.connection.zrevrange(self.key, index.start or 0, index.stop - 1)
+        return [int(member) for member in members if int(member) != LOADED_MEMBER]
+
+
+def get_database_follows(relation: str, profile_pk: int) -> Set[int]:
+    """Returns ids of Profile followers/followings from database."""
+    if relation == FOLLOWERS:
+        follows = Follows.objects.filter(to_profile_id=profile_pk)
+        return set(follows.values_list("from_profile_id", flat=True))
+    follows = Follows.objects.filter(from_profile_id=profile_pk)
+    return set(follows.values_list("to_profile_id", flat=True))
+
+
+def load_follows(connection, sets: Iterable[Tuple[str, int]]) -> None:
+    """
+    Loads follows sets ((relation, Profile id) pairs) missing in Redis
+    from database (large sets are written in chunks).
+    """
+    sets = list(sets)
+    pipe = connection.pipeline(transaction=False)
+    for relation, profile_pk in sets:
+        pipe.zscore(get_follows_key(relation, profile_pk), LOADED_MEMBER)
+
+    for (relation, profile_pk), loaded in zip(sets, pipe.execute()):
+        if loaded is not None:
+            continue
+        key = get_follows_key(relation, profile_pk)
+        ids = get_database_follows(relation, profile_pk)
+        for chunk in chunked(ids, settings.APP_FOLLOWS_CACHE_CHUNK_SIZE):
+            pipe.zadd(key, {pk: pk for pk in chunk})
+        pipe.zadd(key, {LOADED_MEMBER: LOADED_MEMBER})
+        pipe.expire(key, settings.APP_FOLLOWS_CACHE_EXPIRE)
+        pipe.execute()
+
+
+def get_follows(relation: str, profile_pk: int) -> Sequence[int]:
+    """Returns ids of Profile followers/followings (descending)."""
+    try:
+        connection = get_redis_connection("default")
+        load_follows(connection, ((relation, profile_pk), ))
+    except redis.exceptions.ConnectionError:
+        return sorted(get_database_follows(relation, profile_pk), reverse=True)
+    return FollowsIds(connection, get_follows_key(relation, profile_pk))
+
+
+def get_mutuals(profile_pk: int) -> Sequence[int]:
+    """
+    Returns ids of Profiles which follow Profile and are followed back
+    (descending), intersection is stored in Redis for a short time.
+    """
+    mutuals_key = get_mutuals_key(profile_pk)
+    try:
+        connection = get_redis_connection("default")
+        load_follows(connection, ((FOLLOWERS, profile_pk), (FOLLOWINGS, profile_pk)))
+        pipe = connection.pipeline()
+        pipe.zinterstore(mutuals_key, (
+            get_follows_key(FOLLOWERS, profile_pk),
+            get_follows_key(FOLLOWINGS, profile_pk)
+        ), aggregate="MAX")
+        pipe.expire(mutuals_key, settings.APP_FOLLOWS_MUTUALS_EXPIRE)
+        pipe.execute()
+    except redis.exceptions.ConnectionError:
+        return sorted(
+            get_database_follows(FOLLOWERS, profile_pk)
+            & get_database_follows(FOLLOWINGS, profile_pk),
+            reverse=True
+        )
+    return FollowsIds(connection, mutuals_key)
+
+
+def get_follows_details(viewer_pk: int, profile_pk: int) -> dict:
+    """
+    Returns follows info of Profile shown to viewer Profile:
+        - is_followed: viewer follows Profile;
+        - followers_count: number of Profile followers;
+        - followings_count: number of Profile followings;
+        - followed_by_followings_count: number of Profiles
+          followed by viewer who follow Profile.
+
+    Intersection is counted by Redis (ZINTERSTORE to temporary key
+    deleted in the same transaction), ids aren't transferred
+    """
+    followers_key = get_follows_key(FOLLOWERS, profile_pk)
+    viewer_followings_key = get_follows_key(FOLLOWINGS, viewer_pk)
+    common_key = f"followed_by_followings:{viewer_pk}:{profile_pk}"
+    try:
+        connection = get_redis_connection("default")
+        load_follows(connection, (
+            (FOLLOWERS, profile_pk), (FOLLOWINGS, profile_pk),
+            (FOLLOWINGS, viewer_pk)
+        ))
+        pipe = connection.pipeline()
+        pipe.zscore(viewer_followings_key, profile_pk)
+        pipe.zcard(followers_key)
+        pipe.zcard(get_follows_key(FOLLOWINGS, profile_pk))
+        pipe.zinterstore(common_key, (viewer_followings_key, followers_key))
+        pipe.delete(common_key)
+        is_followed, followers_count, followings_count, common_count, _ = pipe.execute()
+    except redis.exceptions.ConnectionError:
+        followers = get_database_follows(FOLLOWERS, profile_pk)
+        viewer_followings = get_database_follows(FOLLOWINGS, viewer_pk)
+        return {
+            "is_followed": profile_pk in viewer_followings,
+            "followers_count": len(followers),
+            "followings_count": len(get_database_follows(FOLLOWINGS, profile_pk)),
+            "followed_by_followings_count": len(followers & viewer_followings),
+        }
+    # counts exclude loaded sets member
+    return {
+        "is_followed": is_followed is not None,
+        "followers_count": followers_count - 1,
+        "followings_count": followings_count - 1,
+        "followed_by_followings_count": common_count - 1,
+    }
+
+
+def are_followed(viewer_pk: int, ids: List[int]) -> List[bool]:
+    """Returns flags whether Profiles with 'ids' are followed by viewer."""
+    if not ids:
+        return []
+    try:
+        connection = get_redis_connection("default")
+        load_follows(connection, ((FOLLOWINGS, viewer_pk), ))
+        # client version doesn't wrap ZMSCORE (Redis 6.2)
+        scores = connection.execute_command(
+            "ZMSCORE", get_follows_key(FOLLOWINGS, viewer_pk), *ids
+        )
+    except redis.exceptions.ConnectionError:
+        followings = get_database_follows(FOLLOWINGS, viewer_pk)
+        return [pk in followings for pk in ids]
+    return [score is not None for score in scores]
+
+
+def add_follow(follower_pk: int, profile_pk: int) -> None:
+    """Writes follow to Redis sorted sets after transaction commit."""
+    _write_follow(follower_pk, profile_pk, add=True)
+
+
+def remove_follow(follower_pk: int, profile_pk: int) -> None:
+    """Removes follow from Redis sorted sets after transaction commit."""
+    _write_follow(follower_pk, profile_pk, add=False)
+
+
+def _write_follow(follower_pk: int, profile_pk: int, add: bool) -> None:
+    followings_key = get_follows_key(FOLLOWINGS, follower_pk)
+    followers_key = get_follows_key(FOLLOWERS, profile_pk)
+
+    def write():
+        try:
+            pipe = get_redis_connection("default").pipeline()
+            mark_followings_changed(pipe, follower_pk)
+            if add:
+                pipe.zadd(followings_key, {profile_pk: profile_pk})
+                pipe.zadd(followers_key, {follower_pk: follower_pk})
+                pipe.expire(followings_key, settings.APP_FOLLOWS_CACHE_EXPIRE)
+                pipe.expire(followers_key, settings.APP_FOLLOWS_CACHE_EXPIRE)
+            else:
+                pipe.zrem(followings_key, profile_pk)
+                pipe.zrem(followers_key, follower_pk)
+            pipe.execute()
+        except redis.exceptions.ConnectionError:
+            pass
+
+    transaction.on_commit(write)
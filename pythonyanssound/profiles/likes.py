@@ -0,0 +1,127 @@
+from typing import Iterable, List
+
+import redis.exceptions
+from django.conf import settings
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from .models import Profile
+
+LIKED_SONGS = "liked_songs"
+LIKED_PLAYLISTS = "liked_playlists"
+
+# member of every loaded set (ids are positive),
+# distinguishes loaded set without likes from missing one
+LOADED_MEMBER = 0
+
+
+def get_likes_key(relation: str, profile_pk: int) -> str:
+    """Returns Redis key of set with ids liked by Profile."""
+    return f"{relation}:{profile_pk}"
+
+
+def load_likes(connection, relation: str, profile: Profile) -> set:
+    """Loads ids liked by Profile ('relation' M2M field) to Redis set."""
+    liked_ids = set(getattr(profile, relation).values_list("pk", flat=True))
+    key = get_likes_key(relation, profile.pk)
+    pipe = connection.pipeline()
+    pipe.sadd(key, LOADED_MEMBER, *liked_ids)
+    pipe.expire(key, settings.APP_LIKES_CACHE_EXPIRE)
+    pipe.execute()
+    return liked_ids
+
+
+def are_liked(profile: Profile, relation: str, ids: List[int]) -> List[bool]:
+    """
+    Returns flags whether instances with 'ids' are liked by Profile.
+
+    Flags are resolved with one SMISMEMBER call,
+    missing set is loaded from database first
+    Falls back to one database query if Redis is unavailable
+    """
+    if not ids:
+        return []
+    try:
+        connection = get_redis_connection("default")
+        # client version doesn't wrap SMISMEMBER (Redis 6.2)
+        flags = connection.execute_command(
+            "SMISMEMBER", get_likes_key(relation, profile.pk),
+            LOADED_MEMBER, *ids
+        )
+        if flags[0]:
+            return [bool(flag) for flag in flags[1:]]
+        liked_ids = load_likes(connection, relation, profile)
+    except redis.exceptions.ConnectionError:
+        liked_ids = set(
+            getattr(profile, relation).filter(
+                pk__in=ids
+            ).values_list("pk", flat=True)
+        )
+    return [pk in liked_ids for pk in ids]
+
+
+def set_is_liked(
+        instances: Iterable, profile: Profile, relation: str, pk_attr: str = "pk"
+) -> None:
+    """
+    Sets 'is_liked' attribute of instances (page of list) liked by Profile.
+
+    'pk_attr' - instance attribute with id of liked instance
+    """
+    if not profile.is_authenticated:
+        return
+    instances = list(instances)
+    ids = [getattr(instance, pk_attr) for instance in instances]
+    for instance, is_liked in zip(instances, are_liked(profile, relation, ids)):
+        instance.is_liked = is_liked
+
+
+def add_likes(profile_pk: int, relation: str, ids: Iterable[int]) -> None:
+    """Writes ids liked by Profile to Redis set after transaction commit."""
+    key = get_likes_key(relation, profile_pk)
+    ids = list(ids)
+
+    def write():
+        try:
+            pipe = get_redis_connection("default").pipeline()
+            pipe.sadd(key, *ids)
+            pipe.expire(key, settings.APP_LIKES_CACHE_EXPIRE)
+            pipe.execute()
+        except redis.exceptions.ConnectionError:
+            pass
+
+    if ids:
+        transaction.on_commit(write)
+
+
+def remove_likes(profile_pk: int, relation: str, ids: Iterable[int]) -> None:
+    """Removes ids unliked by Profile from Redis set after transaction commit."""
+    key = get_likes_key(relation, profile_pk)
+    ids = list(ids)
+
+    def write():
+        try:
+            get_redis_connection("default").srem(key, *ids)
+        except redis.exceptions.ConnectionError:
+            pass
+
+    if ids:
+        transaction.on_commit(write)
+
+
+def invalidate_likes(relation: str, profile_ids: Iterable[int]) -> None:
+    """
+    Deletes Redis sets of ids liked by Profiles after transaction commit
+    (sets are loaded from database again), used for writes bypassing
+    like services: admin, M2M managers, cascade deletes.
+    """
+    keys = [get_likes_key(relation, pk) for pk in set(profile_ids)]
+
+    def delete():
+        try:
+            get_redis_connection("default").delete(*keys)
+        except redis.exceptions.ConnectionError:
+            pass
+
+    if keys:
+        transaction.on_commit(delete)
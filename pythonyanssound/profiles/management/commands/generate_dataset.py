@@ -0,0 +1,370 @@
+"""
+Generates synthetic dataset for scale testing:
+
+    python manage.py generate_dataset --profiles 1000000 --songs 2000000 \
+        --likes 20000000 --follows 10000000 --workers 8
+
+Popularity of songs and artists follows power law (few songs get most
+likes, few artists release most songs and get most followers), number
+of likes/follows/playlist songs of profiles is heavy-tailed
+Rows are generated in chunks by parallel workers and written with COPY
+(PostgreSQL) or multi-row INSERT, every chunk has own random generator
+seeded with (seed, table, chunk), so the same seed gives the same rows
+"""
+import io
+import multiprocessing
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from math import gcd
+from typing import Callable, Dict, Iterator, List, Tuple, Type
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.models import Max, Model
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from music.charts import REFRESHED_KEY
+from music.genres import recount_genres_songs
+from music.models import Genre, Song
+from playlists.models import Playlist, SongInPlaylist
+from profiles.models import Profile, SongLike
+from profiles.suggestions import Follows
+
+# shape of Pareto distribution of profiles activity (mean is finite)
+ACTIVITY_SHAPE = 2.0
+
+# rows of table: {field attname: value}
+Rows = List[Dict[str, object]]
+
+
+@dataclass(frozen=True)
+class DatasetPlan:
+    """Sizes, ids and distributions parameters shared by workers."""
+    seed: int
+    profiles: int
+    artists: int
+    songs: int
+    likes: int
+    follows: int
+    playlists: int
+    playlist_songs: int
+    exponent: float
+    artist_follows_share: float
+    first_profile: int
+    first_song: int
+    first_playlist: int
+    genre_ids: Tuple[int, ...]
+    password: str
+    now: datetime
+    days: int
+
+
+def power_law_ranks(rng: np.random.Generator, n: int, size: int, exponent: float) -> np.ndarray:
+    """
+    Returns ranks in [0, n) drawn from truncated power law
+    (probability of rank r is proportional to (r + 1) ** -exponent).
+    """
+    uniform = rng.random(size)
+    if exponent == 1:
+        ranks = np.exp(uniform * np.log(n + 1))
+    else:
+        power = 1 - exponent
+        ranks = (1 + uniform * ((n + 1) ** power - 1)) ** (1 / power)
+    return np.minimum(ranks.astype(np.int64) - 1, n - 1)
+
+
+def spread(ranks: np.ndarray, n: int) -> np.ndarray:
+    """
+    Maps popularity ranks to offsets of rows in [0, n) one-to-one,
+    so popular rows are scattered over ids instead of being the first.
+    """
+    step = max(int(n * 0.618), 1)
+    while gcd(step, n) != 1:
+        step += 1
+    return ranks * step % n
+
+
+def activity(rng: np.random.Generator, size: int, mean: float, limit: int) -> np.ndarray:
+    """Returns heavy-tailed numbers of rows (likes, follows, ...) with mean."""
+    counts = np.rint(rng.pareto(ACTIVITY_SHAPE, size) * mean * (ACTIVITY_SHAPE - 1))
+    return np.minimum(counts.astype(np.int64), limit)
+
+
+def random_dates(rng: np.random.Generator, plan: DatasetPlan, size: int) -> List[datetime]:
+    """Returns dates uniformly spread over last 'plan.days' days."""
+    seconds = rng.integers(0, plan.days * 86400, size)
+    return [plan.now - timedelta(seconds=int(value)) for value in seconds]
+
+
+def unique_pairs(sources: np.ndarray, targets: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns sorted (sources, targets) without duplicate pairs (targets < n)."""
+    keys = np.unique(sources * n + targets)
+    return keys // n, keys % n
+
+
+def generate_profiles(rng: np.random.Generator, plan: DatasetPlan, start: int, stop: int) -> Dict[Type[Model], Rows]:
+    """Profiles with offsets [start, stop), first 'plan.artists' ones are artists."""
+    rows = []
+    for offset in range(start, stop):
+        pk = plan.first_profile + offset
+        rows.append({
+            "id": pk, "username": f"user{pk}", "email": f"user{pk}@dataset.example",
+            "password": plan.password, "is_artist": offset < plan.artists, "is_verified": True,
+        })
+    return {Profile: rows}
+
+
+def generate_songs(rng: np.random.Generator, plan: DatasetPlan, start: int, stop: int) -> Dict[Type[Model], Rows]:
+    """Songs with offsets [start, stop) of power-law chosen artists and genres."""
+    size = stop - start
+    artists = spread(power_law_ranks(rng, plan.artists, size, plan.exponent), plan.artists)
+    genres = power_law_ranks(rng, len(plan.genre_ids), size, plan.exponent)
+    dates = random_dates(rng, plan, size)
+    rows = []
+    for index in range(size):
+        pk = plan.first_song + start + index
+        rows.append({
+            "id": pk, "title": f"Song {pk}", "audio": f"dataset/{pk}.mp3", "cover": "",
+            "creation_date": dates[index], "genre_id": plan.genre_ids[genres[index]],
+            "artist_id": plan.first_profile + int(artists[index]),
+        })
+    return {Song: rows}
+
+
+def generate_likes(rng: np.random.Generator, plan: DatasetPlan, start: int, stop: int) -> Dict[Type[Model], Rows]:
+    """Likes of profiles with offsets [start, stop) given to power-law popular songs."""
+    counts = activity(rng, stop - start, plan.likes / plan.profiles, plan.songs)
+    profiles = np.repeat(np.arange(start, stop, dtype=np.int64), counts)
+    songs = spread(power_law_ranks(rng, plan.songs, len(profiles), plan.exponent), plan.songs)
+    profiles, songs = unique_pairs(profiles, songs, plan.songs)
+    dates = random_dates(rng, plan, len(profiles))
+    return {SongLike: [
+        {
+            "profile_id": plan.first_profile + int(profile), "song_id": plan.first_song + int(song),
+            "like_date": date
+        }
+        for profile, song, date in zip(profiles, songs, dates)
+    ]}
+
+
+def generate_follows(rng: np.random.Generator, plan: DatasetPlan, start: int, stop: int) -> Dict[Type[Model], Rows]:
+    """
+    Followings of profiles with offsets [start, stop):
+    'plan.artist_follows_share' of them are power-law popular artists,
+    the rest are random profiles.
+    """
+    counts = activity(rng, stop - start, plan.follows / plan.profiles, plan.profiles - 1)
+    followers = np.repeat(np.arange(start, stop, dtype=np.int64), counts)
+    followed = np.where(
+        rng.random(len(followers)) < plan.artist_follows_share,
+        spread(power_law_ranks(rng, plan.artists, len(followers), plan.exponent), plan.artists),
+        rng.integers(0, plan.profiles, len(followers))
+    )
+    followers, followed = unique_pairs(followers, followed, plan.profiles)
+    own = followers == followed
+    return {Follows: [
+        {
+            "from_profile_id": plan.first_profile + int(follower),
+            "to_profile_id": plan.first_profile + int(profile)
+        }
+        for follower, profile in zip(followers[~own], followed[~own])
+    ]}
+
+
+def generate_playlists(rng: np.random.Generator, plan: DatasetPlan, start: int, stop: int) -> Dict[Type[Model], Rows]:
+    """Playlists with offsets [start, stop) of random owners with power-law popular songs."""
+    size = stop - start
+    owners = rng.integers(0, plan.profiles, size)
+    dates = random_dates(rng, plan, size)
+    playlists = [
+        {
+            "id": plan.first_playlist + start + index, "title": f"Playlist {plan.first_playlist + start + index}",
+            "cover": "", "creation_date": dates[index], "owner_id": plan.first_profile + int(owners[index]),
+        }
+        for index in range(size)
+    ]
+
+    counts = activity(rng, size, plan.playlist_songs / plan.playlists, plan.songs)
+    offsets = np.repeat(np.arange(size, dtype=np.int64), counts)
+    songs = spread(power_law_ranks(rng, plan.songs, len(offsets), plan.exponent), plan.songs)
+    offsets, songs = unique_pairs(offsets, songs, plan.songs)
+    # pairs are sorted by playlist, positions are spaced by gap inside playlist
+    first = np.searchsorted(offsets, offsets, side="left")
+    positions = (np.arange(len(offsets)) - first + 1) * settings.APP_PLAYLIST_POSITION_GAP
+    playlist_songs = [
+        {
+            "playlist_id": playlists[offset]["id"], "song_id": plan.first_song + int(song),
+            "position": int(position), "adding_date": playlists[offset]["creation_date"]
+        }
+        for offset, song, position in zip(offsets, songs, positions)
+    ]
+    return {Playlist: playlists, SongInPlaylist: playlist_songs}
+
+
+# (table, number of generated entities, generator), tables are written in order
+PHASES: List[Tuple[str, Callable[[DatasetPlan], int], Callable]] = [
+    ("profiles", lambda plan: plan.profiles, generate_profiles),
+    ("songs", lambda plan: plan.songs, generate_songs),
+    ("likes", lambda plan: plan.profiles, generate_likes),
+    ("follows", lambda plan: plan.profiles, generate_follows),
+    ("playlists", lambda plan: plan.playlists, generate_playlists),
+]
+
+
+def copy_value(value) -> str:
+    """Returns value in COPY text format."""
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def write_rows(model: Type[Model], rows: Rows) -> int:
+    """
+    Writes rows with COPY (PostgreSQL) or one multi-row INSERT,
+    fields missing in rows get their defaults, returns number of rows.
+    """
+    if not rows:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    fields = [
+        field for field in model._meta.concrete_fields
+        if field.attname in rows[0] or not field.primary_key
+    ]
+    defaults = {field.attname: field.get_default() for field in fields if field.attname not in rows[0]}
+    values = [
+        [
+            field.get_db_prep_save(row.get(field.attname, defaults.get(field.attname)), connection)
+            for field in fields
+        ]
+        for row in rows
+    ]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            buffer = io.StringIO()
+            for row in values:
+                buffer.write("\t".join(copy_value(value) for value in row))
+                buffer.write("\n")
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+        else:
+            placeholders = ", ".join(["%s"] * len(fields))
+            batch_size = connection.ops.bulk_batch_size(fields, values) if values else 1
+            for index in range(0, len(values), batch_size):
+                batch = values[index:index + batch_size]
+                cursor.execute(
+                    f"INSERT INTO {table} ({columns}) VALUES "
+                    + ", ".join([f"({placeholders})"] * len(batch)),
+                    [value for row in batch for value in row]
+                )
+    return len(rows)
+
+
+def write_chunk(task: Tuple[DatasetPlan, int, int, int]) -> int:
+    """Generates and writes rows of phase chunk in one transaction, returns number of rows."""
+    plan, phase, start, stop = task
+    _, _, generate = PHASES[phase]
+    rng = np.random.default_rng([plan.seed, phase, start])
+    written = 0
+    with transaction.atomic():
+        for model, rows in generate(rng, plan, start, stop).items():
+            written += write_rows(model, rows)
+    return written
+
+
+def chunk_tasks(plan: DatasetPlan, phase: int, chunk_size: int) -> Iterator[Tuple[DatasetPlan, int, int, int]]:
+    """Yields tasks of phase chunks."""
+    _, size, _ = PHASES[phase]
+    for start in range(0, size(plan), chunk_size):
+        yield plan, phase, start, min(start + chunk_size, size(plan))
+
+
+def get_next_pk(model: Type[Model]) -> int:
+    """Returns id following the largest model id."""
+    return (model.objects.aggregate(value=Max("pk"))["value"] or 0) + 1
+
+
+def reset_sequences(*models: Type[Model]) -> None:
+    """Moves id sequences of models past ids inserted explicitly."""
+    connection = connections[router.db_for_write(models[0])]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+class Command(BaseCommand):
+    help = "Generates synthetic profiles, songs, likes, follows and playlists for scale testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", type=int, default=100000)
+        parser.add_argument("--artists", type=int, default=None, help="default: 5%% of profiles")
+        parser.add_argument("--songs", type=int, default=200000)
+        parser.add_argument("--likes", type=int, default=2000000, help="approximate number")
+        parser.add_argument("--follows", type=int, default=1000000, help="approximate number")
+        parser.add_argument("--playlists", type=int, default=50000)
+        parser.add_argument("--playlist-songs", type=int, default=1000000, help="approximate number")
+        parser.add_argument("--genres", type=int, default=20, help="created if there are fewer")
+        parser.add_argument("--exponent", type=float, default=1.1, help="power law exponent of popularity")
+        parser.add_argument("--artist-follows-share", type=float, default=0.9)
+        parser.add_argument("--days", type=int, default=365, help="dates are spread over last days")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+        parser.add_argument("--chunk-size", type=int, default=10000, help="entities per chunk")
+
+    def handle(self, *args, **options):
+        artists = options["artists"]
+        if artists is None:
+            artists = max(options["profiles"] // 20, 1)
+        if not 0 < artists <= options["profiles"] or options["songs"] <= 0 or options["playlists"] < 0:
+            raise CommandError("Number of profiles, artists and songs must be positive, artists are profiles.")
+
+        genre_ids = list(Genre.objects.order_by("pk").values_list("pk", flat=True))
+        for index in range(len(genre_ids), options["genres"]):
+            genre_ids.append(Genre.objects.create(genre=f"Genre {index + 1}").pk)
+        if not genre_ids:
+            raise CommandError("Songs need at least one genre.")
+
+        plan = DatasetPlan(
+            seed=options["seed"], profiles=options["profiles"], artists=artists,
+            songs=options["songs"], likes=options["likes"], follows=options["follows"],
+            playlists=options["playlists"], playlist_songs=options["playlist_songs"],
+            exponent=options["exponent"], artist_follows_share=options["artist_follows_share"],
+            first_profile=get_next_pk(Profile), first_song=get_next_pk(Song),
+            first_playlist=get_next_pk(Playlist), genre_ids=tuple(genre_ids),
+            # one hash for all profiles, hashing every password takes hours
+            password=make_password("dataset", salt=f"dataset{options['seed']}"),
+            now=timezone.now(), days=options["days"],
+        )
+
+        workers = options["workers"]
+        if connections[router.db_for_write(Profile)].vendor != "postgresql":
+            # concurrent writers are serialized by database lock
+            workers = 1
+        pool = None
+        if workers > 1:
+            # forked workers must not share parent connections
+            connections.close_all()
+            pool = multiprocessing.get_context("fork").Pool(workers)
+        try:
+            for phase, (table, _, _) in enumerate(PHASES):
+                started = time.monotonic()
+                tasks = chunk_tasks(plan, phase, options["chunk_size"])
+                written = sum(pool.imap_unordered(write_chunk, tasks) if pool else map(write_chunk, tasks))
+                self.stdout.write(f"{table}: {written} rows in {time.monotonic() - started:.1f}s")
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        reset_sequences(Profile, Song, Playlist)
+        recount_genres_songs()
+        # charts of all songs are recomputed on next refresh
+        get_redis_connection("default").delete(REFRESHED_KEY)
+        self.stdout.write(self.style.SUCCESS("Dataset generated."))
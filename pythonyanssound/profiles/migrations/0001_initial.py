@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import pythonyanssound.validators
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('music', '0001_initial'),
+        ('playlists', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(max_length=255, unique=True, verbose_name="User's unique username.")),
+                ('email', models.CharField(max_length=255, unique=True, verbose_name="User's unique email address.")),
+                ('photo', models.ImageField(blank=True, upload_to='', validators=[pythonyanssound.validators.validate_image_resolution, pythonyanssound.validators.validate_file_size], verbose_name="User's photo link (saved to S3 bucket).")),
+                ('biography', models.TextField(blank=True, verbose_name='Some text about user.')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Is user active flag.')),
+                ('is_artist', models.BooleanField(default=False, verbose_name="Is user artist flag (can upload songs and appear in search as 'Artist').")),
+                ('is_verified', models.BooleanField(default=False, verbose_name='Has user confirmed his email address.')),
+                ('is_staff', models.BooleanField(default=False, verbose_name='Is user staff flag.')),
+                ('followings', models.ManyToManyField(blank=True, db_table='followings', related_name='followers', to=settings.AUTH_USER_MODEL, verbose_name="List of user's followings.")),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.Group', verbose_name='groups')),
+                ('liked_playlists', models.ManyToManyField(blank=True, db_table='playlists_likes', related_name='liked_profiles', to='playlists.Playlist', verbose_name="List of user's liked playlists.")),
+            ],
+            options={
+                'db_table': 'profiles',
+            },
+        ),
+        migrations.CreateModel(
+            name='SongLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('like_date', models.DateTimeField(auto_now_add=True, verbose_name='Date of song like.')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='liked_songs_through', to=settings.AUTH_USER_MODEL, verbose_name='Profile who liked song.')),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='liked_profiles_through', to='music.song', verbose_name='Song liked by profile.')),
+            ],
+            options={
+                'db_table': 'songs_likes',
+                'ordering': ('-like_date',),
+            },
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='liked_songs',
+            field=models.ManyToManyField(blank=True, related_name='liked_profiles', through='profiles.SongLike', to='music.Song', verbose_name="List of user's liked songs."),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='user_permissions',
+            field=models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.Permission', verbose_name='user permissions'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:59
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_likes(apps, schema_editor):
+    """Keeps the first like of the same song by profile."""
+    SongLike = apps.get_model("profiles", "SongLike")
+    duplicates = SongLike.objects.values("profile", "song").annotate(
+        likes_count=Count("pk"), first_pk=Min("pk")
+    ).filter(likes_count__gt=1)
+    for duplicate in duplicates.iterator():
+        SongLike.objects.filter(
+            profile=duplicate["profile"], song=duplicate["song"]
+        ).exclude(pk=duplicate["first_pk"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='songlike',
+            index=models.Index(fields=['profile', '-like_date'], name='songs_likes_profile_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='songlike',
+            constraint=models.UniqueConstraint(fields=('profile', 'song'), name='songs_likes_profile_song_uniq'),
+        ),
+    ]
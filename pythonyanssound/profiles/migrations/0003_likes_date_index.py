@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='songlike',
+            index=models.Index(fields=['like_date'], name='songs_likes_date_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-19 17:28
+
+import blobs.fields
+from django.db import migrations, models
+import pythonyanssound.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_likes_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="User's photo thumbnails names (by size and format)."),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='photo',
+            field=blobs.fields.ContentAddressedImageField(blank=True, upload_to='', validators=[pythonyanssound.validators.validate_image_resolution, pythonyanssound.validators.validate_file_size], verbose_name="User's photo link (saved to S3 bucket)."),
+        ),
+    ]
@@ -1,14 +1,14 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db.models import (
-    CharField, ImageField, TextField, ManyToManyField, BooleanField, Model,
-    ForeignKey, CASCADE, DateTimeField
+    CharField, TextField, ManyToManyField, BooleanField, Model,
+    ForeignKey, CASCADE, DateTimeField, JSONField, Index, UniqueConstraint
 )
 
+from blobs.fields import ContentAddressedImageField
 from pythonyanssound.validators import (
     validate_image_resolution, validate_file_size
 )
 from .managers import ProfileManager
-from .utils import profile_photo_upload_folder
 
 
 class Profile(AbstractBaseUser, PermissionsMixin):
@@ -29,11 +29,17 @@ class Profile(AbstractBaseUser, PermissionsMixin):
         max_length=255,
         unique=True
     )
-    photo = ImageField(
+    photo = ContentAddressedImageField(
         verbose_name="User's photo link (saved to S3 bucket).",
         blank=True,
         validators=(validate_image_resolution, validate_file_size),
-        upload_to=profile_photo_upload_folder
+        thumbnails_field="thumbnails"
+    )
+    thumbnails = JSONField(
+        verbose_name="User's photo thumbnails names (by size and format).",
+        default=dict,
+        blank=True,
+        editable=False
     )
     biography = TextField(
         verbose_name="Some text about user.",
@@ -125,3 +131,14 @@ class SongLike(Model):
         """Additional settings for model."""
         db_table = "songs_likes"
         ordering = ("-like_date",)
+        indexes = (
+            # profile's liked songs in default ordering
+            Index(fields=("profile", "-like_date"), name="songs_likes_profile_date_idx"),
+            # likes leaving weekly charts window
+            Index(fields=("like_date", ), name="songs_likes_date_idx"),
+        )
+        constraints = (
+            UniqueConstraint(
+                fields=("profile", "song"), name="songs_likes_profile_song_uniq"
+            ),
+        )
@@ -1,13 +1,18 @@
 from django.contrib.auth.models import update_last_login
-from django.db.models import Exists, OuterRef, Count
+from django.db.models import Count
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import SerializerMethodField, BooleanField
+from rest_framework.fields import (
+    SerializerMethodField, BooleanField, IntegerField
+)
 from rest_framework_simplejwt.serializers import TokenObtainSerializer, PasswordField
 from rest_framework_simplejwt.settings import api_settings
 
 from music.serializers import SongSerializer
 from playlists.serializers import ListPlaylistsSerializer
+from pythonyanssound.serializers import (
+    ThumbnailField, MediaURLsListSerializer
+)
 from .models import Profile
 from .tokens import CustomRefreshToken, VerifyToken
 
@@ -16,9 +21,12 @@ class ProfileSerializer(serializers.ModelSerializer):
     """
     Profiles serializer, includes all Profile fields to show to user
     """
+    photo_thumbnail = ThumbnailField("photo", 256)
+
     class Meta:
         model = Profile
-        fields = ('id', 'email', 'username', 'photo', 'biography', 'is_artist', 'is_verified')
+        list_serializer_class = MediaURLsListSerializer
+        fields = ('id', 'email', 'username', 'photo', 'photo_thumbnail', 'biography', 'is_artist', 'is_verified')
         read_only_fields = ("id", "is_artist", "is_verified")
 
 
@@ -26,17 +34,23 @@ class ProfileDetailsSerializer(serializers.ModelSerializer):
     playlists = ListPlaylistsSerializer(many=True)
     songs = SerializerMethodField("annotate_and_limit_popular_songs")
     is_followed = BooleanField()
+    followers_count = IntegerField(default=0)
+    followings_count = IntegerField(default=0)
+    followed_by_followings_count = IntegerField(default=0)
+    photo_thumbnail = ThumbnailField("photo", 256)
 
     class Meta:
         model = Profile
-        fields = ('id', 'username', 'photo', 'biography', 'playlists', 'songs', 'is_followed', 'is_artist', 'is_verified')
+        fields = (
+            'id', 'username', 'photo', 'photo_thumbnail', 'biography', 'playlists', 'songs', 'is_followed',
+            'followers_count', 'followings_count', 'followed_by_followings_count', 'is_artist', 'is_verified'
+        )
         read_only_fields = ("id", "is_artist", "is_verified")
 
     def annotate_and_limit_popular_songs(self, profile: Profile):
         if profile.is_artist:
-            authorized_profile = self.context.get("request").user
+            # 'is_liked' is resolved by songs list serializer
             songs = profile.songs.annotate(
-                is_liked=Exists(authorized_profile.liked_songs.filter(pk=OuterRef("pk"))),
                 likes_count=Count("liked_profiles")
             ).order_by("-likes_count")[:10]
             serializer = SongSerializer(songs, many=True, context=self.context)
@@ -46,9 +60,19 @@ class ProfileDetailsSerializer(serializers.ModelSerializer):
 
 
 class ShortProfileSerializer(serializers.ModelSerializer):
+    photo_thumbnail = ThumbnailField("photo", 64)
+
     class Meta:
         model = Profile
-        fields = ('id', 'username', 'photo', 'is_artist')
+        list_serializer_class = MediaURLsListSerializer
+        fields = ('id', 'username', 'photo', 'photo_thumbnail', 'is_artist')
+
+
+class FollowSuggestionSerializer(ShortProfileSerializer):
+    followed_by_followings_count = IntegerField()
+
+    class Meta(ShortProfileSerializer.Meta):
+        fields = ShortProfileSerializer.Meta.fields + ('followed_by_followings_count', )
 
 
 class ProfileCreateSerializer(serializers.ModelSerializer):
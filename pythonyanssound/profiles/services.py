@@ -1,11 +1,17 @@
+from django.db.models import F, Value
 from rest_framework import status
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ValidationError, NotFound
 from rest_framework.request import Request
 
+from profiles.follows import Follows, add_follow, remove_follow
 from profiles.models import Profile
 from profiles.serializers import EmailVerifySerializer, ProfileCreateSerializer, LogoutSerializer, \
     PasswordChangeSerializer
 from profiles.tokens import VerifyToken, CustomRefreshToken
+from pythonyanssound.db import insert_from_select, delete_rows
+from pythonyanssound.versions import (
+    bump_content_versions, content_version_key, relations_version_key
+)
 from .tasks import send_verify_email_task
 
 
@@ -81,3 +87,42 @@ def change_user_password(request: Request):
 
     request.user.set_password(serializer.validated_data['new_password'])
     request.user.save()
+
+
+def follow_profile(follower: Profile, profile_id: int) -> None:
+    """
+    Appends Profile to follower's followings with one INSERT ... SELECT
+    (following followed Profile changes nothing).
+
+    Profile existence is checked only if nothing was inserted
+    """
+    followed = insert_from_select(
+        Follows, Profile.objects.filter(pk=profile_id),
+        from_profile=Value(follower.pk), to_profile=F("pk")
+    )
+    if followed:
+        add_follow(follower.pk, profile_id)
+        bump_content_versions((
+            relations_version_key(follower.pk), content_version_key(Profile, profile_id)
+        ))
+    elif not Profile.objects.filter(pk=profile_id).exists():
+        raise NotFound("Profile not found.")
+
+
+def unfollow_profile(follower: Profile, profile_id: int) -> None:
+    """
+    Removes Profile from follower's followings with one DELETE
+    (unfollowing not followed Profile changes nothing).
+
+    Profile existence is checked only if nothing was deleted
+    """
+    unfollowed = delete_rows(
+        Follows.objects.filter(from_profile=follower, to_profile_id=profile_id)
+    )
+    if unfollowed:
+        remove_follow(follower.pk, profile_id)
+        bump_content_versions((
+            relations_version_key(follower.pk), content_version_key(Profile, profile_id)
+        ))
+    elif not Profile.objects.filter(pk=profile_id).exists():
+        raise NotFound("Profile not found.")
@@ -0,0 +1,103 @@
+from django.db.models.signals import post_delete, post_save, m2m_changed
+from django.dispatch import receiver
+
+from music.models import Song
+from pythonyanssound.versions import (
+    content_version_key, artist_version_key, relations_version_key, bump_content_versions
+)
+from .likes import LIKED_PLAYLISTS, LIKED_SONGS, invalidate_likes
+from .models import Profile
+
+# like relations cached in Redis sets by M2M through model
+LIKES_RELATIONS = {
+    Profile.liked_songs.through: LIKED_SONGS,
+    Profile.liked_playlists.through: LIKED_PLAYLISTS,
+}
+
+# Profile fields shown on Profile page
+PROFILE_CONTENT_FIELDS = {"username", "photo", "thumbnails", "biography", "is_active", "is_artist", "is_verified"}
+# Profile fields shown with artist songs and playlists
+ARTIST_CONTENT_FIELDS = {"username"}
+
+
+@receiver(post_save, sender=Profile)
+def bump_profile_versions(sender, instance: Profile, created: bool, update_fields=None, **kwargs):
+    """
+    Bumps versions of Profile and its artist content
+    if saved fields are shown (e.g. login doesn't change content).
+    """
+    if created:
+        return
+    changed = PROFILE_CONTENT_FIELDS if update_fields is None else PROFILE_CONTENT_FIELDS.intersection(update_fields)
+    if not changed:
+        return
+    keys = [content_version_key(Profile, instance.pk)]
+    if not changed.isdisjoint(ARTIST_CONTENT_FIELDS):
+        keys.append(artist_version_key(instance.pk))
+    bump_content_versions(keys)
+
+
+@receiver(m2m_changed, sender=Profile.liked_songs.through)
+def bump_liked_songs_versions(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    """
+    Bumps relations versions of liking Profiles
+    and versions of songs artists (their songs are ordered by likes).
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        profile_ids = {instance.pk}
+        artist_ids = Song.objects.filter(pk__in=pk_set or ()).values_list("artist_id", flat=True)
+    else:
+        profile_ids = pk_set or set()
+        artist_ids = {instance.artist_id}
+    bump_content_versions((
+        *(relations_version_key(pk) for pk in profile_ids),
+        *(content_version_key(Profile, pk) for pk in artist_ids)
+    ))
+
+
+@receiver(m2m_changed, sender=Profile.liked_playlists.through)
+def bump_liked_playlists_versions(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    """Bumps relations versions of Profiles who like playlists."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    profile_ids = (pk_set or set()) if reverse else {instance.pk}
+    bump_content_versions(relations_version_key(pk) for pk in profile_ids)
+
+
+@receiver(m2m_changed, sender=Profile.followings.through)
+def bump_followings_versions(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    """
+    Bumps relations versions of following Profiles
+    and versions of followed Profiles (show followers count).
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        follower_ids, followed_ids = {instance.pk}, pk_set or set()
+    else:
+        follower_ids, followed_ids = pk_set or set(), {instance.pk}
+    bump_content_versions((
+        *(relations_version_key(pk) for pk in follower_ids),
+        *(content_version_key(Profile, pk) for pk in followed_ids)
+    ))
+
+
+@receiver(m2m_changed, sender=Profile.liked_songs.through)
+@receiver(m2m_changed, sender=Profile.liked_playlists.through)
+def invalidate_added_likes(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    """Invalidates like sets of Profiles with likes added by M2M manager."""
+    if action != "post_add":
+        return
+    invalidate_likes(LIKES_RELATIONS[sender], (pk_set or set()) if reverse else {instance.pk})
+
+
+@receiver(post_delete, sender=Profile.liked_songs.through)
+@receiver(post_delete, sender=Profile.liked_playlists.through)
+def invalidate_deleted_likes(sender, instance, **kwargs):
+    """
+    Invalidates like set of Profile with deleted like
+    (M2M manager remove/clear, cascade delete of song, playlist or Profile).
+    """
+    invalidate_likes(LIKES_RELATIONS[sender], (instance.profile_id, ))
@@ -0,0 +1,192 @@
+import json
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+import numpy as np
+import redis.exceptions
+from django.conf import settings
+from django_redis import get_redis_connection
+from scipy import sparse
+
+from .models import Profile
+from .utils import chunked
+
+SUGGESTIONS_KEY_PREFIX = "follow_suggestions:"
+# ids of Profiles whose followings changed since last suggestions update
+CHANGED_KEY = "follow_suggestions_changed"
+# set after suggestions of all Profiles have been computed once
+COMPUTED_KEY = "follow_suggestions_computed"
+
+# [(suggested Profile id, number of followings who follow it), ...]
+Suggestions = List[Tuple[int, int]]
+
+Follows = Profile.followings.through
+
+
+def get_suggestions_key(profile_pk: int) -> str:
+    """Returns Redis key of Profile follow suggestions."""
+    return f"{SUGGESTIONS_KEY_PREFIX}{profile_pk}"
+
+
+def mark_followings_changed(pipe, profile_pk: int) -> None:
+    """Adds Profile to Profiles which suggestions are recomputed (pipeline)."""
+    pipe.sadd(CHANGED_KEY, profile_pk)
+
+
+def get_suggestions(profile_pk: int) -> Suggestions:
+    """Returns stored follow suggestions of Profile (one Redis GET)."""
+    try:
+        suggestions = get_redis_connection("default").get(get_suggestions_key(profile_pk))
+    except redis.exceptions.ConnectionError:
+        return []
+    return json.loads(suggestions) if suggestions else []
+
+
+def get_followings_edges(profile_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns follows edges (follower ids, followed ids) of Profiles
+    selected with chunked queries.
+    """
+    followers, followed = [], []
+    for chunk in chunked(profile_ids, settings.APP_FOLLOW_SUGGESTIONS_CHUNK_SIZE):
+        edges = Follows.objects.filter(
+            from_profile_id__in=chunk
+        ).values_list("from_profile_id", "to_profile_id")
+        for follower_pk, followed_pk in edges.iterator():
+            followers.append(follower_pk)
+            followed.append(followed_pk)
+    return np.array(followers, dtype=np.int64), np.array(followed, dtype=np.int64)
+
+
+def get_adjacency_matrix(
+        rows: np.ndarray, columns: np.ndarray,
+        row_ids: np.ndarray, column_ids: np.ndarray
+) -> sparse.csr_matrix:
+    """
+    Returns sparse matrix with ones for edges (rows[i] -> columns[i])
+    indexed by sorted 'row_ids'/'column_ids'.
+    """
+    return sparse.csr_matrix(
+        (
+            np.ones(len(rows), dtype=np.int32),
+            (np.searchsorted(row_ids, rows), np.searchsorted(column_ids, columns))
+        ),
+        shape=(len(row_ids), len(column_ids))
+    )
+
+
+def compute_suggestions(profile_ids: List[int]) -> Dict[int, Suggestions]:
+    """
+    Returns top 'APP_FOLLOW_SUGGESTIONS_SIZE' follow suggestions of Profiles.
+
+    Walks followings graph two hops out: suggested Profiles are followed
+    by Profile followings, candidates are scored by number of followings
+    who follow them (product of sparse adjacency matrices)
+    Profiles already followed and Profile itself are not suggested
+    """
+    users = np.unique(np.array(profile_ids, dtype=np.int64))
+    first_hop = get_followings_edges(users.tolist())
+    middle = np.unique(first_hop[1])
+    second_hop = get_followings_edges(middle.tolist())
+    candidates = np.unique(second_hop[1])
+
+    scores = (
+        get_adjacency_matrix(*first_hop, users, middle)
+        @ get_adjacency_matrix(*second_hop, middle, candidates)
+    ).tocsr()
+
+    followed: Dict[int, Set[int]] = {}
+    for follower_pk, followed_pk in zip(*first_hop):
+        followed.setdefault(int(follower_pk), set()).add(int(followed_pk))
+
+    suggestions = {}
+    for index, profile_pk in enumerate(users.tolist()):
+        start, end = scores.indptr[index], scores.indptr[index + 1]
+        row_candidates = candidates[scores.indices[start:end]]
+        row_scores = scores.data[start:end]
+
+        excluded = followed.get(profile_pk, set()) | {profile_pk}
+        allowed = ~np.isin(row_candidates, list(excluded))
+        row_candidates, row_scores = row_candidates[allowed], row_scores[allowed]
+
+        # highest scores first, ties by id
+        top = np.lexsort((row_candidates, -row_scores))[:settings.APP_FOLLOW_SUGGESTIONS_SIZE]
+        suggestions[profile_pk] = [
+            (int(candidate), int(score))
+            for candidate, score in zip(row_candidates[top], row_scores[top])
+        ]
+    return suggestions
+
+
+def save_suggestions(suggestions: Dict[int, Suggestions]) -> None:
+    """Saves follow suggestions of Profiles to Redis with one pipeline."""
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for profile_pk, profile_suggestions in suggestions.items():
+        key = get_suggestions_key(profile_pk)
+        if profile_suggestions:
+            pipe.set(key, json.dumps(profile_suggestions))
+        else:
+            pipe.delete(key)
+    pipe.execute()
+
+
+def pop_changed_profiles() -> Iterator[List[int]]:
+    """Yields chunks of Profiles ids with changed followings (removes them)."""
+    connection = get_redis_connection("default")
+    while True:
+        chunk = connection.spop(CHANGED_KEY, settings.APP_FOLLOW_SUGGESTIONS_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield [int(pk) for pk in chunk]
+
+
+def get_affected_profiles(changed_ids: List[int]) -> Set[int]:
+    """
+    Returns Profiles which neighbourhood (two hops) has changed:
+    Profiles with changed followings and their followers.
+    """
+    affected = set(changed_ids)
+    for chunk in chunked(changed_ids, settings.APP_FOLLOW_SUGGESTIONS_CHUNK_SIZE):
+        affected.update(
+            Follows.objects.filter(
+                to_profile_id__in=chunk
+            ).values_list("from_profile_id", flat=True).iterator()
+        )
+    return affected
+
+
+def update_suggestions(profile_ids: Iterable[int]) -> int:
+    """Recomputes and saves suggestions of Profiles in chunks."""
+    updated = 0
+    for chunk in chunked(profile_ids, settings.APP_FOLLOW_SUGGESTIONS_CHUNK_SIZE):
+        save_suggestions(compute_suggestions(chunk))
+        updated += len(chunk)
+    return updated
+
+
+def update_all_suggestions() -> int:
+    """Recomputes suggestions of all active Profiles."""
+    profile_ids = Profile.objects.filter(
+        is_active=True
+    ).order_by("pk").values_list("pk", flat=True)
+    return update_suggestions(profile_ids.iterator())
+
+
+def update_changed_suggestions() -> int:
+    """
+    Recomputes suggestions of Profiles which neighbourhood has changed
+    since last update, returns number of updated Profiles.
+
+    Suggestions of all Profiles are computed on first update
+    """
+    connection = get_redis_connection("default")
+    if not connection.exists(COMPUTED_KEY):
+        # changes made during full update are processed next time
+        connection.delete(CHANGED_KEY)
+        updated = update_all_suggestions()
+        connection.set(COMPUTED_KEY, 1)
+        return updated
+
+    updated = 0
+    for changed_ids in pop_changed_profiles():
+        updated += update_suggestions(sorted(get_affected_profiles(changed_ids)))
+    return updated
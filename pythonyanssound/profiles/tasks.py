@@ -1,3 +1,11 @@
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.utils import timezone
+
+from music.models import Song
+from profiles.suggestions import update_changed_suggestions
 from profiles.utils import EmailUtil
 from pythonyanssound.celery import app
 
@@ -7,5 +15,45 @@ def send_verify_email_task(token: str, email: str, username: str):
     """Performs sending verification message."""
     EmailUtil.send_verifications_message(token, email, username)
 
-# TODO Mail information about latest releases
+
+@app.task
+def send_releases_digest_task() -> int:
+    """
+    Mails every follower a digest of songs released during last week
+    by followed Profiles.
+
+    Releases of all followers are selected with one query
+    (song joined with followings table) ordered by follower,
+    so rows of every follower are grouped while streaming
+    """
+    one_week_ago = timezone.now() - timedelta(days=7)
+    releases = Song.objects.filter(
+        creation_date__gte=one_week_ago,
+        artist__followers__is_active=True
+    ).order_by(
+        "artist__followers", "-creation_date"
+    ).values_list(
+        "artist__followers__email",
+        "artist__followers__username",
+        "artist__username",
+        "title"
+    )
+
+    digests = (
+        (email, username, [(artist, title) for *_, artist, title in rows])
+        for (email, username), rows in groupby(
+            releases.iterator(), key=itemgetter(0, 1)
+        )
+    )
+    return EmailUtil.send_releases_digest_messages(digests)
+
+
+@app.task
+def update_follow_suggestions_task() -> int:
+    """
+    Updates friends of friends follow suggestions of Profiles
+    which followings graph neighbourhood has changed.
+    """
+    return update_changed_suggestions()
+
 # TODO Daily Mixes generation
@@ -1,8 +1,29 @@
+import io
+import socketserver
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+import redis.exceptions
+from redis import Redis
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from django_redis import get_redis_connection
 from rest_framework.test import APITestCase
 
-from profiles.models import Profile
+from music.models import Genre, Song
+from playlists.models import Playlist, SongInPlaylist
+from profiles.follows import FOLLOWERS, FOLLOWINGS, get_follows_key, get_mutuals_key
+from profiles.likes import LIKED_SONGS, get_likes_key
+from profiles.management.commands.generate_dataset import DatasetPlan, generate_likes, generate_follows
+from profiles.models import Profile, SongLike
+from profiles.suggestions import CHANGED_KEY, COMPUTED_KEY, get_suggestions_key, get_suggestions
+from profiles.tasks import send_releases_digest_task, update_follow_suggestions_task
 from profiles.tokens import VerifyToken, CustomRefreshToken
 
 TEST_USERNAME = "test_username"
@@ -10,6 +31,14 @@ TEST_EMAIL = "test_email@mail.ru"
 TEST_PASSWORD = "test_password_69"
 
 
+def clear_follows_cache(profiles) -> None:
+    """Deletes follows graph sets of Profiles (ids are reused by test databases)."""
+    get_redis_connection("default").delete(*(
+        get_follows_key(relation, profile.pk)
+        for profile in profiles for relation in (FOLLOWERS, FOLLOWINGS)
+    ), *(get_mutuals_key(profile.pk) for profile in profiles))
+
+
 class RegistrationTestCase(APITestCase):
 
     def test_registration(self):
@@ -319,6 +348,29 @@ class ProfileDetailsTestCase(APITestCase):
         response = self.client.get(reverse("profile-details", kwargs={"user_id": 69}))
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_profile_details_not_modified(self):
+        other_profile = Profile.objects.create_user("other_email@mail.ru", "other_username", TEST_PASSWORD)
+        clear_follows_cache((self.profile, other_profile))
+        self.addCleanup(clear_follows_cache, (self.profile, other_profile))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        url = reverse("profile-details", kwargs={"user_id": other_profile.pk})
+
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("profile-followings-management", kwargs={"profile_id": other_profile.pk}))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["is_followed"])
+
+        # validators change when signed media URLs are renewed
+        etag = response["ETag"]
+        with mock.patch("pythonyanssound.versions.time.time", return_value=time.time() + 3600):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
 
 class TokenRefreshTestCase(APITestCase):
     def setUp(self) -> None:
@@ -493,10 +545,29 @@ class ProfilesFollowingsManagementTestCase(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
 
         response = self.client.post(reverse("profile-followings-management", kwargs={"profile_id": self.third_profile.pk}))
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         self.assertEqual(len(self.profile.followings.all()), 2)
 
+    def test_profiles_followings_idempotent(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+        url = reverse("profile-followings-management", kwargs={"profile_id": self.third_profile.pk})
+
+        # authentication and insert
+        with self.assertNumQueries(2):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.profile.followings.filter(pk=self.third_profile.pk).count(), 1)
+
+        with self.assertNumQueries(2):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.profile.followings.filter(pk=self.third_profile.pk).exists())
+
     def test_profiles_followings_add_bad_profile_id(self):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
 
@@ -516,7 +587,7 @@ class ProfilesFollowingsManagementTestCase(APITestCase):
         response = self.client.delete(
             reverse("profile-followings-management", kwargs={"profile_id": self.second_profile.pk})
         )
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         self.assertEqual(len(self.profile.followings.all()), 0)
 
@@ -533,3 +604,393 @@ class ProfilesFollowingsManagementTestCase(APITestCase):
             reverse("profile-followings-management", kwargs={"profile_id": self.second_profile.pk})
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class FollowsGraphTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.profiles = [
+            Profile.objects.create_user(f"test_email_{i}@mail.ru", f"test_username_{i}", TEST_PASSWORD)
+            for i in range(4)
+        ]
+        viewer, first, second, artist = self.profiles
+        viewer.followings.add(first, second)
+        first.followings.add(artist)
+        second.followings.add(artist)
+        artist.followings.add(first)
+
+        clear_follows_cache(self.profiles)
+        self.addCleanup(clear_follows_cache, self.profiles)
+        self.refresh_token = CustomRefreshToken.for_user(viewer)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def test_followers_list(self):
+        artist = self.profiles[3]
+        response = self.client.get(reverse("profile-followers", kwargs={"user_id": artist.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [profile["id"] for profile in response.data["results"]],
+            [self.profiles[2].pk, self.profiles[1].pk]
+        )
+
+    def test_followers_list_pages(self):
+        artist = self.profiles[3]
+        followers = [
+            Profile.objects.create_user(f"follower_{i}@mail.ru", f"follower_{i}", TEST_PASSWORD)
+            for i in range(15)
+        ]
+        self.addCleanup(clear_follows_cache, followers)
+        artist.followers.add(*followers)
+        ids = sorted([self.profiles[1].pk, self.profiles[2].pk] + [follower.pk for follower in followers], reverse=True)
+
+        url = reverse("profile-followers", kwargs={"user_id": artist.pk})
+        response = self.client.get(url)
+        self.assertEqual([profile["id"] for profile in response.data["results"]], ids[:10])
+        # only page of ids is read from sorted set
+        with mock.patch.object(Redis, "zrevrange", autospec=True, side_effect=Redis.zrevrange) as zrevrange:
+            response = self.client.get(url, {"page": 2})
+        zrevrange.assert_called_once_with(mock.ANY, get_follows_key(FOLLOWERS, artist.pk), 10, 16)
+        self.assertEqual([profile["id"] for profile in response.data["results"]], ids[10:])
+        self.assertEqual(response.data["count"], 2)
+
+    def test_mutuals_list(self):
+        artist = self.profiles[3]
+        response = self.client.get(reverse("profile-mutuals", kwargs={"user_id": artist.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([profile["id"] for profile in response.data["results"]], [self.profiles[1].pk])
+
+    def test_follows_lists_unknown_profile(self):
+        for url_name in ("profile-followers", "profile-mutuals"):
+            response = self.client.get(reverse(url_name, kwargs={"user_id": 69}))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_profile_details_follows_counts(self):
+        artist = self.profiles[3]
+        url = reverse("profile-details", kwargs={"user_id": artist.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["is_followed"])
+        self.assertEqual(response.data["followers_count"], 2)
+        self.assertEqual(response.data["followings_count"], 1)
+        self.assertEqual(response.data["followed_by_followings_count"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("profile-followings-management", kwargs={"profile_id": artist.pk}))
+        # graph sets are written through, not loaded again
+        with mock.patch("profiles.follows.get_database_follows") as database_follows:
+            response = self.client.get(url)
+        database_follows.assert_not_called()
+        self.assertTrue(response.data["is_followed"])
+        self.assertEqual(response.data["followers_count"], 3)
+
+    def test_follows_without_redis(self):
+        with mock.patch(
+                "profiles.follows.get_redis_connection", side_effect=redis.exceptions.ConnectionError
+        ):
+            response = self.client.get(reverse("profile-details", kwargs={"user_id": self.profiles[3].pk}))
+            self.assertEqual(response.data["followed_by_followings_count"], 2)
+            response = self.client.get(reverse("profile-mutuals", kwargs={"user_id": self.profiles[3].pk}))
+            self.assertEqual(len(response.data["results"]), 1)
+
+
+class FollowSuggestionsTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.profiles = [
+            Profile.objects.create_user(f"test_email_{i}@mail.ru", f"test_username_{i}", TEST_PASSWORD)
+            for i in range(5)
+        ]
+        viewer, first, second, artist, other = self.profiles
+        viewer.followings.add(first, second)
+        first.followings.add(artist, other)
+        second.followings.add(artist, viewer)
+
+        self.clear_suggestions()
+        self.addCleanup(self.clear_suggestions)
+        self.refresh_token = CustomRefreshToken.for_user(viewer)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def clear_suggestions(self) -> None:
+        clear_follows_cache(self.profiles)
+        get_redis_connection("default").delete(
+            CHANGED_KEY, COMPUTED_KEY,
+            *(get_suggestions_key(profile.pk) for profile in self.profiles)
+        )
+
+    def test_suggestions_computed(self):
+        viewer, first, second, artist, other = self.profiles
+        self.assertEqual(update_follow_suggestions_task(), len(self.profiles))
+        # followed by both followings first, followed Profiles and user are skipped
+        self.assertEqual(get_suggestions(viewer.pk), [[artist.pk, 2], [other.pk, 1]])
+        self.assertEqual(get_suggestions(second.pk), [[first.pk, 1]])
+        self.assertEqual(get_suggestions(artist.pk), [])
+
+    def test_suggestions_updated_incrementally(self):
+        viewer, first, second, artist, other = self.profiles
+        update_follow_suggestions_task()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("profile-followings-management", kwargs={"profile_id": artist.pk}))
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {str(CustomRefreshToken.for_user(other).access_token)}"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("profile-followings-management", kwargs={"profile_id": second.pk}))
+
+        # changed Profiles and their followers only
+        self.assertEqual(update_follow_suggestions_task(), 4)
+        self.assertEqual(get_suggestions(viewer.pk), [[other.pk, 1]])
+        self.assertEqual(get_suggestions(first.pk), [[second.pk, 1]])
+        self.assertEqual(update_follow_suggestions_task(), 0)
+
+    def test_suggestions_list(self):
+        viewer, first, second, artist, other = self.profiles
+        update_follow_suggestions_task()
+        # followed after suggestions computation
+        viewer.followings.add(other)
+        clear_follows_cache([viewer])
+
+        response = self.client.get(reverse("profile-follow-suggestions"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["id"], artist.pk)
+        self.assertEqual(response.data[0]["followed_by_followings_count"], 2)
+
+
+class LikesCacheTestCase(APITestCase):
+
+    def setUp(self) -> None:
+        self.artist = Profile.objects.create_user(
+            TEST_EMAIL,
+            TEST_USERNAME,
+            TEST_PASSWORD,
+            is_artist=True
+        )
+        genre = Genre.objects.create(genre="test_genre")
+        Song.objects.bulk_create(
+            Song(title=f"test_song_{i}", audio="test_uri", artist=self.artist, genre=genre)
+            for i in range(10)
+        )
+        self.songs = list(Song.objects.order_by("title"))
+        self.artist.liked_songs.add(*self.songs[:3])
+        likes_key = get_likes_key(LIKED_SONGS, self.artist.pk)
+        get_redis_connection("default").delete(likes_key)
+        self.addCleanup(get_redis_connection("default").delete, likes_key)
+
+        self.refresh_token = CustomRefreshToken.for_user(self.artist)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(self.refresh_token.access_token)}")
+
+    def get_liked_flags(self) -> list:
+        response = self.client.get(reverse("songs-list-create"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [song["is_liked"] for song in response.data["results"]]
+
+    def test_page_likes_resolved_at_once(self):
+        with mock.patch(
+                "profiles.likes.get_redis_connection", wraps=get_redis_connection
+        ) as redis_connection:
+            self.assertEqual(self.get_liked_flags(), [True] * 3 + [False] * 7)
+            # liked set is loaded once
+            with mock.patch("profiles.likes.load_likes") as load_likes:
+                self.assertEqual(self.get_liked_flags(), [True] * 3 + [False] * 7)
+        load_likes.assert_not_called()
+        self.assertEqual(redis_connection.call_count, 2)
+
+    def test_likes_written_through(self):
+        self.get_liked_flags()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("songs-likes-management", kwargs={"song_id": self.songs[5].pk}))
+            self.client.delete(reverse("songs-likes-management", kwargs={"song_id": self.songs[0].pk}))
+
+        with mock.patch("profiles.likes.load_likes") as load_likes:
+            self.assertEqual(self.get_liked_flags(), [False] + [True] * 2 + [False] * 2 + [True] + [False] * 4)
+        load_likes.assert_not_called()
+
+    def test_likes_without_redis(self):
+        with mock.patch(
+                "profiles.likes.get_redis_connection", side_effect=redis.exceptions.ConnectionError
+        ):
+            self.assertEqual(self.get_liked_flags(), [True] * 3 + [False] * 7)
+
+    def test_likes_changed_by_orm_invalidated(self):
+        self.get_liked_flags()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.artist.liked_songs.add(self.songs[5])
+        self.assertEqual(self.get_liked_flags(), [True] * 3 + [False] * 2 + [True] + [False] * 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.songs[5].liked_profiles.remove(self.artist)
+        self.assertEqual(self.get_liked_flags(), [True] * 3 + [False] * 7)
+
+        # likes of deleted song are removed by cascade
+        with self.captureOnCommitCallbacks(execute=True):
+            self.songs[0].delete()
+        self.assertFalse(get_redis_connection("default").exists(get_likes_key(LIKED_SONGS, self.artist.pk)))
+        self.assertEqual(self.get_liked_flags(), [True] * 2 + [False] * 7)
+
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialog: accepts every message and stores it on server."""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost ESMTP")
+        while line := self.rfile.readline():
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                message = []
+                while (data := self.rfile.readline()) not in (b".\r\n", b""):
+                    message.append(data)
+                self.server.messages.append(b"".join(message))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                break
+            else:
+                self.reply("250 OK")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), LocalSMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+
+class ReleasesDigestTestCase(TestCase):
+    FOLLOWERS_COUNT = 30
+
+    def setUp(self) -> None:
+        self.smtp_server = LocalSMTPServer()
+        threading.Thread(target=self.smtp_server.serve_forever, daemon=True).start()
+
+        genre = Genre.objects.create(genre="test_genre")
+        artist = Profile.objects.create(
+            email="artist@mail.ru", username="test_artist", is_artist=True
+        )
+        other_artist = Profile.objects.create(
+            email="other_artist@mail.ru", username="other_artist", is_artist=True
+        )
+        Song.objects.create(title="first_song", audio="uri", genre=genre, artist=artist)
+        Song.objects.create(title="second_song", audio="uri", genre=genre, artist=artist)
+        Song.objects.create(title="other_song", audio="uri", genre=genre, artist=other_artist)
+
+        Profile.objects.bulk_create(
+            Profile(email=f"follower_{i}@mail.ru", username=f"follower_{i}")
+            for i in range(self.FOLLOWERS_COUNT)
+        )
+        followers = Profile.objects.filter(username__startswith="follower_")
+        artist.followers.add(*followers)
+        other_artist.followers.add(followers[0])
+        # not followed artist's release must not be mailed
+        Profile.objects.create(email="lonely@mail.ru", username="lonely")
+
+    def tearDown(self) -> None:
+        self.smtp_server.shutdown()
+        self.smtp_server.server_close()
+
+    def send_digest(self, **settings):
+        settings.setdefault("RELEASES_DIGEST_RATE_LIMIT", 1000)
+        with override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.smtp_server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            **settings
+        ):
+            return send_releases_digest_task()
+
+    def test_digest_single_query(self):
+        with self.assertNumQueries(1):
+            sent = self.send_digest()
+        self.assertEqual(sent, self.FOLLOWERS_COUNT)
+
+    def test_digest_content(self):
+        self.send_digest()
+        messages = b"\n".join(self.smtp_server.messages).decode()
+        self.assertIn("test_artist - first_song", messages)
+        self.assertIn("other_artist - other_song", messages)
+        self.assertNotIn("lonely", messages)
+
+    def test_digest_reuses_connection(self):
+        sent = self.send_digest(RELEASES_DIGEST_BATCH_SIZE=7)
+        self.assertEqual(sent, self.FOLLOWERS_COUNT)
+        self.assertEqual(len(self.smtp_server.messages), self.FOLLOWERS_COUNT)
+        self.assertEqual(self.smtp_server.connections, 1)
+
+    def test_digest_rate_limit(self):
+        rate_limit = 100
+        # clock doesn't move while sending, so every batch is paused for its full share
+        with mock.patch("profiles.utils.time") as utils_time:
+            utils_time.monotonic.return_value = 0
+            sent = self.send_digest(
+                RELEASES_DIGEST_BATCH_SIZE=10,
+                RELEASES_DIGEST_RATE_LIMIT=rate_limit
+            )
+        self.assertEqual(sent, self.FOLLOWERS_COUNT)
+        sleeps = utils_time.sleep.call_args_list
+        self.assertEqual(sleeps, [mock.call(10 / rate_limit)] * 3)
+        paused = sum(call.args[0] for call in sleeps)
+        self.assertLessEqual(sent / paused, rate_limit)
+
+
+class GenerateDatasetTestCase(TestCase):
+
+    def generate(self, **options):
+        options = {
+            "profiles": 200, "artists": 10, "songs": 300, "likes": 2000, "follows": 1000,
+            "playlists": 20, "playlist_songs": 200, "genres": 3, "seed": 7,
+            "workers": 1, "chunk_size": 50, **options
+        }
+        call_command("generate_dataset", stdout=io.StringIO(), **options)
+
+    def test_generate_dataset(self):
+        self.generate()
+        self.assertEqual(Profile.objects.count(), 200)
+        self.assertEqual(Profile.objects.filter(is_artist=True).count(), 10)
+        self.assertEqual(Song.objects.count(), 300)
+        self.assertEqual(Playlist.objects.count(), 20)
+        self.assertTrue(1000 < SongLike.objects.count() <= 2000 * 2)
+        self.assertTrue(SongInPlaylist.objects.exists())
+        self.assertEqual(Genre.objects.count(), 3)
+        # followings are concentrated on artists
+        follows = Profile.followings.through.objects
+        self.assertGreater(follows.filter(to_profile__is_artist=True).count(), follows.count() // 2)
+        self.assertFalse(follows.filter(from_profile=F("to_profile")).exists())
+        # explicit ids are followed by sequence ids
+        profile = Profile.objects.create_user(username="after", email="after@test.com", password="pass")
+        self.assertGreater(profile.pk, 200)
+
+    def test_power_law_popularity(self):
+        self.generate(songs=1000, likes=20000)
+        likes = sorted(
+            Song.objects.annotate(total=Count("liked_profiles_through")).values_list("total", flat=True), reverse=True
+        )
+        # top 10% of songs get most likes
+        self.assertGreater(sum(likes[:100]), sum(likes) / 2)
+
+    def test_reproducible(self):
+        plan = DatasetPlan(
+            seed=1, profiles=100, artists=10, songs=100, likes=1000, follows=500,
+            playlists=0, playlist_songs=0, exponent=1.1, artist_follows_share=0.9,
+            first_profile=1, first_song=1, first_playlist=1, genre_ids=(1, ),
+            password="", now=timezone.now(), days=30
+        )
+        for generate in (generate_likes, generate_follows):
+            rows = [generate(np.random.default_rng([plan.seed, 0, 0]), plan, 0, 50) for _ in range(2)]
+            self.assertEqual(rows[0], rows[1])
+            self.assertTrue(next(iter(rows[0].values())))
+        self.assertNotEqual(
+            generate_likes(np.random.default_rng([1]), plan, 0, 50),
+            generate_likes(np.random.default_rng([2]), plan, 0, 50)
+        )
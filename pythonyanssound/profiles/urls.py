@@ -3,7 +3,8 @@ from .views import (
     ProfileDetailsView, OwnProfileDetailsUpdateView, ProfileCreateView,
     LogoutView, LoginView, ResendVerificationEmailView, FollowView,
     ChangePasswordView, FollowsListView, VerificationEmailView,
-    TokenRefreshView
+    TokenRefreshView, FollowersListView, MutualsListView,
+    FollowSuggestionsView
 )
 
 urlpatterns = [
@@ -22,6 +23,21 @@ urlpatterns = [
         view=ProfileDetailsView.as_view(),
         name="profile-details"
     ),
+    path(
+        route='<int:user_id>/followers/',
+        view=FollowersListView.as_view(),
+        name="profile-followers"
+    ),
+    path(
+        route='<int:user_id>/mutuals/',
+        view=MutualsListView.as_view(),
+        name="profile-mutuals"
+    ),
+    path(
+        route='suggestions/',
+        view=FollowSuggestionsView.as_view(),
+        name="profile-follow-suggestions"
+    ),
     path(
         route='registration/',
         view=ProfileCreateView.as_view(),
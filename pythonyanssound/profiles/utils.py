@@ -1,5 +1,12 @@
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.core.mail import EmailMessage, get_connection
+
+# (email, username, [(artist username, song title), ...])
+ReleasesDigest = Tuple[str, str, List[Tuple[str, str]]]
 
 
 class EmailUtil:
@@ -19,7 +26,56 @@ class EmailUtil:
         )
         email.send()
 
+    @staticmethod
+    def render_releases_digest_message(digest: ReleasesDigest) -> EmailMessage:
+        """Builds releases digest message for one Profile."""
+        email, username, releases = digest
+        lines = "\n".join(
+            f"  - {artist} - {title}" for artist, title in releases
+        )
+        return EmailMessage(
+            subject="New releases of the week",
+            body=f"Hi {username}. Artists you follow released new songs:\n"
+                 f"{lines}\n"
+                 f"Listen to them at {settings.FRONTEND_BASE_URL}/",
+            to=[email]
+        )
+
+    @staticmethod
+    def send_releases_digest_messages(digests: Iterable[ReleasesDigest]) -> int:
+        """
+        Sends releases digest messages and returns number of sent messages.
+
+        Messages are rendered in batches of 'RELEASES_DIGEST_BATCH_SIZE'
+        and sent over one SMTP connection reused by all batches
+        Every batch is throttled to 'RELEASES_DIGEST_RATE_LIMIT'
+        messages per second
+        """
+        sent = 0
+        connection = get_connection()
+        # opened connection isn't closed by 'send_messages' between batches
+        connection.open()
+        try:
+            for batch in chunked(digests, settings.RELEASES_DIGEST_BATCH_SIZE):
+                started = time.monotonic()
+                messages = [
+                    EmailUtil.render_releases_digest_message(digest)
+                    for digest in batch
+                ]
+                sent += connection.send_messages(messages) or 0
+                pause = (
+                    len(messages) / settings.RELEASES_DIGEST_RATE_LIMIT
+                    - (time.monotonic() - started)
+                )
+                if pause > 0:
+                    time.sleep(pause)
+        finally:
+            connection.close()
+        return sent
+
 
-def profile_photo_upload_folder(profile_instance, filename: str):
-    """Returns path to upload Profile photo."""
-    return f"profiles/{profile_instance.pk}/photos/{filename}"
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Splits iterable to lists with 'size' items (last one may be shorter)."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
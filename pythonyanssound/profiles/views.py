@@ -1,4 +1,6 @@
-from django.db.models import Exists, OuterRef
+from typing import Sequence
+
+from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.generics import ListAPIView, GenericAPIView
 from rest_framework.permissions import IsAuthenticated
@@ -8,15 +10,24 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenViewBase
 
 from pythonyanssound.pagination import CustomPageNumberPagination
+from pythonyanssound.tasks import schedule_thumbnails_generation
+from pythonyanssound.versions import (
+    ContentValidators, content_version_key, relations_version_key
+)
+from .follows import (
+    FOLLOWERS, get_follows, get_mutuals, get_follows_details, are_followed
+)
 from .models import Profile
 from .serializers import (
     ProfileSerializer, TokenRefreshSerializer, LogoutSerializer,
-    LoginSerializer, ShortProfileSerializer, ProfileDetailsSerializer
+    LoginSerializer, ShortProfileSerializer, ProfileDetailsSerializer,
+    FollowSuggestionSerializer
 )
 from .services import (
     register_new_profile, verify_email_address, blacklist_refresh_token,
-    change_user_password
+    change_user_password, follow_profile, unfollow_profile
 )
+from .suggestions import get_suggestions
 from .tasks import send_verify_email_task
 from .tokens import VerifyToken
 
@@ -42,6 +53,7 @@ class OwnProfileDetailsUpdateView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        schedule_thumbnails_generation(request.user, "photo")
         return Response(serializer.data)
 
 
@@ -64,14 +76,25 @@ class ProfileDetailsView(GenericAPIView):
     serializer_class = ProfileDetailsSerializer
 
     def get(self, request: Request, user_id: int):
-        """Returns data of Profile, which identified with 'user_id'."""
-        profile = Profile.objects.annotate(
-            is_followed=Exists(
-                request.user.followings.filter(pk=OuterRef("pk"))
-            )
-        ).get(pk=user_id, is_active=True)
+        """
+        Returns data of Profile, which identified with 'user_id'.
+
+        Responds with 304 (Not Modified) if Profile hasn't changed
+        since request 'If-None-Match'/'If-Modified-Since' validators
+        """
+        validators = ContentValidators(request, (
+            content_version_key(Profile, user_id),
+            relations_version_key(request.user.pk)
+        ))
+        not_modified = validators.get_not_modified_response()
+        if not_modified is not None:
+            return not_modified
+
+        profile = Profile.objects.get(pk=user_id, is_active=True)
+        for attr, value in get_follows_details(request.user.pk, profile.pk).items():
+            setattr(profile, attr, value)
         serializer = self.get_serializer(instance=profile)
-        return Response(serializer.data)
+        return validators.set_headers(Response(serializer.data))
 
 
 class ProfileCreateView(APIView):
@@ -175,17 +198,85 @@ class FollowView(APIView):
     def post(self, request: Request, profile_id: int):
         """
         Appends Profile (with pk equals to 'profile_id')
-        to authenticated user's follow list.
+        to authenticated user's follow list (idempotent).
         """
-        profile = Profile.objects.get(pk=profile_id)
-        request.user.followings.add(profile)
-        return Response(data={"message": f"Successful follow on {profile}"})
+        follow_profile(request.user, profile_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     def delete(self, request: Request, profile_id: int):
         """
         Removes Profile (with pk equals to 'profile_id')
-        from authenticated user's follow list.
+        from authenticated user's follow list (idempotent).
+        """
+        unfollow_profile(request.user, profile_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FollowsGraphListView(ListAPIView):
+    """
+    Base view to retrieve list of Profiles from follows graph cache
+    (Profile followers/followings chosen by 'relation').
+
+    Ids are taken from Redis sorted sets by pages (ZCARD and ZREVRANGE),
+    only page of Profiles is queried
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ShortProfileSerializer
+    pagination_class = CustomPageNumberPagination
+    relation = FOLLOWERS
+
+    def get_profile_ids(self, profile: Profile) -> Sequence[int]:
+        """Returns ids of listed Profiles (descending - newest Profiles first)."""
+        return get_follows(self.relation, profile.pk)
+
+    def get_queryset(self):
+        """Returns listed Profiles ids, responds with 404 for unknown Profile."""
+        profile = get_object_or_404(Profile, pk=self.kwargs["user_id"], is_active=True)
+        return self.get_profile_ids(profile)
+
+    def paginate_queryset(self, queryset):
+        """Returns Profiles of ids page (in ids order)."""
+        ids = super().paginate_queryset(queryset)
+        profiles = Profile.objects.in_bulk(ids)
+        return [profiles[pk] for pk in ids if pk in profiles]
+
+
+class FollowersListView(FollowsGraphListView):
+    """Processes GET method to retrieve list of Profile followers."""
+    relation = FOLLOWERS
+
+
+class MutualsListView(FollowsGraphListView):
+    """
+    Processes GET method to retrieve list of Profile mutuals
+    (Profiles which follow Profile and are followed back).
+    """
+
+    def get_profile_ids(self, profile: Profile) -> Sequence[int]:
+        return get_mutuals(profile.pk)
+
+
+class FollowSuggestionsView(APIView):
+    """Processes GET method to retrieve follow suggestions of authenticated user."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request: Request):
+        """
+        Returns Profiles suggested to follow (followed by user's followings)
+        with number of user's followings who follow them.
+
+        Suggestions are computed by periodic task,
+        Profiles followed since then are skipped
         """
-        profile = request.user.followings.get(pk=profile_id)
-        request.user.followings.remove(profile)
-        return Response(data={"message": f"Successful unfollow from {profile}"})
+        suggestions = get_suggestions(request.user.pk)
+        ids = [pk for pk, _ in suggestions]
+        profiles = Profile.objects.filter(is_active=True).in_bulk(ids)
+        followed = are_followed(request.user.pk, ids)
+
+        suggested_profiles = []
+        for (pk, count), is_followed in zip(suggestions, followed):
+            if pk in profiles and not is_followed:
+                profiles[pk].followed_by_followings_count = count
+                suggested_profiles.append(profiles[pk])
+        serializer = FollowSuggestionSerializer(instance=suggested_profiles, many=True)
+        return Response(serializer.data)
@@ -0,0 +1,41 @@
+from typing import Type
+
+from django.db import connections, router
+from django.db.models import Expression, Model, QuerySet
+
+
+def insert_from_select(model: Type[Model], queryset: QuerySet, **values: Expression) -> int:
+    """
+    Inserts model rows selected by queryset with one INSERT ... SELECT,
+    returns number of inserted rows.
+
+    'values' map model fields to expressions selected for every
+    queryset row (e.g. song=F("pk"), profile=Value(profile_pk))
+    Rows conflicting with unique constraints are skipped,
+    so repeated inserts are idempotent
+    """
+    connection = connections[router.db_for_write(model)]
+    ops = connection.ops
+    aliases = {f"insert_{name}": value for name, value in values.items()}
+    select = queryset.order_by().annotate(**aliases).values(*aliases)
+    sql, params = select.query.get_compiler(connection=connection).as_sql()
+    columns = ", ".join(
+        ops.quote_name(model._meta.get_field(name).column) for name in values
+    )
+    statement = (
+        f"{ops.insert_statement(ignore_conflicts=True)} "
+        f"{ops.quote_name(model._meta.db_table)} ({columns}) {sql} "
+        f"{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(statement, params)
+        return cursor.rowcount
+
+
+def delete_rows(queryset: QuerySet) -> int:
+    """
+    Deletes rows selected by queryset with one DELETE
+    (without collecting instances and sending signals),
+    returns number of deleted rows.
+    """
+    return queryset._raw_delete(router.db_for_write(queryset.model))
@@ -0,0 +1,150 @@
+import hmac
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess
+)
+from redis.client import Pipeline, Redis
+
+# metrics of worker processes are written to files of this directory
+# and merged on scrape (gunicorn.conf.py), single process otherwise
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency.", ("view", "method"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUESTS = Counter("http_requests_total", "Number of requests.", ("view", "method", "status"))
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size.", ("view", ),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Number of SQL queries per request.", ("view", ),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+)
+QUERIES = Counter("db_queries_total", "Number of SQL queries.", ("view", ))
+QUERIES_TIME = Counter("db_query_seconds_total", "Time of SQL queries.", ("view", ))
+REDIS_COMMANDS = Counter("redis_commands_total", "Number of Redis commands.", ("view", ))
+REDIS_TIME = Counter("redis_command_seconds_total", "Time of Redis commands and pipelines.", ("view", ))
+
+
+@dataclass
+class RequestStats:
+    """Database and Redis cost of request."""
+    queries: int = 0
+    queries_time: float = 0
+    redis_commands: int = 0
+    redis_time: float = 0
+
+
+# stats of current request, None outside of requests (tasks, commands)
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def start_request_stats():
+    """Starts collecting stats of current request, returns reset token."""
+    return _request_stats.set(RequestStats())
+
+
+def get_request_stats() -> Optional[RequestStats]:
+    """Returns stats of current request."""
+    return _request_stats.get()
+
+
+def reset_request_stats(token) -> None:
+    """Stops collecting stats of request."""
+    _request_stats.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries of request."""
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.queries_time += time.perf_counter() - started
+
+
+def record_redis(commands: int, started: float) -> None:
+    """Adds Redis commands sent since 'started' to request stats."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.redis_commands += commands
+        stats.redis_time += time.perf_counter() - started
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline counting buffered commands of request on execute."""
+
+    def execute(self, raise_on_error=True):
+        commands, started = len(self.command_stack), time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            record_redis(commands, started)
+
+
+class InstrumentedRedis(Redis):
+    """
+    Redis client counting commands of request
+    (django-redis 'REDIS_CLIENT_CLASS').
+    """
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_redis(1, started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def observe_request(view: str, method: str, response: HttpResponse, latency: float, stats: RequestStats) -> None:
+    """Records metrics of finished request."""
+    REQUEST_LATENCY.labels(view, method).observe(latency)
+    REQUESTS.labels(view, method, response.status_code).inc()
+    if not response.streaming:
+        RESPONSE_SIZE.labels(view).observe(len(response.content))
+    REQUEST_QUERIES.labels(view).observe(stats.queries)
+    QUERIES.labels(view).inc(stats.queries)
+    QUERIES_TIME.labels(view).inc(stats.queries_time)
+    REDIS_COMMANDS.labels(view).inc(stats.redis_commands)
+    REDIS_TIME.labels(view).inc(stats.redis_time)
+
+
+def is_metrics_scraper(request: HttpRequest) -> bool:
+    """
+    Checks whether request comes from address of 'APP_METRICS_ALLOWED_IPS'
+    or has bearer token 'APP_METRICS_TOKEN'.
+    """
+    if request.META.get("REMOTE_ADDR") in settings.APP_METRICS_ALLOWED_IPS:
+        return True
+    token = settings.APP_METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(
+        request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"
+    )
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Returns metrics of all worker processes in Prometheus text format."""
+    if not is_metrics_scraper(request):
+        return HttpResponseForbidden()
+    registry = REGISTRY
+    if os.environ.get(MULTIPROCESS_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,189 @@
+import time
+from contextlib import ExitStack
+from typing import Optional
+
+import redis.exceptions
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django_redis import get_redis_connection
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .metrics import (
+    get_request_stats, observe_request, record_query, reset_request_stats, start_request_stats
+)
+from .profiling import (
+    StatementsRecorder, add_plans, build_profile, is_profiled, sample_request, save_profile
+)
+from .routers import choose_replica, set_request_replica, reset_request_replica
+
+PRIMARY_READS_KEY_PREFIX = "primary_reads:"
+
+
+def get_token_user_id(request: HttpRequest) -> Optional[int]:
+    """
+    Returns user id from request access token (without database query)
+    or None for anonymous request or invalid token.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+    except InvalidToken:
+        return None
+    return token.get(api_settings.USER_ID_CLAIM)
+
+
+def get_primary_reads_key(user_id: int) -> str:
+    """Returns Redis key marking user recently made writes."""
+    return f"{PRIMARY_READS_KEY_PREFIX}{user_id}"
+
+
+def is_pinned_to_primary(user_id: Optional[int]) -> bool:
+    """Checks whether user reads must go to primary (own writes are fresh)."""
+    if user_id is None:
+        return False
+    try:
+        return bool(get_redis_connection("default").exists(get_primary_reads_key(user_id)))
+    except redis.exceptions.ConnectionError:
+        # replica can lag behind user's writes
+        return True
+
+
+def pin_to_primary(user_id: int) -> None:
+    """Routes user reads to primary for 'APP_DATABASE_STICKINESS_PERIOD'."""
+    try:
+        get_redis_connection("default").set(
+            get_primary_reads_key(user_id), 1,
+            ex=settings.APP_DATABASE_STICKINESS_PERIOD
+        )
+    except redis.exceptions.ConnectionError:
+        pass
+
+
+class MetricsMiddleware:
+    """
+    Records Prometheus metrics of request labeled with resolved URL name:
+    latency, response size, number and time of SQL queries
+    and Redis commands (see 'pythonyanssound.metrics').
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        token = start_request_stats()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record_query))
+                response = self.get_response(request)
+            match = request.resolver_match
+            observe_request(
+                match.view_name if match else "unresolved", request.method,
+                response, time.perf_counter() - started, get_request_stats()
+            )
+            return response
+        finally:
+            reset_request_stats(token)
+
+
+class SqlProfilingMiddleware:
+    """
+    Saves SQL profiles of sampled requests and requests slower than
+    'APP_SQL_PROFILING_SLOW_REQUEST' to Redis ring buffer
+    (browsed on admin 'SQL profiles' page).
+
+    Request slowness is known after response only, so statements
+    of every request are counted, but kept only for sampled requests
+    (profiles of other slow requests have queries count and time only)
+    Slowest statements of sampled requests are explained in-process
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        sampled = sample_request()
+        recorder = StatementsRecorder(record_statements=sampled)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder.wrapper(connection.alias)))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        if is_profiled(duration, sampled):
+            profile = build_profile(request, response.status_code, duration, recorder)
+            save_profile(add_plans(profile, recorder))
+        return response
+
+
+class ConnectionsHealthCheckMiddleware:
+    """
+    Closes persistent database connections broken while idle
+    (e.g. by database restart) before request uses them.
+
+    Only connections idle longer than 'APP_DB_HEALTH_CHECK_IDLE' seconds
+    are checked (one 'SELECT 1' each)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        now = time.monotonic()
+        for connection in connections.all():
+            idle_since = getattr(connection, "idle_since", None)
+            if (
+                    connection.connection is not None and idle_since is not None
+                    and now - idle_since > settings.APP_DB_HEALTH_CHECK_IDLE
+                    and not connection.is_usable()
+            ):
+                connection.close()
+        try:
+            return self.get_response(request)
+        finally:
+            now = time.monotonic()
+            for connection in connections.all():
+                connection.idle_since = now
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Routes reads of safe method requests to database replicas.
+
+    Read-your-writes: after user's write request their reads stay
+    on primary for 'APP_DATABASE_STICKINESS_PERIOD' seconds
+    (replicas catch up with primary meanwhile)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not settings.APP_DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        user_id = get_token_user_id(request)
+        replica = None
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(user_id):
+            replica = choose_replica()
+
+        token = set_request_replica(replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_request_replica(token)
+
+        if request.method not in SAFE_METHODS and user_id is not None:
+            pin_to_primary(user_id)
+        return response
@@ -1,9 +1,14 @@
+import base64
+import binascii
 import math
 from collections import OrderedDict
 from typing import Optional
 
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, BasePagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -36,3 +41,66 @@ class CustomPageNumberPagination(PageNumberPagination):
             ('previous', self.get_previous_link()),
             ('results', data)
         ]))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination of querysets ordered by ('-<field>', '-pk').
+
+    Page starts after the last row of previous page
+    ('(field, pk) < (last field, last pk)' condition), so every page
+    is read from index range without counting and skipping rows
+    Cursor of next page encodes the last row values
+    Field is taken from queryset descending ordering ('field' by default)
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    field = "creation_date"
+
+    def __init__(self):
+        self.next_cursor: Optional[str] = None
+
+    def paginate_queryset(self, queryset, request, view=None) -> list:
+        """Returns rows of page after cursor row."""
+        field = self.get_field(queryset)
+        model_field = queryset.model._meta.get_field(field)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is not None:
+            value, pk = self.decode_cursor(cursor, model_field)
+            # range condition on field keeps index range scan
+            queryset = queryset.filter(
+                **{f"{field}__lte": value}
+            ).exclude(**{field: value, "pk__gte": pk})
+        rows = list(queryset.order_by(f"-{field}", "-pk")[:self.page_size + 1])
+        page = rows[:self.page_size]
+        if len(rows) > self.page_size:
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(model_field.value_to_string(last), last.pk)
+        return page
+
+    def get_field(self, queryset) -> str:
+        """Returns the first field of queryset descending ordering or 'field'."""
+        ordering = queryset.query.order_by
+        if ordering and ordering[0].startswith("-"):
+            return ordering[0][1:]
+        return self.field
+
+    def encode_cursor(self, value: str, pk) -> str:
+        """Returns cursor of row with field value and pk."""
+        return base64.urlsafe_b64encode(f"{value}|{pk}".encode()).decode()
+
+    def decode_cursor(self, cursor: str, model_field) -> tuple:
+        """Returns (field value, pk) of cursor row."""
+        try:
+            value, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+            return model_field.to_python(value), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_paginated_response(self, data: list) -> Response:
+        """Returns paginated response with next page cursor."""
+        return Response(OrderedDict([
+            ('next', self.next_cursor),
+            ('results', data)
+        ]))
@@ -0,0 +1,166 @@
+import json
+import random
+import time
+import uuid
+from typing import List
+
+import redis.exceptions
+from django.conf import settings
+from django.contrib import admin
+from django.db import DatabaseError, connections
+from django.http import Http404, HttpRequest, HttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+# Redis list of last profiles (newest first)
+PROFILES_KEY = "sql_profiles"
+
+
+class Statement:
+    """SQL statement executed during request."""
+    __slots__ = ("alias", "sql", "params", "duration")
+
+    def __init__(self, alias: str, sql: str, params, duration: float):
+        self.alias = alias
+        self.sql = sql
+        self.params = params
+        self.duration = duration
+
+
+class StatementsRecorder:
+    """
+    Database execute wrapper counting SQL statements of request.
+
+    Statements are kept only if 'record_statements' is set
+    (up to 'APP_SQL_PROFILING_MAX_STATEMENTS', the rest are only counted)
+    """
+
+    def __init__(self, record_statements: bool):
+        self.record_statements = record_statements
+        self.statements: List[Statement] = []
+        self.count = 0
+        self.time = 0.0
+
+    def wrapper(self, alias: str):
+        def record_statement(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duration = time.perf_counter() - started
+                self.count += 1
+                self.time += duration
+                if self.record_statements and len(self.statements) < settings.APP_SQL_PROFILING_MAX_STATEMENTS:
+                    self.statements.append(Statement(alias, sql, None if many else params, duration))
+
+        return record_statement
+
+
+def is_profiled(duration: float, sampled: bool) -> bool:
+    """Checks whether request profile is saved (sampled or slow request)."""
+    return sampled or duration >= settings.APP_SQL_PROFILING_SLOW_REQUEST
+
+
+def sample_request() -> bool:
+    """Chooses request for profiling with 'APP_SQL_PROFILING_SAMPLE_RATE'."""
+    return random.random() < settings.APP_SQL_PROFILING_SAMPLE_RATE
+
+
+def explain(alias: str, sql: str, params: list) -> str:
+    """Returns plan of SELECT statement."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as error:
+        return f"EXPLAIN failed: {error}"
+
+
+def is_explainable(statement: Statement) -> bool:
+    """Checks whether statement is SELECT executed with params (not executemany)."""
+    return statement.params is not None and statement.sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+def redact_params(params) -> str:
+    """Returns types of statement params (values can contain secrets)."""
+    if params is None:
+        return ""
+    return ", ".join(type(param).__name__ for param in params)
+
+
+def build_profile(
+        request: HttpRequest, status: int, duration: float, recorder: StatementsRecorder
+) -> dict:
+    """Returns profile of request with its recorded statements (param values are redacted)."""
+    match = request.resolver_match
+    return {
+        "id": uuid.uuid4().hex,
+        "date": timezone.now().isoformat(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "view": match.view_name if match else "unresolved",
+        "status": status,
+        "duration": duration,
+        "reason": "slow" if duration >= settings.APP_SQL_PROFILING_SLOW_REQUEST else "sampled",
+        "queries_count": recorder.count,
+        "queries_time": recorder.time,
+        "statements": [
+            {
+                "alias": statement.alias, "sql": statement.sql, "params": redact_params(statement.params),
+                "duration": statement.duration, "plan": None,
+            }
+            for statement in recorder.statements
+        ],
+    }
+
+
+def add_plans(profile: dict, recorder: StatementsRecorder) -> dict:
+    """
+    Runs EXPLAIN of 'APP_SQL_PROFILING_EXPLAIN_COUNT' slowest recorded SELECTs
+    and adds their plans to profile.
+
+    EXPLAIN runs in request process, so param values aren't passed anywhere
+    """
+    slowest = sorted(enumerate(recorder.statements), key=lambda item: item[1].duration, reverse=True)
+    explainable = [(index, statement) for index, statement in slowest if is_explainable(statement)]
+    for index, statement in explainable[:settings.APP_SQL_PROFILING_EXPLAIN_COUNT]:
+        profile["statements"][index]["plan"] = explain(statement.alias, statement.sql, statement.params)
+    return profile
+
+
+def save_profile(profile: dict) -> None:
+    """Adds profile to Redis ring buffer of 'APP_SQL_PROFILING_BUFFER_SIZE' last profiles."""
+    try:
+        pipe = get_redis_connection("default").pipeline()
+        pipe.lpush(PROFILES_KEY, json.dumps(profile))
+        pipe.ltrim(PROFILES_KEY, 0, settings.APP_SQL_PROFILING_BUFFER_SIZE - 1)
+        pipe.execute()
+    except redis.exceptions.ConnectionError:
+        pass
+
+
+def get_profiles() -> List[dict]:
+    """Returns saved profiles, newest first."""
+    return [json.loads(profile) for profile in get_redis_connection("default").lrange(PROFILES_KEY, 0, -1)]
+
+
+def sql_profiles_view(request: HttpRequest) -> HttpResponse:
+    """Admin page with list of saved request profiles."""
+    profiles = get_profiles()
+    if request.GET.get("reason"):
+        profiles = [profile for profile in profiles if profile["reason"] == request.GET["reason"]]
+    return render(request, "admin/sql_profiles.html", {
+        **admin.site.each_context(request), "title": "SQL profiles", "profiles": profiles,
+    })
+
+
+def sql_profile_view(request: HttpRequest, profile_id: str) -> HttpResponse:
+    """Admin page with statements and plans of one request profile."""
+    profile = next((profile for profile in get_profiles() if profile["id"] == profile_id), None)
+    if profile is None:
+        raise Http404("Profile has been removed from buffer.")
+    return render(request, "admin/sql_profile.html", {
+        **admin.site.each_context(request), "title": f"{profile['method']} {profile['path']}", "profile": profile,
+    })
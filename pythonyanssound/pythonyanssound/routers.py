@@ -0,0 +1,56 @@
+import random
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# replica alias chosen for current request, None - reads go to primary
+# (set by ReplicaRoutingMiddleware for safe method requests only,
+# so celery tasks and management commands read from primary)
+_request_replica: ContextVar[Optional[str]] = ContextVar("request_replica", default=None)
+
+
+def choose_replica() -> Optional[str]:
+    """Returns random replica alias or None if no replicas configured."""
+    if not settings.APP_DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.APP_DATABASE_REPLICAS)
+
+
+def set_request_replica(alias: Optional[str]):
+    """Routes reads of current request to replica, returns reset token."""
+    return _request_replica.set(alias)
+
+
+def reset_request_replica(token) -> None:
+    """Restores reads routing after request."""
+    _request_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Routes writes to primary ('default') database and reads
+    of safe method requests to one replica per request.
+
+    Reads inside transactions stay on primary to see own writes
+    """
+
+    def db_for_read(self, model, **hints) -> str:
+        """Returns database alias for reading model instances."""
+        replica = _request_replica.get()
+        if replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints) -> str:
+        """Returns database alias for writing model instances."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        """Replicas contain the same data, relations are always allowed."""
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name=None, **hints) -> bool:
+        """Migrations are applied to primary only (replicas are replicated)."""
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from typing import Optional, Iterable
+
+from django.db.models import Manager, Model, FileField
+from django.db.models.query import QuerySet
+from rest_framework.fields import Field
+from rest_framework.serializers import ListSerializer
+
+
+class ThumbnailField(Field):
+    """
+    Read-only field with URLs of image thumbnail of given size.
+
+    Represented as dict {"<format>": URL}
+    or None until thumbnails are generated
+    """
+
+    def __init__(self, image_field: str, size: int, **kwargs):
+        self.image_field = image_field
+        self.size = str(size)
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance) -> Optional[dict]:
+        image = getattr(instance, self.image_field)
+        thumbnails = instance.thumbnails
+        if not image or thumbnails.get("source") != image.name:
+            return None
+        return {
+            extension: image.storage.url(name)
+            for extension, name in thumbnails.get(self.size, {}).items()
+        }
+
+
+def collect_media_names(instance: Model, names_by_storage: dict) -> None:
+    """
+    Collects names of instance files and thumbnails grouped by storage.
+
+    Follows already loaded forward relations (nested serializers)
+    """
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, FileField):
+            file = getattr(instance, field.attname)
+            if file:
+                names = names_by_storage[file.storage]
+                names.add(file.name)
+                for thumbnails in getattr(instance, "thumbnails", {}).values():
+                    if isinstance(thumbnails, dict):
+                        names.update(thumbnails.values())
+        elif field.is_relation and field.is_cached(instance):
+            related = field.get_cached_value(instance)
+            if related is not None:
+                collect_media_names(related, names_by_storage)
+
+
+def prefetch_media_urls(instances: Iterable[Model]) -> None:
+    """
+    Generates URLs of files of all instances with one call per storage
+    (storages which are able to generate URLs in batch and cache them).
+    """
+    names_by_storage = defaultdict(set)
+    for instance in instances:
+        collect_media_names(instance, names_by_storage)
+    for storage, names in names_by_storage.items():
+        if hasattr(storage, "urls"):
+            storage.urls(names)
+
+
+class MediaURLsListSerializer(ListSerializer):
+    """
+    List serializer which generates media URLs of the whole page at once,
+    so rows serialization takes URLs from storage URLs cache.
+    """
+
+    def prefetch(self, instances: list) -> None:
+        """Prepares data of all instances before rows serialization."""
+        prefetch_media_urls(instances)
+
+    def to_representation(self, data):
+        if isinstance(data, Manager):
+            data = data.all()
+        if isinstance(data, QuerySet):
+            # evaluates queryset once, it's iterated again by super()
+            data = list(data)
+        self.prefetch(data)
+        return super().to_representation(data)
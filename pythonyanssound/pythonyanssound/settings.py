@@ -1,7 +1,10 @@
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -29,6 +32,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'storages',
 
+    'blobs',
     'music',
     'playlists',
     'profiles',
@@ -36,12 +40,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'pythonyanssound.middleware.SqlProfilingMiddleware',
+    'pythonyanssound.middleware.MetricsMiddleware',
+    'pythonyanssound.middleware.ConnectionsHealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'pythonyanssound.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -51,7 +59,7 @@ ROOT_URLCONF = 'pythonyanssound.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'pythonyanssound' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -78,8 +86,52 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASS'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': '5432',
+        # persistent connections (seconds), each server thread keeps one
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            # TCP keepalives detect dropped idle connections
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 3,
+        },
     }
 }
+# idle persistent connections are checked before request (seconds)
+APP_DB_HEALTH_CHECK_IDLE = 30
+
+# read replicas (comma separated hosts) of primary database,
+# safe method requests read from replicas
+APP_DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    APP_DATABASE_REPLICAS.append(alias)
+# tests route reads to replica mirroring primary test database
+# (not used unless test enables replicas)
+if sys.argv[1:2] == ['test'] and 'replica_1' not in DATABASES:
+    DATABASES['replica_1'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['pythonyanssound.routers.PrimaryReplicaRouter']
+# user reads stay on primary after write (seconds)
+APP_DATABASE_STICKINESS_PERIOD = 5
+# SQL statements of sampled requests (rate) and requests slower than
+# threshold (seconds) are saved to Redis ring buffer of last profiles,
+# slowest SELECTs of profile get EXPLAIN plans (extra queries, so
+# sampling is off unless enabled, e.g. 0.001 in production)
+APP_SQL_PROFILING_SAMPLE_RATE = float(os.environ.get('SQL_PROFILING_SAMPLE_RATE', 0))
+APP_SQL_PROFILING_SLOW_REQUEST = float(os.environ.get('SQL_PROFILING_SLOW_REQUEST', 1))
+APP_SQL_PROFILING_EXPLAIN_COUNT = 3
+APP_SQL_PROFILING_MAX_STATEMENTS = 500
+APP_SQL_PROFILING_BUFFER_SIZE = 200
+# Prometheus '/metrics' is served only to allowed client addresses
+# (comma separated) or to scrapers with bearer token (empty disables it)
+APP_METRICS_ALLOWED_IPS = list(filter(None, os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')))
+APP_METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
 
 
 # Password validation
@@ -159,6 +211,18 @@ CORS_ORIGIN_ALLOW_ALL = True
 APP_IMAGE_HEIGHT = 1000
 APP_IMAGE_WIDTH = 1000
 APP_FILE_MAX_SIZE = 1024 * 1024 * 50
+# direct to storage multipart uploads (part size / presigned URLs lifetime)
+APP_UPLOAD_PART_SIZE = 1024 * 1024 * 8
+APP_UPLOAD_URL_EXPIRE = 3600
+# resumable (tus-like) uploads (max chunk size / upload state lifetime)
+APP_TUS_VERSION = "1.0.0"
+APP_RESUMABLE_CHUNK_MAX_SIZE = 1024 * 1024 * 8
+APP_RESUMABLE_UPLOAD_EXPIRE = 60 * 60 * 24
+# max number of bytes read to recognize image header (JPEG EXIF included)
+APP_IMAGE_HEADER_MAX_SIZE = 1024 * 64
+# sizes (px) and formats of generated cover/photo thumbnails
+APP_THUMBNAIL_SIZES = (64, 256, 1000)
+APP_THUMBNAIL_FORMATS = ("webp", "jpeg")
 
 # Email settings
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
@@ -169,6 +233,10 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
 
+# Releases digest mailing settings (messages per batch / messages per second)
+RELEASES_DIGEST_BATCH_SIZE = 100
+RELEASES_DIGEST_RATE_LIMIT = 20
+
 # Redis settings
 REDIS_HOST = os.environ.get("REDIS_HOST")
 REDIS_PORT = "6379"
@@ -177,10 +245,15 @@ CACHES = {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/1",
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient"
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # commands of requests are counted in metrics
+            "REDIS_CLIENT_CLASS": "pythonyanssound.metrics.InstrumentedRedis",
         },
     }
 }
+# tests use separate Redis database flushed before every test
+TEST_RUNNER = "pythonyanssound.test_runner.IsolatedRedisTestRunner"
+APP_TEST_REDIS_DB = 15
 
 # Celery settings
 CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/1"
@@ -189,6 +262,37 @@ CELERY_RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/1"
 CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
+CELERY_IMPORTS = ("pythonyanssound.tasks", )
+CELERY_BEAT_SCHEDULE = {
+    "send-releases-digest": {
+        "task": "profiles.tasks.send_releases_digest_task",
+        "schedule": crontab(hour=9, minute=0, day_of_week="monday"),
+    },
+    "update-follow-suggestions": {
+        "task": "profiles.tasks.update_follow_suggestions_task",
+        "schedule": crontab(minute="*/15"),
+    },
+    "delete-unreferenced-blobs": {
+        "task": "blobs.tasks.delete_unreferenced_blobs_task",
+        "schedule": crontab(minute=30),
+    },
+    "compact-trending-charts": {
+        "task": "music.tasks.compact_trending_charts_task",
+        "schedule": crontab(),
+    },
+    "update-songs-charts": {
+        "task": "music.tasks.update_songs_charts_task",
+        "schedule": crontab(minute="*/10"),
+    },
+    "recount-genres-songs": {
+        "task": "music.tasks.recount_genres_songs_task",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "release-expired-resumable-uploads": {
+        "task": "music.tasks.release_expired_resumable_uploads_task",
+        "schedule": crontab(minute=0),
+    },
+}
 
 # S3 Bucket settings
 AWS_ACCESS_KEY_ID = os.environ.get("AWS_ACCESS_KEY_ID")
@@ -197,7 +301,60 @@ AWS_STORAGE_BUCKET_NAME = os.environ.get("AWS_STORAGE_BUCKET_NAME")
 
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
-DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+AWS_QUERYSTRING_EXPIRE = 3600
+DEFAULT_FILE_STORAGE = "pythonyanssound.storage.CachedURLS3Storage"
+
+# signed media URLs are served from cache until margin (seconds)
+# before expiration, in-process cache holds up to size URLs
+APP_MEDIA_URL_EXPIRE_MARGIN = 300
+APP_MEDIA_URL_CACHE_SIZE = 10000
+
+# uploaded files are hashed while received and saved once per content
+FILE_UPLOAD_HANDLERS = [
+    "blobs.uploadhandlers.HashingMemoryFileUploadHandler",
+    "blobs.uploadhandlers.HashingTemporaryFileUploadHandler",
+]
+APP_BLOB_DELETE_DELAY = 3600
+
+# detail responses validators (ETag, Last-Modified) are built from content
+# versions kept in Redis, they also change every period (seconds)
+APP_CONTENT_VERSION_EXPIRE = 86400
+APP_CONDITIONAL_GET_PERIOD = APP_MEDIA_URL_EXPIRE_MARGIN
+
+# ids of songs and playlists liked by user are cached in Redis sets
+APP_LIKES_CACHE_EXPIRE = 86400
+# max number of songs in bulk likes/playlist songs requests
+APP_BULK_SONGS_MAX_SIZE = 500
+# playlist songs positions are spaced by gap, playlist is rebalanced
+# when gap between moved songs becomes less than min gap
+APP_PLAYLIST_POSITION_GAP = 2 ** 16
+APP_PLAYLIST_POSITION_MIN_GAP = 16
+
+# followers and followings ids of profiles are cached in Redis sorted sets
+APP_FOLLOWS_CACHE_EXPIRE = 86400
+APP_FOLLOWS_CACHE_CHUNK_SIZE = 10000
+# mutuals of profile are intersected in Redis for pages of one list request
+APP_FOLLOWS_MUTUALS_EXPIRE = 60
+# follow suggestions are computed for chunks of profiles
+APP_FOLLOW_SUGGESTIONS_SIZE = 20
+APP_FOLLOW_SUGGESTIONS_CHUNK_SIZE = 1000
+
+# trending charts scores of listens and likes halve every half-life
+# (seconds), scores are rescaled every epoch period and charts are
+# trimmed to size on compaction
+APP_TRENDING_HALF_LIFE = 60 * 60 * 24
+APP_TRENDING_EPOCH_PERIOD = 60 * 60 * 24 * 7
+APP_TRENDING_CHART_SIZE = 1000
+APP_TRENDING_CHUNK_SIZE = 1000
+APP_TRENDING_LISTEN_WEIGHT = 1
+APP_TRENDING_LIKE_WEIGHT = 5
+# genre charts rows are refreshed for chunks of songs with new activity,
+# all-time charts rank songs by weighted likes and listens
+APP_CHARTS_CHUNK_SIZE = 1000
+APP_CHARTS_LIKE_WEIGHT = 5
+APP_CHARTS_LISTEN_WEIGHT = 1
+# genres are served from in-process cache (seconds)
+APP_GENRES_CACHE_TIMEOUT = 300
 
 # swagger docs settings
 SWAGGER_SETTINGS = {
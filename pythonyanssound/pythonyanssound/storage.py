@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+import redis.exceptions
+from django.conf import settings
+from django_redis import get_redis_connection
+from storages.backends.s3boto3 import S3Boto3Storage
+
+
+class CachedURLS3Storage(S3Boto3Storage):
+    """
+    S3 storage which caches signed file URLs.
+
+    URLs are signed with one S3 client shared by all process threads
+    and cached in-process (LRU) and in Redis (shared by processes)
+    until 'APP_MEDIA_URL_EXPIRE_MARGIN' seconds before they expire
+    """
+    redis_key_prefix = "media_url:"
+
+    def __init__(self, **settings_kwargs):
+        super().__init__(**settings_kwargs)
+        self._url_client = None
+        self._url_client_lock = threading.Lock()
+        # name -> (url, expiration timestamp)
+        self._url_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._url_cache_lock = threading.Lock()
+
+    @property
+    def url_client(self):
+        """Returns S3 client used to sign URLs (thread safe, one per storage)."""
+        if self._url_client is None:
+            with self._url_client_lock:
+                if self._url_client is None:
+                    self._url_client = self._create_session().client(
+                        "s3",
+                        region_name=self.region_name,
+                        use_ssl=self.use_ssl,
+                        endpoint_url=self.endpoint_url,
+                        config=self.config,
+                        verify=self.verify,
+                    )
+        return self._url_client
+
+    @property
+    def url_cache_timeout(self) -> int:
+        """Returns number of seconds signed URL is served from cache."""
+        return self.querystring_expire - settings.APP_MEDIA_URL_EXPIRE_MARGIN
+
+    def is_url_cacheable(self) -> bool:
+        """Returns 'True' if URLs are signed by S3 client."""
+        return self.querystring_auth and not self.custom_domain
+
+    def sign_url(self, name: str) -> str:
+        """Returns URL of file signed with shared S3 client."""
+        return self.url_client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket_name,
+                "Key": self._normalize_name(self._clean_name(name)),
+            },
+            ExpiresIn=self.querystring_expire
+        )
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        """Returns cached URL of file if URL has default parameters."""
+        if (
+            not name or parameters or expire or http_method
+            or not self.is_url_cacheable()
+        ):
+            return super().url(name, parameters, expire, http_method)
+        return self.urls((name, ))[name]
+
+    def urls(self, names: Iterable[str]) -> Dict[str, str]:
+        """
+        Returns URLs of files with 'names'.
+
+        URLs missing in in-process cache are fetched from Redis with
+        one MGET, URLs missing in Redis are signed and saved to Redis
+        with one pipeline
+        """
+        names = set(filter(None, names))
+        if not self.is_url_cacheable():
+            return {name: super().url(name) for name in names}
+
+        urls = self._get_local_urls(names)
+        missing = [name for name in names if name not in urls]
+        if not missing:
+            return urls
+
+        try:
+            connection = get_redis_connection("default")
+            cached = connection.mget(
+                [f"{self.redis_key_prefix}{name}" for name in missing]
+            )
+        except redis.exceptions.ConnectionError:
+            connection, cached = None, [None] * len(missing)
+
+        # Redis values are "<expiration timestamp> <URL>"
+        expirations = {}
+        signed = {}
+        for name, value in zip(missing, cached):
+            if value is None:
+                signed[name] = self.sign_url(name)
+                continue
+            expiration, url = value.decode().split(" ", 1)
+            urls[name] = url
+            expirations[name] = float(expiration)
+
+        if signed:
+            expiration = time.time() + self.url_cache_timeout
+            expirations.update(dict.fromkeys(signed, expiration))
+            urls.update(signed)
+            if connection is not None:
+                self._set_redis_urls(connection, signed, expiration)
+        self._set_local_urls(
+            {name: (urls[name], expirations[name]) for name in missing}
+        )
+        return urls
+
+    def _set_redis_urls(
+            self, connection, urls: Dict[str, str], expiration: float
+    ) -> None:
+        """Saves URLs to Redis with one pipeline."""
+        try:
+            pipe = connection.pipeline(transaction=False)
+            for name, url in urls.items():
+                pipe.set(
+                    f"{self.redis_key_prefix}{name}", f"{expiration} {url}",
+                    ex=self.url_cache_timeout
+                )
+            pipe.execute()
+        except redis.exceptions.ConnectionError:
+            pass
+
+    def _get_local_urls(self, names: Iterable[str]) -> Dict[str, str]:
+        """Returns not expired URLs from in-process cache."""
+        now = time.time()
+        urls = {}
+        with self._url_cache_lock:
+            for name in names:
+                cached = self._url_cache.get(name)
+                if cached is None:
+                    continue
+                if cached[1] <= now:
+                    del self._url_cache[name]
+                    continue
+                self._url_cache.move_to_end(name)
+                urls[name] = cached[0]
+        return urls
+
+    def _set_local_urls(self, urls: Dict[str, Tuple[str, float]]) -> None:
+        """
+        Saves URLs with expiration timestamps to in-process cache,
+        evicts least recently used URLs.
+        """
+        with self._url_cache_lock:
+            for name, cached in urls.items():
+                self._url_cache[name] = cached
+                self._url_cache.move_to_end(name)
+            while len(self._url_cache) > settings.APP_MEDIA_URL_CACHE_SIZE:
+                self._url_cache.popitem(last=False)
@@ -0,0 +1,50 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Model
+
+from pythonyanssound.celery import app
+from pythonyanssound.thumbnails import create_thumbnails, delete_thumbnails
+from pythonyanssound.versions import content_version_key, bump_content_versions
+
+
+@app.task
+def generate_thumbnails_task(model_label: str, pk: int, field_name: str):
+    """
+    Generates thumbnails of instance image and records them on instance.
+
+    Thumbnails are recorded only if image hasn't been replaced
+    while generating, previous thumbnails are removed from storage
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    image = getattr(instance, field_name)
+    if not image:
+        return
+
+    thumbnails = create_thumbnails(image)
+    updated = model.objects.filter(
+        pk=pk, **{field_name: image.name}
+    ).update(thumbnails=thumbnails)
+
+    if updated:
+        bump_content_versions((content_version_key(model, pk), ))
+        delete_thumbnails(image.storage, instance.thumbnails)
+    else:
+        delete_thumbnails(image.storage, thumbnails)
+
+
+def schedule_thumbnails_generation(instance: Model, field_name: str) -> None:
+    """
+    Runs thumbnails generation task after transaction commit
+    if instance image has no thumbnails yet.
+    """
+    image = getattr(instance, field_name)
+    if not image or instance.thumbnails.get("source") == image.name:
+        return
+    transaction.on_commit(
+        lambda: generate_thumbnails_task.delay(
+            instance._meta.label, instance.pk, field_name
+        )
+    )
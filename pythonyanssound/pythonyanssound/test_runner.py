@@ -0,0 +1,51 @@
+import unittest
+
+import redis.exceptions
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django_redis import get_redis_connection
+
+
+def flush_test_redis() -> None:
+    """Removes all keys of tests Redis database."""
+    try:
+        get_redis_connection("default").flushdb()
+    except redis.exceptions.ConnectionError:
+        pass
+
+
+class RedisFlushingTestResult(unittest.TextTestResult):
+    """Test result flushing tests Redis database before every test."""
+
+    def startTest(self, test):
+        flush_test_redis()
+        super().startTest(test)
+
+
+class IsolatedRedisTestRunner(DiscoverRunner):
+    """
+    Runs tests with cache on separate Redis database ('APP_TEST_REDIS_DB').
+
+    Database is flushed before every test, so keys written by tests
+    (e.g. like sets of Profile ids reused by test databases) don't leak
+    into other tests, later runs or development data
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        caches = {
+            alias: {**cache, "LOCATION": f"{cache['LOCATION'].rsplit('/', 1)[0]}/{settings.APP_TEST_REDIS_DB}"}
+            for alias, cache in settings.CACHES.items()
+        }
+        self.redis_settings = override_settings(CACHES=caches)
+        self.redis_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        flush_test_redis()
+        self.redis_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def get_resultclass(self):
+        resultclass = super().get_resultclass() or unittest.TextTestResult
+        return type("RedisFlushingTestResult", (RedisFlushingTestResult, resultclass), {})
@@ -0,0 +1,37 @@
+import io
+
+from PIL import Image
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+# size of large uploads validated by tests and 'benchmarks.validators'
+UPLOAD_SIZE = 1024 * 1024 * 50
+
+
+def create_image_upload(size: tuple, image_format: str, total_size: int) -> TemporaryUploadedFile:
+    """Returns temporary uploaded image file padded to 'total_size' bytes."""
+    image = io.BytesIO()
+    Image.new("RGB", size).save(image, image_format)
+    upload = TemporaryUploadedFile(
+        f"cover.{image_format.lower()}", f"image/{image_format.lower()}",
+        total_size, None
+    )
+    upload.write(image.getvalue())
+    upload.file.truncate(total_size)
+    upload.seek(0)
+    return upload
+
+
+class CountingReadsUpload:
+    """Uploaded file proxy which counts bytes read from file."""
+
+    def __init__(self, upload):
+        self.upload = upload
+        self.bytes_read = 0
+
+    def __getattr__(self, item):
+        return getattr(self.upload, item)
+
+    def read(self, *args):
+        data = self.upload.read(*args)
+        self.bytes_read += len(data)
+        return data
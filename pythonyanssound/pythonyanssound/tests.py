@@ -0,0 +1,433 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from PIL import Image
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, connection, router, transaction
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+from django_redis import get_redis_connection
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+from rest_framework_simplejwt.tokens import AccessToken
+
+from music.models import Genre, Song
+from music.serializers import SongWithoutLikeSerializer
+from profiles.models import Profile
+from profiles.tokens import CustomRefreshToken
+from pythonyanssound.middleware import (
+    ConnectionsHealthCheckMiddleware, ReplicaRoutingMiddleware,
+    get_primary_reads_key
+)
+from pythonyanssound.metrics import MULTIPROCESS_DIR_ENV
+from pythonyanssound.profiling import (
+    PROFILES_KEY, Statement, StatementsRecorder, add_plans, build_profile, get_profiles
+)
+from pythonyanssound.storage import CachedURLS3Storage
+from pythonyanssound.test_utils import UPLOAD_SIZE, CountingReadsUpload, create_image_upload
+from pythonyanssound.validators import (
+    validate_image_resolution, validate_file_size
+)
+
+class TestRedisIsolationTestCase(SimpleTestCase):
+
+    def test_tests_use_separate_redis_database(self):
+        connection = get_redis_connection("default")
+        self.assertEqual(connection.connection_pool.connection_kwargs["db"], settings.APP_TEST_REDIS_DB)
+        # database is flushed before every test
+        self.assertEqual(connection.dbsize(), 0)
+
+
+class ValidatorsTestCase(SimpleTestCase):
+
+    def test_image_resolution(self):
+        upload = create_image_upload((1000, 1000), "PNG", 1024)
+        validate_image_resolution(upload)
+        self.assertEqual(upload.tell(), 0)
+
+    def test_image_wrong_resolution(self):
+        upload = create_image_upload((500, 1000), "JPEG", 1024)
+        with self.assertRaises(ValidationError):
+            validate_image_resolution(upload)
+
+    def test_image_not_an_image(self):
+        upload = SimpleUploadedFile("cover.png", b"not_an_image" * 10000)
+        with self.assertRaises(ValidationError):
+            validate_image_resolution(upload)
+
+    def test_file_size_in_memory_upload(self):
+        upload = SimpleUploadedFile("song.mp3", b"0" * 16)
+        with self.settings(APP_FILE_MAX_SIZE=8):
+            with self.assertRaises(ValidationError):
+                validate_file_size(upload)
+
+    def test_file_size_without_declared_size(self):
+        file = io.BytesIO(b"0" * 16)
+        with self.settings(APP_FILE_MAX_SIZE=16):
+            validate_file_size(file)
+        with self.settings(APP_FILE_MAX_SIZE=8):
+            with self.assertRaises(ValidationError):
+                validate_file_size(file)
+
+
+class ValidatorsLargeUploadTestCase(SimpleTestCase):
+    """Validators read only header of 50Mb uploads (timings: 'benchmarks.validators')."""
+
+    def assert_header_read(self, image_format: str):
+        upload = create_image_upload((1000, 1000), image_format, UPLOAD_SIZE)
+        self.addCleanup(upload.close)
+        counting_upload = CountingReadsUpload(upload)
+        validate_image_resolution(counting_upload)
+        validate_file_size(counting_upload)
+        self.assertLessEqual(counting_upload.bytes_read, settings.APP_IMAGE_HEADER_MAX_SIZE)
+
+    def test_png_header_read(self):
+        self.assert_header_read("PNG")
+
+    def test_jpeg_header_read(self):
+        self.assert_header_read("JPEG")
+
+
+class CachedURLS3StorageTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.storage = self.create_storage()
+        self.names = [f"music/1/covers/cover_{i}.png" for i in range(10)]
+        self.addCleanup(
+            get_redis_connection("default").delete,
+            *(f"{self.storage.redis_key_prefix}{name}" for name in self.names)
+        )
+
+    @staticmethod
+    def create_storage() -> CachedURLS3Storage:
+        return CachedURLS3Storage(
+            bucket_name="test-bucket",
+            region_name="us-east-1",
+            access_key="test_access_key",
+            secret_key="test_secret_key"
+        )
+
+    def test_url_signed_once(self):
+        with mock.patch.object(self.storage, "sign_url", wraps=self.storage.sign_url) as sign_url:
+            url = self.storage.url(self.names[0])
+            self.assertEqual(self.storage.url(self.names[0]), url)
+        self.assertEqual(sign_url.call_count, 1)
+        self.assertIn("Signature=", url)
+
+    def test_url_shared_by_processes(self):
+        url = self.storage.url(self.names[0])
+
+        # storage of other process has empty in-process cache
+        other_storage = self.create_storage()
+        with mock.patch.object(other_storage, "sign_url") as sign_url:
+            self.assertEqual(other_storage.url(self.names[0]), url)
+        sign_url.assert_not_called()
+
+    def test_urls_batch(self):
+        self.storage.url(self.names[0])
+        with mock.patch.object(self.storage, "sign_url", wraps=self.storage.sign_url) as sign_url:
+            urls = self.storage.urls(self.names)
+        self.assertEqual(set(urls), set(self.names))
+        self.assertEqual(sign_url.call_count, len(self.names) - 1)
+
+    def test_url_expired(self):
+        url = self.storage.url(self.names[0])
+        expiration = time.time() + self.storage.url_cache_timeout
+        with mock.patch("pythonyanssound.storage.time.time", return_value=expiration + 1):
+            get_redis_connection("default").delete(f"{self.storage.redis_key_prefix}{self.names[0]}")
+            with mock.patch.object(self.storage, "sign_url", return_value="new_url") as sign_url:
+                self.assertEqual(self.storage.url(self.names[0]), "new_url")
+        sign_url.assert_called_once()
+        self.assertNotEqual(url, "new_url")
+
+    def test_url_custom_parameters_not_cached(self):
+        with mock.patch.object(self.storage, "sign_url") as sign_url:
+            self.storage.url(self.names[0], expire=60)
+        sign_url.assert_not_called()
+
+    def test_list_serializer_prefetches_page_urls(self):
+        artist = Profile(pk=1, username="test_artist")
+        songs = [
+            Song(pk=i, title=f"song_{i}", audio=f"music/1/songs/song_{i}.mp3", cover=name, artist=artist)
+            for i, name in enumerate(self.names)
+        ]
+        for song in songs:
+            song.cover.storage = song.audio.storage = self.storage
+        self.addCleanup(
+            get_redis_connection("default").delete,
+            *(f"{self.storage.redis_key_prefix}{song.audio.name}" for song in songs)
+        )
+
+        with mock.patch(
+                "pythonyanssound.storage.get_redis_connection", wraps=get_redis_connection
+        ) as redis_connection, mock.patch.object(
+                self.storage, "sign_url", wraps=self.storage.sign_url
+        ) as sign_url:
+            data = SongWithoutLikeSerializer(instance=songs, many=True).data
+        # the whole page is fetched from Redis and signed at once,
+        # rows take URLs from in-process cache
+        redis_connection.assert_called_once()
+        self.assertEqual(sign_url.call_count, len(self.names) * 2)
+        self.assertIn("Signature=", data[0]["cover"])
+
+
+@override_settings(APP_DATABASE_REPLICAS=["replica_1", "replica_2"])
+class ReplicaRoutingTestCase(SimpleTestCase):
+    databases = {DEFAULT_DB_ALIAS}
+    USER_ID = 1000
+
+    def setUp(self) -> None:
+        token = AccessToken()
+        token["user_id"] = self.USER_ID
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+        self.factory = RequestFactory()
+        # database chosen for Profile reads during request
+        self.middleware = ReplicaRoutingMiddleware(lambda request: router.db_for_read(Profile))
+        primary_reads_key = get_primary_reads_key(self.USER_ID)
+        get_redis_connection("default").delete(primary_reads_key)
+        self.addCleanup(get_redis_connection("default").delete, primary_reads_key)
+
+    def test_safe_requests_read_from_replicas(self):
+        self.assertIn(self.middleware(self.factory.get("/", **self.headers)), settings.APP_DATABASE_REPLICAS)
+        self.assertEqual(self.middleware(self.factory.post("/", **self.headers)), DEFAULT_DB_ALIAS)
+        # outside of requests (tasks, commands)
+        self.assertEqual(router.db_for_read(Profile), DEFAULT_DB_ALIAS)
+
+    def test_reads_stick_to_primary_after_write(self):
+        self.middleware(self.factory.delete("/", **self.headers))
+        self.assertEqual(self.middleware(self.factory.get("/", **self.headers)), DEFAULT_DB_ALIAS)
+        # other users and anonymous requests still read from replicas
+        self.assertIn(self.middleware(self.factory.get("/")), settings.APP_DATABASE_REPLICAS)
+
+        get_redis_connection("default").delete(get_primary_reads_key(self.USER_ID))
+        self.assertIn(self.middleware(self.factory.get("/", **self.headers)), settings.APP_DATABASE_REPLICAS)
+
+    def test_transaction_reads_from_primary(self):
+        def read_in_transaction(request):
+            with transaction.atomic():
+                return router.db_for_read(Profile)
+
+        middleware = ReplicaRoutingMiddleware(read_in_transaction)
+        self.assertEqual(middleware(self.factory.get("/")), DEFAULT_DB_ALIAS)
+
+
+@override_settings(APP_DATABASE_REPLICAS=["replica_1"])
+class ReplicaReadsTestCase(TransactionTestCase):
+    """
+    Requests reading from replica which mirrors primary test database
+    (separate connection sees committed rows only, so tests aren't wrapped in transaction).
+    """
+    databases = {DEFAULT_DB_ALIAS, "replica_1"}
+
+    def setUp(self) -> None:
+        self.profile = Profile.objects.create_user("replica@mail.ru", "replica_user", "replica_password")
+        self.other_profile = Profile.objects.create_user("other@mail.ru", "other_user", "other_password")
+        token = CustomRefreshToken.for_user(self.profile).access_token
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def get_short_details(self):
+        response = self.client.get(reverse("own-profile-short-details"), **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_safe_request_reads_from_replica(self):
+        # authentication
+        with self.assertNumQueries(0, using=DEFAULT_DB_ALIAS), self.assertNumQueries(1, using="replica_1"):
+            self.get_short_details()
+
+    def test_safe_request_after_write_reads_from_primary(self):
+        response = self.client.post(
+            reverse("profile-followings-management", kwargs={"profile_id": self.other_profile.pk}), **self.headers
+        )
+        self.assertEqual(response.status_code, 204)
+        with self.assertNumQueries(1, using=DEFAULT_DB_ALIAS), self.assertNumQueries(0, using="replica_1"):
+            self.get_short_details()
+
+
+class ConnectionsHealthCheckTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.middleware = ConnectionsHealthCheckMiddleware(lambda request: None)
+        self.request = RequestFactory().get("/")
+        Profile.objects.exists()
+
+    def test_recently_used_connection_not_checked(self):
+        self.middleware(self.request)
+        with mock.patch.object(connection, "is_usable") as is_usable:
+            self.middleware(self.request)
+        is_usable.assert_not_called()
+
+    def test_broken_idle_connection_closed(self):
+        connection.idle_since = time.monotonic() - settings.APP_DB_HEALTH_CHECK_IDLE - 1
+        with mock.patch.object(connection, "is_usable", return_value=False), \
+                mock.patch.object(connection, "close") as close:
+            self.middleware(self.request)
+        close.assert_called_once()
+
+
+class MetricsTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.profile = Profile.objects.create_user("metrics@mail.ru", "metrics_user", "metrics_password")
+        genre = Genre.objects.create(genre="metrics_genre")
+        self.song = Song.objects.create(title="metrics_song", artist=self.profile, genre=genre)
+        token = CustomRefreshToken.for_user(self.profile).access_token
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def get_value(self, name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_metrics(self):
+        view = "songs-likes-management"
+        requests = self.get_value("http_requests_total", view=view, method="POST", status="204")
+        queries = self.get_value("db_queries_total", view=view)
+        latency_count = self.get_value("http_request_duration_seconds_count", view=view, method="POST")
+
+        response = self.client.post(reverse(view, kwargs={"song_id": self.song.pk}), **self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_value("http_requests_total", view=view, method="POST", status="204"), requests + 1)
+        self.assertEqual(
+            self.get_value("http_request_duration_seconds_count", view=view, method="POST"), latency_count + 1
+        )
+        # user lookup and like insert
+        self.assertEqual(self.get_value("db_queries_total", view=view), queries + 2)
+
+    def test_redis_metrics(self):
+        view = "songs-trending"
+        commands = self.get_value("redis_commands_total", view=view)
+        response = self.client.get(reverse(view), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        # chart length pipeline (EXISTS, ZCARD) and roll over of previous epoch chart
+        self.assertGreaterEqual(self.get_value("redis_commands_total", view=view), commands + 2)
+
+    def test_queries_outside_requests_not_counted(self):
+        queries = self.get_value("db_queries_total", view="songs-likes-management")
+        Song.objects.count()
+        self.assertEqual(self.get_value("db_queries_total", view="songs-likes-management"), queries)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("genres-list"), **self.headers)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_requests_total{method="GET",status="200",view="genres-list"}', response.content)
+        self.assertIn(b'http_response_size_bytes_bucket', response.content)
+
+    def test_metrics_endpoint_restricted(self):
+        url = reverse("metrics")
+        response = self.client.get(url, REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 403)
+        with self.settings(APP_METRICS_TOKEN="metrics_token"):
+            response = self.client.get(url, REMOTE_ADDR="203.0.113.7", HTTP_AUTHORIZATION="Bearer wrong_token")
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get(url, REMOTE_ADDR="203.0.113.7", HTTP_AUTHORIZATION="Bearer metrics_token")
+            self.assertEqual(response.status_code, 200)
+
+    def test_metrics_of_worker_processes_merged(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        record = "from pythonyanssound.metrics import REQUESTS; REQUESTS.labels('genres-list', 'GET', 200).inc()"
+        for _ in range(2):
+            subprocess.run(
+                [sys.executable, "-c", record], cwd=settings.BASE_DIR, check=True,
+                env={**os.environ, MULTIPROCESS_DIR_ENV: directory}
+            )
+
+        with mock.patch.dict(os.environ, {MULTIPROCESS_DIR_ENV: directory}):
+            response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        families = {family.name: family for family in text_string_to_metric_families(response.content.decode())}
+        sample, = [sample for sample in families["http_requests"].samples if sample.name == "http_requests_total"]
+        self.assertEqual(sample.labels, {"view": "genres-list", "method": "GET", "status": "200"})
+        self.assertEqual(sample.value, 2)
+
+
+@override_settings(APP_SQL_PROFILING_SAMPLE_RATE=0, APP_SQL_PROFILING_SLOW_REQUEST=60)
+class SqlProfilingTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.profile = Profile.objects.create_user("profiling@mail.ru", "profiling_user", "profiling_password")
+        token = CustomRefreshToken.for_user(self.profile).access_token
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+        get_redis_connection("default").delete(PROFILES_KEY)
+        self.addCleanup(get_redis_connection("default").delete, PROFILES_KEY)
+
+    def request_liked_songs(self):
+        response = self.client.get(reverse("songs-likes"), **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_fast_requests_not_profiled(self):
+        with mock.patch("pythonyanssound.middleware.build_profile") as build_profile_mock:
+            self.request_liked_songs()
+        build_profile_mock.assert_not_called()
+        self.assertEqual(get_profiles(), [])
+
+    @override_settings(APP_SQL_PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request_profiled(self):
+        self.request_liked_songs()
+
+        profile, = get_profiles()
+        self.assertEqual(profile["view"], "songs-likes")
+        self.assertEqual(profile["reason"], "sampled")
+        self.assertEqual(profile["queries_count"], len(profile["statements"]))
+        self.assertTrue(any("songs_likes" in statement["sql"] for statement in profile["statements"]))
+        plans = [statement["plan"] for statement in profile["statements"] if statement["plan"]]
+        self.assertTrue(0 < len(plans) <= settings.APP_SQL_PROFILING_EXPLAIN_COUNT)
+
+    def test_params_redacted(self):
+        recorder = StatementsRecorder(record_statements=True)
+        recorder.statements.append(
+            Statement(DEFAULT_DB_ALIAS, "SELECT %s", ("secret_password", 69), 0.1)
+        )
+        request = RequestFactory().get("/")
+        request.resolver_match = None
+        # values are used by in-process EXPLAIN only
+        with mock.patch("pythonyanssound.profiling.explain", return_value="plan") as explain:
+            profile = add_plans(build_profile(request, 200, 0.1, recorder), recorder)
+        explain.assert_called_once_with(DEFAULT_DB_ALIAS, "SELECT %s", ("secret_password", 69))
+        self.assertEqual(profile["statements"][0]["params"], "str, int")
+        self.assertNotIn("secret_password", json.dumps(profile))
+
+    @override_settings(APP_SQL_PROFILING_SLOW_REQUEST=0)
+    def test_slow_unsampled_request_without_statements(self):
+        with mock.patch("pythonyanssound.profiling.explain") as explain:
+            self.request_liked_songs()
+        explain.assert_not_called()
+
+        profile, = get_profiles()
+        self.assertEqual(profile["reason"], "slow")
+        self.assertGreater(profile["queries_count"], 0)
+        self.assertEqual(profile["statements"], [])
+
+    @override_settings(APP_SQL_PROFILING_SLOW_REQUEST=0, APP_SQL_PROFILING_BUFFER_SIZE=2)
+    def test_slow_requests_ring_buffer(self):
+        for _ in range(3):
+            self.request_liked_songs()
+        profiles = get_profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual({profile["reason"] for profile in profiles}, {"slow"})
+
+    @override_settings(APP_SQL_PROFILING_SAMPLE_RATE=1)
+    def test_admin_pages(self):
+        self.request_liked_songs()
+        profile_id = get_profiles()[0]["id"]
+        response = self.client.get(reverse("sql-profiles"))
+        self.assertEqual(response.status_code, 302)
+
+        admin = Profile.objects.create_superuser("admin@mail.ru", "admin_user", "admin_password")
+        self.client.force_login(admin)
+        response = self.client.get(reverse("sql-profiles"))
+        self.assertContains(response, reverse("sql-profile", kwargs={"profile_id": profile_id}))
+        response = self.client.get(reverse("sql-profile", kwargs={"profile_id": profile_id}))
+        self.assertContains(response, "songs_likes")
+        response = self.client.get(reverse("sql-profile", kwargs={"profile_id": "removed"}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,59 @@
+import io
+import os
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db.models.fields.files import ImageFieldFile
+
+# Pillow save() format name and extra options for every thumbnail format
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+
+def thumbnail_name(image_name: str, size: int, extension: str) -> str:
+    """Returns storage path of image thumbnail (next to original image)."""
+    folder, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return f"{folder}/thumbnails/{stem}_{size}.{extension}"
+
+
+def create_thumbnails(image: ImageFieldFile) -> dict:
+    """
+    Generates resized variants of image and saves them to image storage.
+
+    Makes variant for every size from 'APP_THUMBNAIL_SIZES'
+    in every format from 'APP_THUMBNAIL_FORMATS'
+    Returns thumbnails description stored on model:
+        {"source": image name, "<size>": {"<format>": thumbnail name}}
+    """
+    with image.open("rb"):
+        source = Image.open(image)
+        source.load()
+    # JPEG has no alpha channel
+    source = source.convert("RGB")
+
+    thumbnails = {"source": image.name}
+    for size in settings.APP_THUMBNAIL_SIZES:
+        resized = source.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        thumbnails[str(size)] = {}
+        for extension in settings.APP_THUMBNAIL_FORMATS:
+            image_format, options = THUMBNAIL_FORMATS[extension]
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            thumbnails[str(size)][extension] = image.storage.save(
+                thumbnail_name(image.name, size, extension),
+                ContentFile(buffer.getvalue())
+            )
+    return thumbnails
+
+
+def delete_thumbnails(storage: Storage, thumbnails: dict) -> None:
+    """Deletes from storage thumbnails described by 'thumbnails' dict."""
+    for size in settings.APP_THUMBNAIL_SIZES:
+        for name in thumbnails.get(str(size), {}).values():
+            storage.delete(name)
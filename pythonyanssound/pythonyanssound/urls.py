@@ -1,11 +1,16 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from pythonyanssound.metrics import metrics_view
+from pythonyanssound.profiling import sql_profile_view, sql_profiles_view
 from pythonyanssound.swagger import urlpatterns as swagger_urlpatterns
 
 
 urlpatterns = [
+    path('admin/sql-profiles/', admin.site.admin_view(sql_profiles_view), name="sql-profiles"),
+    path('admin/sql-profiles/<str:profile_id>/', admin.site.admin_view(sql_profile_view), name="sql-profile"),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name="metrics"),
     path('api/profile/', include('profiles.urls')),
     path('api/music/', include('music.urls')),
     path('api/playlist/', include('playlists.urls')),
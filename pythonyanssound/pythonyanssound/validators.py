@@ -1,27 +1,82 @@
-import io
+import os
+import struct
+import zlib
+from typing import IO, Optional, Tuple
 
+from PIL import ImageFile
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.files.images import get_image_dimensions
-from django.db.models.fields.files import ImageFieldFile, FieldFile
 
+IMAGE_HEADER_CHUNK_SIZE = 1024
 
-def validate_image_resolution(image_field: ImageFieldFile) -> None:
+
+def get_image_header_dimensions(
+        file: IO
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Returns (width, height) of image read from image header only.
+
+    Feeds Pillow parser with small chunks until it recognizes image header,
+    reads not more than 'APP_IMAGE_HEADER_MAX_SIZE' bytes
+    Returns (None, None) if header can't be recognized
+    File position is restored after reading
+    """
+    position = file.tell()
+    file.seek(0)
+    parser = ImageFile.Parser()
+    read = 0
+    try:
+        while read < settings.APP_IMAGE_HEADER_MAX_SIZE:
+            chunk = file.read(IMAGE_HEADER_CHUNK_SIZE)
+            if not chunk:
+                break
+            read += len(chunk)
+            parser.feed(chunk)
+            if parser.image:
+                return parser.image.size
+    except (struct.error, zlib.error, RuntimeError, OSError):
+        # broken image header
+        pass
+    finally:
+        file.seek(position)
+    return None, None
+
+
+def get_file_size(file: IO) -> int:
+    """
+    Returns file size.
+
+    Uses size declared by upload handlers or storage (counted from
+    received bytes, not from client headers),
+    otherwise seeks to the end of file without reading it
+    """
+    size = getattr(file, "size", None)
+    if size is not None:
+        return size
+    position = file.tell()
+    try:
+        return file.seek(0, os.SEEK_END)
+    finally:
+        file.seek(position)
+
+
+def validate_image_resolution(image_file: IO) -> None:
     """Validates image resolution defined by settings."""
-    print("Image", type(image_field))
-    width, height = get_image_dimensions(image_field.file)
+    width, height = get_image_header_dimensions(image_file)
     if (
         height != settings.APP_IMAGE_HEIGHT
         or width != settings.APP_IMAGE_WIDTH
     ):
-        raise ValidationError("Image size should be 1000x1000.")
+        raise ValidationError(
+            f"Image size should be "
+            f"{settings.APP_IMAGE_WIDTH}x{settings.APP_IMAGE_HEIGHT}."
+        )
 
 
-def validate_file_size(file_field: FieldFile) -> None:
+def validate_file_size(file: IO) -> None:
     """Validates total file size."""
-    print("File", type(file_field))
-    # creating file from tests passed BytesIO instance
-    if isinstance(file_field.file, io.BytesIO):
-        pass
-    elif file_field.file.size > settings.APP_FILE_MAX_SIZE:
-        raise ValidationError("File size should be less than 10Mb.")
+    if get_file_size(file) > settings.APP_FILE_MAX_SIZE:
+        raise ValidationError(
+            f"File size should be less than "
+            f"{settings.APP_FILE_MAX_SIZE // (1024 * 1024)}Mb."
+        )
@@ -0,0 +1,119 @@
+import time
+from typing import Iterable, Optional, Type
+
+import redis.exceptions
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Model
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django_redis import get_redis_connection
+from rest_framework.request import Request
+
+VERSION_KEY_PREFIX = "content_version:"
+MODIFIED_KEY_PREFIX = "content_modified:"
+
+
+def content_version_key(model: Type[Model], pk) -> str:
+    """Returns version key of model instance content."""
+    return f"{model._meta.label_lower}:{pk}"
+
+
+def artist_version_key(profile_pk) -> str:
+    """
+    Returns coarse version key of artist content shown outside Profile page
+    (artist username and songs shown in song details and playlists).
+    """
+    return f"artist:{profile_pk}"
+
+
+def relations_version_key(profile_pk) -> str:
+    """
+    Returns version key of Profile relations shown to Profile itself
+    (liked songs and playlists, followings).
+    """
+    return f"relations:{profile_pk}"
+
+
+def bump_content_versions(keys: Iterable[str]) -> None:
+    """
+    Increments versions and saves modification time of content keys
+    after transaction commit (with one Redis pipeline).
+    """
+    keys = set(keys)
+    if not keys:
+        return
+
+    def bump():
+        modified = time.time()
+        try:
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            for key in keys:
+                pipe.incr(f"{VERSION_KEY_PREFIX}{key}")
+                pipe.expire(f"{VERSION_KEY_PREFIX}{key}", settings.APP_CONTENT_VERSION_EXPIRE)
+                pipe.set(
+                    f"{MODIFIED_KEY_PREFIX}{key}", modified,
+                    ex=settings.APP_CONTENT_VERSION_EXPIRE
+                )
+            pipe.execute()
+        except redis.exceptions.ConnectionError:
+            pass
+
+    transaction.on_commit(bump)
+
+
+class ContentValidators:
+    """
+    ETag and Last-Modified validators of response built from content versions.
+
+    Validators also change every 'APP_CONDITIONAL_GET_PERIOD' seconds,
+    so clients don't keep signed media URLs of response after they expire
+    Validators are None if Redis is unavailable
+    """
+
+    def __init__(self, request: Request, keys: Iterable[str]):
+        self.request = request
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[int] = None
+
+        keys = list(keys)
+        try:
+            values = get_redis_connection("default").mget(
+                [f"{VERSION_KEY_PREFIX}{key}" for key in keys]
+                + [f"{MODIFIED_KEY_PREFIX}{key}" for key in keys]
+            )
+        except redis.exceptions.ConnectionError:
+            return
+
+        period = settings.APP_CONDITIONAL_GET_PERIOD
+        period_start = int(time.time()) // period * period
+        versions = [int(value or 0) for value in values[:len(keys)]]
+        modified = [float(value or 0) for value in values[len(keys):]]
+
+        # responses include data of authenticated user
+        parts = [request.user.pk, *versions, period_start]
+        self.etag = '"{}"'.format(".".join(map(str, parts)))
+        self.last_modified = max([period_start, *map(int, modified)])
+
+    def get_not_modified_response(self) -> Optional[HttpResponse]:
+        """
+        Returns 304 (Not Modified) response if request validators
+        ('If-None-Match', 'If-Modified-Since') match content versions.
+        """
+        if self.etag is None:
+            return None
+        response = get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            self.set_headers(response)
+        return response
+
+    def set_headers(self, response: HttpResponse) -> HttpResponse:
+        """Sets validators and cache control headers to response."""
+        if self.etag is not None:
+            response["ETag"] = self.etag
+            response["Last-Modified"] = http_date(self.last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -1,4 +1,4 @@
-from django.db.models import Count, Exists, OuterRef
+from django.db.models import Count
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
@@ -53,11 +53,8 @@ class SearchListView(APIView):
         playlists = Playlist.objects.filter(
             title__icontains=search_string
         )[:10]
-        songs = Song.objects.annotate(
-            is_liked=Exists(
-                request.user.liked_songs.filter(pk=OuterRef("pk"))
-            ),
-        ).filter(title__icontains=search_string)[:10]
+        # songs are marked with user's likes by serializer
+        songs = Song.objects.filter(title__icontains=search_string)[:10]
 
         artists_serializer = ShortProfileSerializer(
             instance=artists, many=True, context=self.get_serializer_context()
@@ -156,10 +153,6 @@ class SongsSearchView(ListAPIView):
 
         Orders songs by 'title' ascending
         """
-        return Song.objects.annotate(
-            is_liked=Exists(
-                self.request.user.liked_songs.filter(pk=OuterRef("pk"))
-            ),
-        ).filter(
+        return Song.objects.filter(
             title__icontains=self.kwargs.get("search_string")
         ).order_by("title")